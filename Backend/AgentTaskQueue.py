@@ -0,0 +1,503 @@
+"""
+Agent Task Queue - Shared Task/Result Store for Local Agents
+=============================================================
+Backs LocalAgentAPI's pending tasks, task results and pairing codes so
+every gunicorn worker sees the same queue. A task queued by one worker
+can be claimed by an /agent/poll served by another.
+
+Semantics:
+- Per-device FIFO ordering (monotonic sequence numbers)
+- Atomic claim: a task is handed to exactly one poller at a time
+- Visibility timeout: a claimed task that is never acknowledged becomes
+  claimable again, up to MAX_DELIVERY_ATTEMPTS deliveries
+- Ack happens when the agent reports a result for the task
+- Delivery cursor: each claimed task carries its sequence number; a
+  poller that echoes it back confirms delivery of that task (only that
+  one - a task whose poll response was lost stays redeliverable) so it
+  is never re-sent, even if its result is still pending
+- Long-poll: claim_wait() blocks until a task arrives or a timeout passes
+- Result notification: wait_for_result() is woken the moment set_result()
+  runs in this process (HTTP /agent/report or WebSocket result)
+
+Backends:
+- SQLiteTaskQueue (default): WAL-mode SQLite file shared by all workers
+  on the host (AGENT_QUEUE_DB, default Data/agent_queue.db)
+- MemoryTaskQueue: single-process fallback (AGENT_QUEUE_BACKEND=memory)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Any
+
+# ==================== CONFIGURATION ====================
+
+DEFAULT_VISIBILITY_TIMEOUT = 60   # seconds before an un-acked task is redelivered
+MAX_DELIVERY_ATTEMPTS = 3
+RESULT_TTL = 3600                 # keep task results for an hour
+PURGE_INTERVAL = 60               # seconds between opportunistic purges
+LONG_POLL_RECHECK = 1.0           # seconds between cross-process checks while long-polling
+RESULT_RECHECK_MIN = 0.05         # first cross-process check while awaiting a result...
+RESULT_RECHECK_MAX = 2.0          # ...doubling up to this interval
+
+
+class TaskQueue(ABC):
+    """Interface shared by all task queue backends."""
+
+    def __init__(self):
+        # Wakes long-pollers in this process as soon as a task is enqueued
+        self._task_signal = threading.Condition()
+        # Per-task completion events, one per waiting caller: {task_id: [threading.Event, ...]}
+        self._result_waiters: Dict[str, List[threading.Event]] = {}
+        self._waiters_lock = threading.Lock()
+
+    def _notify_enqueued(self):
+        with self._task_signal:
+            self._task_signal.notify_all()
+
+    def _notify_result(self, task_id: str):
+        with self._waiters_lock:
+            events = list(self._result_waiters.get(task_id, ()))
+        for event in events:
+            event.set()
+
+    # ---------- tasks ----------
+
+    @abstractmethod
+    def enqueue(self, device_id: str, task: Dict[str, Any]) -> None:
+        """Append a task ({task_id, command, params, ...}) to a device's queue."""
+
+    @abstractmethod
+    def claim(self, device_id: str, visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT) -> Optional[Dict[str, Any]]:
+        """Atomically claim the oldest visible task for a device (with its `seq`), or None."""
+
+    def claim_wait(self, device_id: str, timeout: float,
+                   visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT) -> Optional[Dict[str, Any]]:
+        """
+        Long-poll: claim the next task, waiting up to `timeout` seconds for one.
+        
+        Enqueues in this process wake the waiter immediately; enqueues from
+        other workers are picked up within LONG_POLL_RECHECK seconds.
+        """
+        deadline = time.time() + timeout
+        while True:
+            task = self.claim(device_id, visibility_timeout)
+            remaining = deadline - time.time()
+            if task is not None or remaining <= 0:
+                return task
+            with self._task_signal:
+                self._task_signal.wait(min(remaining, LONG_POLL_RECHECK))
+
+    @abstractmethod
+    def confirm_delivered(self, device_id: str, cursor: int) -> None:
+        """Mark the claimed task with sequence `cursor` as received by the device."""
+
+    def claim_all(self, device_id: str, visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT) -> List[Dict[str, Any]]:
+        """Claim every visible task for a device in FIFO order."""
+        tasks = []
+        while True:
+            task = self.claim(device_id, visibility_timeout)
+            if task is None:
+                return tasks
+            tasks.append(task)
+
+    @abstractmethod
+    def ack(self, task_id: str) -> None:
+        """Remove a task once its result has been recorded."""
+
+    @abstractmethod
+    def pending_count(self, device_id: str) -> int:
+        """Number of tasks waiting (or in flight) for a device."""
+
+    # ---------- results ----------
+
+    @abstractmethod
+    def set_result(self, task_id: str, result: Dict[str, Any]) -> None:
+        """Store a task result and acknowledge the task."""
+
+    @abstractmethod
+    def get_result(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Get a stored task result, or None."""
+
+    def wait_for_result(self, task_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Block until a result for task_id is recorded or `timeout` passes.
+        
+        Results recorded in this process signal the waiter directly; results
+        recorded by another worker are picked up by a re-check that starts at
+        RESULT_RECHECK_MIN and backs off to RESULT_RECHECK_MAX seconds.
+        """
+        event = threading.Event()
+        with self._waiters_lock:
+            self._result_waiters.setdefault(task_id, []).append(event)
+        try:
+            deadline = time.time() + timeout
+            recheck = RESULT_RECHECK_MIN
+            while True:
+                result = self.get_result(task_id)
+                remaining = deadline - time.time()
+                if result is not None or remaining <= 0:
+                    return result
+                if not event.wait(min(remaining, recheck)):
+                    recheck = min(recheck * 2, RESULT_RECHECK_MAX)
+        finally:
+            with self._waiters_lock:
+                waiters = self._result_waiters.get(task_id, [])
+                waiters.remove(event)
+                if not waiters:
+                    self._result_waiters.pop(task_id, None)
+
+    # ---------- pairing codes ----------
+
+    @abstractmethod
+    def put_pairing_code(self, code: str, data: Dict[str, Any]) -> None:
+        """Store a pairing code ({user_id, expires_at, used})."""
+
+    @abstractmethod
+    def get_pairing_code(self, code: str) -> Optional[Dict[str, Any]]:
+        """Get a pairing code, or None."""
+
+    @abstractmethod
+    def mark_pairing_code_used(self, code: str) -> bool:
+        """Atomically mark a code used. Returns False if it was already used or unknown."""
+
+    # ---------- maintenance ----------
+
+    @abstractmethod
+    def purge_expired(self) -> None:
+        """Drop old results, dead tasks and expired pairing codes."""
+
+
+# ==================== SQLITE BACKEND ====================
+
+class SQLiteTaskQueue(TaskQueue):
+    """Durable queue in a WAL-mode SQLite file, safe across processes."""
+
+    def __init__(self, db_path: str = None):
+        if db_path is None:
+            data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "Data")
+            os.makedirs(data_dir, exist_ok=True)
+            db_path = os.getenv("AGENT_QUEUE_DB", os.path.join(data_dir, "agent_queue.db"))
+
+        super().__init__()
+        self.db_path = db_path
+        self._local = threading.local()
+        self._last_purge = 0.0
+        self._init_schema()
+
+    def _conn(self) -> sqlite3.Connection:
+        """This thread's connection (autocommit; transactions are explicit)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS agent_tasks (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                task_id TEXT UNIQUE NOT NULL,
+                device_id TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                enqueued_at REAL NOT NULL,
+                visible_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                delivered INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(agent_tasks)")}
+        if "delivered" not in columns:
+            conn.execute("ALTER TABLE agent_tasks ADD COLUMN delivered INTEGER NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_agent_tasks_device ON agent_tasks(device_id, visible_at, seq)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS agent_task_results (
+                task_id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                reported_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_agent_results_reported ON agent_task_results(reported_at)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS agent_pairing_codes (
+                code TEXT PRIMARY KEY,
+                user_id TEXT,
+                expires_at TEXT NOT NULL,
+                used INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+
+    def _maybe_purge(self):
+        now = time.time()
+        if now - self._last_purge >= PURGE_INTERVAL:
+            self._last_purge = now
+            try:
+                self.purge_expired()
+            except sqlite3.Error as e:
+                print(f"[AGENT_QUEUE] Purge error: {e}")
+
+    # ---------- tasks ----------
+
+    def enqueue(self, device_id: str, task: Dict[str, Any]) -> None:
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO agent_tasks (task_id, device_id, payload, enqueued_at, visible_at) VALUES (?, ?, ?, ?, ?)",
+            (task["task_id"], device_id, json.dumps(task), now, now)
+        )
+        self._notify_enqueued()
+        self._maybe_purge()
+
+    def claim(self, device_id: str, visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT) -> Optional[Dict[str, Any]]:
+        conn = self._conn()
+        now = time.time()
+        # Cheap read-only check first, so idle pollers never take the write lock
+        if conn.execute(
+            """SELECT 1 FROM agent_tasks
+               WHERE device_id = ? AND visible_at <= ? AND attempts < ? AND delivered = 0
+               LIMIT 1""",
+            (device_id, now, MAX_DELIVERY_ATTEMPTS)
+        ).fetchone() is None:
+            return None
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                """SELECT seq, payload FROM agent_tasks
+                   WHERE device_id = ? AND visible_at <= ? AND attempts < ? AND delivered = 0
+                   ORDER BY seq LIMIT 1""",
+                (device_id, now, MAX_DELIVERY_ATTEMPTS)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE agent_tasks SET visible_at = ?, attempts = attempts + 1 WHERE seq = ?",
+                (now + visibility_timeout, row["seq"])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        task = json.loads(row["payload"])
+        task["seq"] = row["seq"]
+        return task
+
+    def confirm_delivered(self, device_id: str, cursor: int) -> None:
+        self._conn().execute(
+            "UPDATE agent_tasks SET delivered = 1 WHERE device_id = ? AND seq = ? AND attempts > 0",
+            (device_id, cursor)
+        )
+
+    def ack(self, task_id: str) -> None:
+        self._conn().execute("DELETE FROM agent_tasks WHERE task_id = ?", (task_id,))
+
+    def pending_count(self, device_id: str) -> int:
+        row = self._conn().execute(
+            "SELECT COUNT(*) AS n FROM agent_tasks WHERE device_id = ? AND attempts < ?",
+            (device_id, MAX_DELIVERY_ATTEMPTS)
+        ).fetchone()
+        return row["n"]
+
+    # ---------- results ----------
+
+    def set_result(self, task_id: str, result: Dict[str, Any]) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO agent_task_results (task_id, payload, reported_at) VALUES (?, ?, ?)",
+                (task_id, json.dumps(result, default=str), time.time())
+            )
+            conn.execute("DELETE FROM agent_tasks WHERE task_id = ?", (task_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._notify_result(task_id)
+
+    def get_result(self, task_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT payload FROM agent_task_results WHERE task_id = ?", (task_id,)
+        ).fetchone()
+        return json.loads(row["payload"]) if row else None
+
+    # ---------- pairing codes ----------
+
+    def put_pairing_code(self, code: str, data: Dict[str, Any]) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO agent_pairing_codes (code, user_id, expires_at, used) VALUES (?, ?, ?, ?)",
+            (code, data.get("user_id"), data["expires_at"], int(bool(data.get("used"))))
+        )
+        self._maybe_purge()
+
+    def get_pairing_code(self, code: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT user_id, expires_at, used FROM agent_pairing_codes WHERE code = ?", (code,)
+        ).fetchone()
+        if not row:
+            return None
+        return {"user_id": row["user_id"], "expires_at": row["expires_at"], "used": bool(row["used"])}
+
+    def mark_pairing_code_used(self, code: str) -> bool:
+        cursor = self._conn().execute(
+            "UPDATE agent_pairing_codes SET used = 1 WHERE code = ? AND used = 0", (code,)
+        )
+        return cursor.rowcount == 1
+
+    # ---------- maintenance ----------
+
+    def purge_expired(self) -> None:
+        from datetime import datetime
+
+        conn = self._conn()
+        now = time.time()
+        conn.execute("DELETE FROM agent_task_results WHERE reported_at < ?", (now - RESULT_TTL,))
+        conn.execute(
+            "DELETE FROM agent_tasks WHERE attempts >= ? AND visible_at < ? AND delivered = 0",
+            (MAX_DELIVERY_ATTEMPTS, now)
+        )
+        # Delivered but never reported (e.g. agent crashed mid-task)
+        conn.execute("DELETE FROM agent_tasks WHERE delivered = 1 AND enqueued_at < ?", (now - RESULT_TTL,))
+        conn.execute(
+            "DELETE FROM agent_pairing_codes WHERE used = 1 OR expires_at < ?",
+            (datetime.now().isoformat(),)
+        )
+
+
+# ==================== IN-MEMORY BACKEND ====================
+
+class MemoryTaskQueue(TaskQueue):
+    """Process-local queue with the same semantics (single worker / tests)."""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._tasks: Dict[str, Dict[str, Any]] = {}      # {task_id: {seq, device_id, task, visible_at, attempts, delivered}}
+        self._results: Dict[str, tuple] = {}             # {task_id: (result, reported_at)}
+        self._pairing_codes: Dict[str, Dict[str, Any]] = {}
+
+    def enqueue(self, device_id: str, task: Dict[str, Any]) -> None:
+        with self._lock:
+            self._seq += 1
+            self._tasks[task["task_id"]] = {
+                "seq": self._seq,
+                "device_id": device_id,
+                "task": dict(task),
+                "visible_at": time.time(),
+                "attempts": 0,
+                "delivered": False,
+                "enqueued_at": time.time(),
+            }
+        self._notify_enqueued()
+
+    def claim(self, device_id: str, visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            candidates = [
+                entry for entry in self._tasks.values()
+                if entry["device_id"] == device_id
+                and entry["visible_at"] <= now
+                and entry["attempts"] < MAX_DELIVERY_ATTEMPTS
+                and not entry["delivered"]
+            ]
+            if not candidates:
+                return None
+            entry = min(candidates, key=lambda e: e["seq"])
+            entry["visible_at"] = now + visibility_timeout
+            entry["attempts"] += 1
+            return {**entry["task"], "seq": entry["seq"]}
+
+    def confirm_delivered(self, device_id: str, cursor: int) -> None:
+        with self._lock:
+            for entry in self._tasks.values():
+                if entry["device_id"] == device_id and entry["seq"] == cursor and entry["attempts"] > 0:
+                    entry["delivered"] = True
+
+    def ack(self, task_id: str) -> None:
+        with self._lock:
+            self._tasks.pop(task_id, None)
+
+    def pending_count(self, device_id: str) -> int:
+        with self._lock:
+            return sum(
+                1 for e in self._tasks.values()
+                if e["device_id"] == device_id and e["attempts"] < MAX_DELIVERY_ATTEMPTS
+            )
+
+    def set_result(self, task_id: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._results[task_id] = (dict(result), time.time())
+            self._tasks.pop(task_id, None)
+        self._notify_result(task_id)
+
+    def get_result(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._results.get(task_id)
+            return dict(entry[0]) if entry else None
+
+    def put_pairing_code(self, code: str, data: Dict[str, Any]) -> None:
+        with self._lock:
+            self._pairing_codes[code] = dict(data)
+
+    def get_pairing_code(self, code: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            data = self._pairing_codes.get(code)
+            return dict(data) if data else None
+
+    def mark_pairing_code_used(self, code: str) -> bool:
+        with self._lock:
+            data = self._pairing_codes.get(code)
+            if not data or data.get("used"):
+                return False
+            data["used"] = True
+            return True
+
+    def purge_expired(self) -> None:
+        from datetime import datetime
+
+        now = time.time()
+        now_iso = datetime.now().isoformat()
+        with self._lock:
+            self._results = {k: v for k, v in self._results.items() if v[1] >= now - RESULT_TTL}
+            self._tasks = {
+                k: e for k, e in self._tasks.items()
+                if (e["delivered"] and e["enqueued_at"] >= now - RESULT_TTL)
+                or (not e["delivered"] and (e["attempts"] < MAX_DELIVERY_ATTEMPTS or e["visible_at"] >= now))
+            }
+            self._pairing_codes = {
+                c: d for c, d in self._pairing_codes.items()
+                if not d.get("used") and d["expires_at"] >= now_iso
+            }
+
+
+# ==================== GLOBAL INSTANCE ====================
+
+_queue_instance: Optional[TaskQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_task_queue() -> TaskQueue:
+    """Get or create the process-wide task queue."""
+    global _queue_instance
+    if _queue_instance is None:
+        with _queue_lock:
+            if _queue_instance is None:
+                backend = os.getenv("AGENT_QUEUE_BACKEND", "sqlite").lower()
+                if backend == "memory":
+                    _queue_instance = MemoryTaskQueue()
+                else:
+                    try:
+                        _queue_instance = SQLiteTaskQueue()
+                    except sqlite3.Error as e:
+                        print(f"[AGENT_QUEUE] ⚠️ SQLite queue unavailable ({e}), using in-memory queue")
+                        _queue_instance = MemoryTaskQueue()
+                print(f"[AGENT_QUEUE] Using {type(_queue_instance).__name__}")
+    return _queue_instance
@@ -3,16 +3,30 @@ Agent WebSocket Handler
 =======================
 Real-time WebSocket connection for Local Agent communication.
 Replaces polling with instant task delivery.
+
+The server runs on one long-lived event loop thread. Request threads hand
+tasks to it with send_task_threadsafe()/send_task_sync(); each connected
+device has a bounded outbound queue drained by its own writer task, so a
+slow device never holds up sends to the others.
+
+Connections negotiate permessage-deflate and, when both ends have msgpack,
+binary MessagePack frames; large messages are chunked (see WireCodec).
 """
 
 import asyncio
+import concurrent.futures
 import json
 import logging
+import threading
 from datetime import datetime
-from typing import Dict, Set, Optional
+from typing import Dict, Set, Optional, List, Tuple
 import websockets
 from websockets.server import WebSocketServerProtocol
 
+from Backend.WireCodec import (
+    ENCODING_JSON, FrameDecoder, choose_encoding, encode, to_jsonable
+)
+
 logger = logging.getLogger("AgentWebSocket")
 
 # Connected agents: {device_id: websocket_connection}
@@ -24,6 +38,71 @@ _pending_tasks: Dict[str, list] = {}
 # Task results callback
 _task_result_callbacks: Dict[str, callable] = {}
 
+# Outbound message queues per connected device: {device_id: asyncio.Queue}
+# Items are (encoded_frames, task_to_requeue_or_None)
+_outbound_queues: Dict[str, asyncio.Queue] = {}
+
+# Negotiated frame encoding per connected device: {device_id: "json" | "msgpack"}
+_device_encodings: Dict[str, str] = {}
+
+OUTBOUND_QUEUE_SIZE = 256   # per-device backlog before sends are refused (backpressure)
+FLUSH_BATCH_SIZE = 32       # messages written per writer wake-up
+SEND_TIMEOUT = 2.0          # seconds send_task_sync waits for the loop to accept a task
+
+# Dedicated event loop shared by the server and all cross-thread sends
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Return the agent WebSocket event loop, starting its thread on first use."""
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            
+            def run_loop():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+            
+            _loop_thread = threading.Thread(target=run_loop, name="AgentWebSocketLoop", daemon=True)
+            _loop_thread.start()
+            ready.wait()
+            _loop = loop
+        return _loop
+
+
+def _task_frames(device_id: str, task_id: str, command: str, params: dict) -> list:
+    return encode({
+        "type": "task",
+        "task_id": task_id,
+        "command": command,
+        "params": params
+    }, _device_encodings.get(device_id, ENCODING_JSON))
+
+
+async def _send_message(device_id: str, websocket: WebSocketServerProtocol, message: dict):
+    """Encode a message with the device's negotiated encoding and send its frames."""
+    for frame in encode(message, _device_encodings.get(device_id, ENCODING_JSON)):
+        await websocket.send(frame)
+
+
+def _requeue_undelivered(device_id: str, items: List[Tuple[list, Optional[dict]]]):
+    """Hand tasks that never reached the socket back to the polling queue."""
+    tasks = [task for _, task in items if task]
+    if not tasks:
+        return
+    try:
+        from Backend.LocalAgentAPI import enqueue_task
+        for task in tasks:
+            enqueue_task(device_id, task)
+        logger.info(f"[WS-AGENT] Re-queued {len(tasks)} undelivered task(s) for polling: {device_id[:8]}...")
+    except Exception as e:
+        logger.error(f"[WS-AGENT] Re-queue error: {e}")
+
 
 class AgentWebSocketServer:
     """WebSocket server for Local Agent connections."""
@@ -36,6 +115,8 @@ class AgentWebSocketServer:
     async def handler(self, websocket: WebSocketServerProtocol):
         """Handle incoming WebSocket connections from agents."""
         device_id = None
+        outbound = None
+        writer = None
         
         try:
             # Wait for authentication message
@@ -60,23 +141,36 @@ class AgentWebSocketServer:
                 }))
                 return
             
-            # Register connection
+            # Register connection with its own outbound queue and writer
+            encoding = choose_encoding(auth_data.get("encodings"))
+            outbound = asyncio.Queue(maxsize=OUTBOUND_QUEUE_SIZE)
+            _device_encodings[device_id] = encoding
             _connected_agents[device_id] = websocket
+            _outbound_queues[device_id] = outbound
+            writer = asyncio.ensure_future(self._outbound_writer(device_id, websocket, outbound))
             logger.info(f"[WS-AGENT] ✅ Device connected: {device_id[:8]}...")
             
-            # Send auth success
+            # Send auth success (always JSON; later frames use `encoding`)
             await websocket.send(json.dumps({
                 "type": "auth_success",
                 "message": f"Connected as {device_id[:8]}...",
+                "encoding": encoding,
                 "server_time": datetime.now().isoformat()
             }))
             
             # Send any pending tasks immediately
-            await self._flush_pending_tasks(device_id, websocket)
+            await self._flush_pending_tasks(device_id, outbound)
             
             # Main message loop
+            decoder = FrameDecoder()
             async for message in websocket:
-                await self._handle_message(device_id, websocket, message)
+                try:
+                    data = decoder.feed(message)
+                except ValueError as e:
+                    logger.warning(f"[WS-AGENT] Invalid frame from {device_id[:8]}...: {e}")
+                    continue
+                if data is not None:
+                    await self._handle_message(device_id, websocket, data)
                 
         except websockets.exceptions.ConnectionClosed:
             logger.info(f"[WS-AGENT] Device disconnected: {device_id[:8] if device_id else 'unknown'}...")
@@ -85,9 +179,19 @@ class AgentWebSocketServer:
         except Exception as e:
             logger.error(f"[WS-AGENT] Handler error: {e}")
         finally:
-            # Cleanup
-            if device_id and device_id in _connected_agents:
+            # Cleanup (a reconnect may already have replaced this connection)
+            if writer:
+                writer.cancel()
+            if device_id and _connected_agents.get(device_id) is websocket:
                 del _connected_agents[device_id]
+                _device_encodings.pop(device_id, None)
+            if outbound is not None:
+                if _outbound_queues.get(device_id) is outbound:
+                    del _outbound_queues[device_id]
+                leftover = []
+                while not outbound.empty():
+                    leftover.append(outbound.get_nowait())
+                _requeue_undelivered(device_id, leftover)
                 
     async def _validate_device(self, device_id: str, auth_token: str) -> bool:
         """Validate device credentials against LocalAgentAPI registry."""
@@ -114,29 +218,45 @@ class AgentWebSocketServer:
             
         return False
         
-    async def _flush_pending_tasks(self, device_id: str, websocket: WebSocketServerProtocol):
-        """Send any pending tasks to the newly connected device."""
+    async def _flush_pending_tasks(self, device_id: str, outbound: asyncio.Queue):
+        """Hand any pending tasks for the newly connected device to its writer."""
         try:
-            from Backend.LocalAgentAPI import _pending_tasks as api_pending_tasks
+            from Backend.LocalAgentAPI import _task_queue
             
-            tasks = api_pending_tasks.get(device_id, [])
-            for task in tasks[:]:  # Copy list to allow modification
-                await websocket.send(json.dumps({
-                    "type": "task",
-                    "task_id": task['task_id'],
-                    "command": task['command'],
-                    "params": task['params']
-                }))
-                tasks.remove(task)
-                logger.info(f"[WS-AGENT] Flushed pending task to {device_id[:8]}...")
+            # Claimed tasks are acked when the agent reports their result; if
+            # the socket drops first they reappear after the visibility timeout
+            loop = asyncio.get_event_loop()
+            tasks = await loop.run_in_executor(None, _task_queue.claim_all, device_id)
+            for task in tasks:
+                await outbound.put((_task_frames(device_id, task['task_id'], task['command'], task['params']), None))
+            if tasks:
+                logger.info(f"[WS-AGENT] Flushed {len(tasks)} pending task(s) to {device_id[:8]}...")
                 
         except Exception as e:
             logger.error(f"[WS-AGENT] Flush error: {e}")
+    
+    async def _outbound_writer(self, device_id: str, websocket: WebSocketServerProtocol, outbound: asyncio.Queue):
+        """Drain a device's outbound queue, writing up to FLUSH_BATCH_SIZE messages per wake-up."""
+        batch = []
+        try:
+            while True:
+                batch = [await outbound.get()]
+                while len(batch) < FLUSH_BATCH_SIZE and not outbound.empty():
+                    batch.append(outbound.get_nowait())
+                while batch:
+                    for frame in batch[0][0]:
+                        await websocket.send(frame)
+                    batch.pop(0)
+        except asyncio.CancelledError:
+            _requeue_undelivered(device_id, batch)
+        except Exception as e:
+            logger.error(f"[WS-AGENT] Send to {device_id[:8]}... failed: {e}")
+            _requeue_undelivered(device_id, batch)
+            await websocket.close()
             
-    async def _handle_message(self, device_id: str, websocket: WebSocketServerProtocol, message: str):
-        """Handle incoming message from agent."""
+    async def _handle_message(self, device_id: str, websocket: WebSocketServerProtocol, data: dict):
+        """Handle a decoded message from agent."""
         try:
-            data = json.loads(message)
             msg_type = data.get("type")
             
             if msg_type == "heartbeat":
@@ -144,33 +264,34 @@ class AgentWebSocketServer:
                 from Backend.LocalAgentAPI import _registered_devices
                 if device_id in _registered_devices:
                     _registered_devices[device_id]['last_seen'] = datetime.now().isoformat()
-                await websocket.send(json.dumps({
+                await _send_message(device_id, websocket, {
                     "type": "heartbeat_ack",
                     "server_time": datetime.now().isoformat()
-                }))
+                })
                 
             elif msg_type == "result":
                 # Task result from agent
                 task_id = data.get("task_id")
                 status = data.get("status", "unknown")
-                result = data.get("result", {})
+                # Binary payloads (e.g. screenshot bytes) are stored base64-encoded
+                result = to_jsonable(data.get("result", {}))
                 
                 # Store result
-                from Backend.LocalAgentAPI import _task_results
-                _task_results[task_id] = {
+                from Backend.LocalAgentAPI import record_task_result
+                record_task_result(task_id, {
                     "device_id": device_id,
                     "status": status,
                     "result": result,
                     "reported_at": datetime.now().isoformat()
-                }
+                })
                 
                 logger.info(f"[WS-AGENT] Task {task_id[:8]}... result: {status}")
                 
                 # Acknowledge
-                await websocket.send(json.dumps({
+                await _send_message(device_id, websocket, {
                     "type": "result_ack",
                     "task_id": task_id
-                }))
+                })
                 
                 # Call any registered callback
                 if task_id in _task_result_callbacks:
@@ -181,10 +302,8 @@ class AgentWebSocketServer:
                         pass
                         
             elif msg_type == "ping":
-                await websocket.send(json.dumps({"type": "pong"}))
+                await _send_message(device_id, websocket, {"type": "pong"})
                 
-        except json.JSONDecodeError:
-            logger.warning(f"[WS-AGENT] Invalid JSON from {device_id[:8]}...")
         except Exception as e:
             logger.error(f"[WS-AGENT] Message handling error: {e}")
             
@@ -193,15 +312,16 @@ class AgentWebSocketServer:
         self.server = await websockets.serve(
             self.handler,
             self.host,
-            self.port
+            self.port,
+            compression="deflate"
         )
         logger.info(f"[WS-AGENT] ✅ Agent WebSocket server started on ws://{self.host}:{self.port}")
         await self.server.wait_closed()
         
     def stop(self):
-        """Stop the WebSocket server."""
-        if self.server:
-            self.server.close()
+        """Stop the WebSocket server (safe to call from any thread)."""
+        if self.server and _loop and not _loop.is_closed():
+            _loop.call_soon_threadsafe(self.server.close)
 
 
 # ==================== PUBLIC API ====================
@@ -216,48 +336,54 @@ def is_agent_connected(device_id: str) -> bool:
     return device_id in _connected_agents
 
 
-async def send_task_to_agent(device_id: str, task_id: str, command: str, params: dict) -> bool:
+async def send_task_to_agent(device_id: str, task_id: str, command: str, params: dict,
+                             task: Optional[dict] = None) -> bool:
     """
-    Send a task to a connected agent via WebSocket.
+    Queue a task on a connected agent's outbound queue (must run on the agent loop).
     
-    Returns True if sent successfully, False if agent not connected.
+    Returns False if the agent is not connected or its queue is full, so the
+    caller can fall back to the polling queue. `task` is re-queued for polling
+    if the connection drops before the message is written.
     """
-    websocket = _connected_agents.get(device_id)
-    if not websocket:
+    outbound = _outbound_queues.get(device_id)
+    if outbound is None:
         return False
         
     try:
-        await websocket.send(json.dumps({
-            "type": "task",
-            "task_id": task_id,
-            "command": command,
-            "params": params
-        }))
-        logger.info(f"[WS-AGENT] Task {task_id[:8]}... sent to {device_id[:8]}...")
+        outbound.put_nowait((_task_frames(device_id, task_id, command, params), task))
+        logger.info(f"[WS-AGENT] Task {task_id[:8]}... queued for {device_id[:8]}...")
         return True
-    except Exception as e:
-        logger.error(f"[WS-AGENT] Failed to send task: {e}")
-        # Remove dead connection
-        if device_id in _connected_agents:
-            del _connected_agents[device_id]
+    except asyncio.QueueFull:
+        logger.warning(f"[WS-AGENT] Outbound queue full for {device_id[:8]}... - falling back to polling")
         return False
 
 
-def send_task_sync(device_id: str, task_id: str, command: str, params: dict) -> bool:
-    """Synchronous wrapper for send_task_to_agent."""
+def send_task_threadsafe(device_id: str, task_id: str, command: str, params: dict,
+                         task: Optional[dict] = None) -> concurrent.futures.Future:
+    """
+    Submit a task to the agent event loop from any thread.
+    
+    Returns a concurrent.futures.Future resolving to the send_task_to_agent() result.
+    """
+    if _loop is None or _loop.is_closed() or device_id not in _connected_agents:
+        future = concurrent.futures.Future()
+        future.set_result(False)
+        return future
+    return asyncio.run_coroutine_threadsafe(
+        send_task_to_agent(device_id, task_id, command, params, task), _loop
+    )
+
+
+def send_task_sync(device_id: str, task_id: str, command: str, params: dict,
+                   task: Optional[dict] = None, timeout: float = SEND_TIMEOUT) -> bool:
+    """Blocking wrapper for send_task_threadsafe; True once the agent loop accepted the task."""
+    future = send_task_threadsafe(device_id, task_id, command, params, task)
     try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # Schedule as a task (non-blocking)
-            asyncio.ensure_future(send_task_to_agent(device_id, task_id, command, params))
-            return True
-        else:
-            return loop.run_until_complete(send_task_to_agent(device_id, task_id, command, params))
-    except Exception:
-        # Create new loop if needed
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        return loop.run_until_complete(send_task_to_agent(device_id, task_id, command, params))
+        return future.result(timeout=timeout)
+    except Exception as e:
+        future.cancel()
+        logger.error(f"[WS-AGENT] Failed to send task: {e}")
+        return False
 
 
 # ==================== SERVER STARTUP ====================
@@ -269,14 +395,12 @@ def start_agent_websocket_server(host: str = "0.0.0.0", port: int = 8766):
     """Start the agent WebSocket server in a background thread."""
     global _server_instance
     
-    def run_server():
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        _server_instance = AgentWebSocketServer(host, port)
-        loop.run_until_complete(_server_instance.start())
-        
-    import threading
-    server_thread = threading.Thread(target=run_server, daemon=True)
-    server_thread.start()
+    loop = _get_loop()
+    _server_instance = AgentWebSocketServer(host, port)
+    future = asyncio.run_coroutine_threadsafe(_server_instance.start(), loop)
+    future.add_done_callback(
+        lambda f: f.cancelled() or f.exception() is None
+        or logger.error(f"[WS-AGENT] Server stopped: {f.exception()}")
+    )
     logger.info(f"[WS-AGENT] Server thread started")
-    return server_thread
+    return _loop_thread
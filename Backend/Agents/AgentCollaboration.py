@@ -5,6 +5,9 @@ Allows agents to discover, communicate with, and delegate tasks to each other.
 """
 
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from typing import Dict, List, Any, Optional, Callable
 from datetime import datetime
 from collections import defaultdict
@@ -12,6 +15,10 @@ from collections import defaultdict
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+COLLAB_MAX_WORKERS = 4       # capabilities running at once in a collaborative task
+COLLAB_AGENT_TIMEOUT = 120   # seconds each agent gets (from when it starts) before its result is abandoned
+COLLAB_POLL_INTERVAL = 1.0   # seconds between checks for capabilities that have just started
+
 
 class AgentCollaboration:
     """
@@ -24,6 +31,8 @@ class AgentCollaboration:
         self.messages = defaultdict(list)  # Inter-agent messages
         self.shared_context = {}  # Shared memory/context
         self.delegations = []  # Track delegation history
+        self._agent_locks = defaultdict(threading.Lock)  # one task per agent instance at a time
+        self._abandoned_agents = set()  # agents still running a timed-out task (they hold their lock)
         logger.info("[COLLABORATION] Agent collaboration system initialized")
     
     def register_agent(self, agent_id: str, agent_instance: Any, capabilities: List[str]) -> bool:
@@ -245,14 +254,25 @@ class AgentCollaboration:
         return None
     
     def collaborative_task(self, task: str, required_capabilities: List[str],
-                          coordinator: str = "orchestrator") -> Dict[str, Any]:
+                          coordinator: str = "orchestrator",
+                          depends_on: Dict[str, List[str]] = None,
+                          timeout: float = COLLAB_AGENT_TIMEOUT) -> Dict[str, Any]:
         """
         Execute a task requiring multiple agents to collaborate.
         
+        Capabilities run concurrently unless depends_on says otherwise; a
+        capability listed there starts once the capabilities it consumes
+        have finished, so their result_* keys are in shared_context.
+        Capabilities depending on one that failed (no agent, error or
+        timeout) are skipped, with the failure named in their message.
+        
         Args:
             task: Complex task description
             required_capabilities: List of capabilities needed
             coordinator: Agent coordinating the task
+            depends_on: Capability -> capabilities whose results it reads
+            timeout: Seconds each agent gets, counted from when it starts
+                     working, before its result is abandoned
             
         Returns:
             Combined results from all agents
@@ -260,41 +280,112 @@ class AgentCollaboration:
         try:
             logger.info(f"[COLLABORATION] Collaborative task: {task[:50]}...")
             
-            results = []
+            dependencies = self._resolve_dependencies(required_capabilities, depends_on or {})
+            results: List[Optional[Dict[str, Any]]] = [None] * len(required_capabilities)
+            pending = list(range(len(required_capabilities)))
+            running = {}  # future -> (index, agent_id)
+            started = {}  # index -> monotonic time the agent began (set by the worker)
+            
+            def skip_dependents(failed: int, reason: str):
+                blocked = [failed]
+                while blocked:
+                    parent = blocked.pop()
+                    for index in [i for i in pending if parent in dependencies[i]]:
+                        pending.remove(index)
+                        results[index] = {
+                            "capability": required_capabilities[index],
+                            "status": "skipped",
+                            "message": f"Skipped: '{required_capabilities[failed]}' {reason}"
+                        }
+                        blocked.append(index)
             
-            # Execute subtasks with appropriate agents
-            for capability in required_capabilities:
-                agents = self.discover_all_agents(capability)
-                
-                if not agents:
-                    results.append({
-                        "capability": capability,
-                        "status": "error",
-                        "message": f"No agent found for {capability}"
-                    })
-                    continue
-                
-                # Use first available agent
-                agent_id = agents[0]
-                result = self.request_help(
-                    coordinator,
-                    agent_id,
-                    f"{capability} for task: {task}",
-                    {"shared_context": self.shared_context}
-                )
-                
-                results.append({
-                    "capability": capability,
-                    "agent": agent_id,
-                    "result": result
-                })
-                
-                # Share result in context for next agent
-                self.set_shared_context(
-                    f"result_{capability}",
-                    result.get("output"),
-                    agent_id
-                )
+            executor = ThreadPoolExecutor(
+                max_workers=max(1, min(len(required_capabilities), COLLAB_MAX_WORKERS)),
+                thread_name_prefix="collab"
+            )
+            try:
+                while pending or running:
+                    # Start every capability whose inputs are ready
+                    for index in [i for i in pending if all(results[d] is not None for d in dependencies[i])]:
+                        pending.remove(index)
+                        capability = required_capabilities[index]
+                        agents = self.discover_all_agents(capability)
+                        
+                        if not agents:
+                            results[index] = {
+                                "capability": capability,
+                                "status": "error",
+                                "message": f"No agent found for {capability}"
+                            }
+                            skip_dependents(index, "has no agent")
+                            continue
+                        
+                        # Use the first agent that isn't stuck on an abandoned task
+                        available = [a for a in agents if a not in self._abandoned_agents]
+                        if not available:
+                            results[index] = {
+                                "capability": capability,
+                                "status": "error",
+                                "message": f"Every agent for {capability} is still busy with a timed-out task"
+                            }
+                            skip_dependents(index, "has no available agent (all busy with timed-out tasks)")
+                            continue
+                        agent_id = available[0]
+                        future = executor.submit(self._run_capability, coordinator, agent_id,
+                                                 capability, task, index, started)
+                        running[future] = (index, agent_id)
+                    
+                    if not running:
+                        continue
+                    
+                    # Deadlines run from when each agent started, not from submission
+                    deadlines = [started[index] + timeout for index, _ in running.values() if index in started]
+                    wait_for = COLLAB_POLL_INTERVAL
+                    if deadlines:
+                        wait_for = min(wait_for, max(0, min(deadlines) - time.monotonic()))
+                    done, _ = wait(list(running), timeout=wait_for, return_when=FIRST_COMPLETED)
+                    
+                    for future in done:
+                        index, agent_id = running.pop(future)
+                        capability = required_capabilities[index]
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            result = {"status": "error", "message": str(e)}
+                        results[index] = {
+                            "capability": capability,
+                            "agent": agent_id,
+                            "result": result
+                        }
+                        if result.get("status") == "error":
+                            logger.warning(f"[COLLABORATION] {agent_id} failed on {capability}: {result.get('message')}")
+                            skip_dependents(index, f"failed: {result.get('message')}")
+                            continue
+                        
+                        # Share result in context for dependent agents
+                        self.set_shared_context(
+                            f"result_{capability}",
+                            result.get("output"),
+                            agent_id
+                        )
+                    
+                    now = time.monotonic()
+                    for future, (index, agent_id) in list(running.items()):
+                        if index in started and started[index] + timeout <= now:
+                            # The thread can't be stopped; steer later work away from this agent
+                            # until it finishes and releases its lock
+                            running.pop(future)
+                            self._abandoned_agents.add(agent_id)
+                            logger.warning(f"[COLLABORATION] {agent_id} timed out on {required_capabilities[index]}")
+                            results[index] = {
+                                "capability": required_capabilities[index],
+                                "agent": agent_id,
+                                "result": {"status": "error", "message": f"Timed out after {timeout}s"}
+                            }
+                            skip_dependents(index, f"timed out after {timeout}s")
+            finally:
+                # Don't wait on abandoned agents
+                executor.shutdown(wait=False, cancel_futures=True)
             
             return {
                 "status": "success",
@@ -311,6 +402,54 @@ class AgentCollaboration:
                 "message": str(e)
             }
     
+    def _resolve_dependencies(self, capabilities: List[str],
+                              depends_on: Dict[str, List[str]]) -> List[List[int]]:
+        """Map depends_on to capability indexes, rejecting unknown names and cycles."""
+        index_of = {}
+        for i, capability in enumerate(capabilities):
+            index_of.setdefault(capability, i)
+        
+        dependencies = []
+        for capability in capabilities:
+            needs = depends_on.get(capability) or []
+            if isinstance(needs, str):
+                needs = [needs]
+            unknown = [n for n in needs if n not in index_of]
+            if unknown:
+                raise ValueError(f"'{capability}' depends on capabilities not in the task: {unknown}")
+            dependencies.append([index_of[n] for n in needs])
+        
+        # Every capability must be reachable without waiting on itself
+        resolved = set()
+        while len(resolved) < len(capabilities):
+            ready = [i for i in range(len(capabilities))
+                     if i not in resolved and all(d in resolved for d in dependencies[i])]
+            if not ready:
+                raise ValueError("Capability dependencies form a cycle")
+            resolved.update(ready)
+        
+        return dependencies
+    
+    def _run_capability(self, coordinator: str, agent_id: str, capability: str, task: str,
+                        index: int, started: Dict[int, float]) -> Dict[str, Any]:
+        # Agent instances keep per-run state, so one task per agent at a time.
+        # Queue behind healthy runs, but not behind one that has been abandoned.
+        lock = self._agent_locks[agent_id]
+        while not lock.acquire(timeout=COLLAB_POLL_INTERVAL):
+            if agent_id in self._abandoned_agents:
+                return {"status": "error", "message": f"{agent_id} is still busy with a timed-out task"}
+        try:
+            started[index] = time.monotonic()
+            return self.request_help(
+                coordinator,
+                agent_id,
+                f"{capability} for task: {task}",
+                {"shared_context": dict(self.shared_context)}
+            )
+        finally:
+            self._abandoned_agents.discard(agent_id)
+            lock.release()
+    
     def get_collaboration_stats(self) -> Dict[str, Any]:
         """Get collaboration statistics."""
         return {
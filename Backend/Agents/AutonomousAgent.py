@@ -7,7 +7,9 @@ Agents can think, use tools, observe results, and self-correct.
 
 import logging
 import json
+import re
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional, Callable, Union
 from datetime import datetime
 from enum import Enum
@@ -20,6 +22,11 @@ from Backend.Agents.BaseAgent import BaseAgent
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+MAX_ACTIONS_PER_STEP = 5     # independent tool calls accepted from one reasoning step
+TOOL_MAX_WORKERS = 8         # shared pool for concurrent tool calls across agents
+
+_tool_executor = ThreadPoolExecutor(max_workers=TOOL_MAX_WORKERS, thread_name_prefix="agent-tool")
+
 class AgentState(Enum):
     IDLE = "idle"
     THINKING = "thinking"
@@ -30,11 +37,12 @@ class AgentState(Enum):
 
 class Tool:
     """Represents a tool effectively usable by an agent."""
-    def __init__(self, name: str, func: Callable, description: str, parameters: str):
+    def __init__(self, name: str, func: Callable, description: str, parameters: str, read_only: bool = False):
         self.name = name
         self.func = func
         self.description = description
         self.parameters = parameters  # JSON schema or text description
+        self.read_only = read_only  # no side effects, same input -> same result; safe to reuse
 
     def run(self, **kwargs):
         return self.func(**kwargs)
@@ -51,10 +59,12 @@ class AutonomousAgent(BaseAgent):
         self.state = AgentState.IDLE
         self.max_steps = 10
         self.short_term_memory = [] # Conversation history
+        self.cancel_event = None  # threading.Event set by the swarm to stop between steps
         
-    def register_tool(self, name: str, func: Callable, description: str, parameters: str = ""):
-        """Add a tool capability to this agent."""
-        self.tools[name] = Tool(name, func, description, parameters)
+    def register_tool(self, name: str, func: Callable, description: str, parameters: str = "",
+                      read_only: bool = False):
+        """Add a tool capability to this agent (read_only tools have their results reused within a run)."""
+        self.tools[name] = Tool(name, func, description, parameters, read_only)
         logger.info(f"[{self.name}] Registered tool: {name}")
 
     def _format_tools_prompt(self) -> str:
@@ -77,16 +87,17 @@ You utilize the ReAct (Reasoning + Acting) pattern to solve tasks.
 For every step, you must output a response in this EXACT format:
 
 THOUGHT: [Your reasoning about the current state and what to do next]
-ACTION: [The tool to use, format: tool_name(param=value)] OR [FINAL_ANSWER: your final response]
+ACTION: [JSON list of tool calls, e.g. [{{"tool": "tool_name", "input": "value"}}]] OR [FINAL_ANSWER: your final response]
 
 {self._format_tools_prompt()}
 
 Guidelines:
 1. ANALYZE the task deeply before acting.
 2. USE TOOLS to gather information or perform actions. don't guess.
-3. OBSERVE tool outputs to inform your next thought.
-4. If a tool fails, THOUGHT should analyze why and try a different approach.
-5. When finished, use FINAL_ANSWER.
+3. Put independent tool calls (e.g. several searches) in ONE action list - they run in parallel.
+4. OBSERVE tool outputs to inform your next thought.
+5. If a tool fails, THOUGHT should analyze why and try a different approach.
+6. When finished, use FINAL_ANSWER.
 """
 
     def _parse_action(self, llm_response: str) -> tuple[Optional[str], Optional[Dict]]:
@@ -115,7 +126,6 @@ Guidelines:
             # or we pass the raw string if the tool handles it.
             
             # Temporary: simple text extraction of content between parentheses
-            import re
             params_match = re.search(r'\((.*)\)', action_line, re.DOTALL)
             params_str = params_match.group(1) if params_match else ""
             
@@ -127,9 +137,93 @@ Guidelines:
             logger.error(f"[{self.name}] Parse error: {e}")
             return None, None
 
+    def _parse_actions(self, llm_response: str) -> List[tuple]:
+        """
+        Parse every tool call in the ACTION section.
+        
+        Accepts the structured JSON form (a single object or a list of
+        {"tool": ..., "input": ...}) and falls back to _parse_action for the
+        legacy tool_name(...) form. Returns [("FINAL_ANSWER", {...})] when done.
+        """
+        if "ACTION:" not in llm_response:
+            return []
+        
+        action_text = llm_response.split("ACTION:", 1)[1].strip()
+        if action_text.startswith("FINAL_ANSWER:"):
+            return [self._parse_action(llm_response)]
+        
+        match = re.match(r'(\[.*\]|\{.*\})', action_text, re.DOTALL)
+        if match:
+            try:
+                calls = json.loads(match.group(1))
+                if isinstance(calls, dict):
+                    calls = [calls]
+                actions = []
+                for call in calls[:MAX_ACTIONS_PER_STEP]:
+                    tool_name = call.get("tool") or call.get("name")
+                    if tool_name not in self.tools:
+                        continue
+                    tool_input = call.get("input", call.get("params", call.get("args", "")))
+                    if isinstance(tool_input, dict):
+                        # Single-argument tools take the bare value
+                        tool_input = next(iter(tool_input.values())) if len(tool_input) == 1 else json.dumps(tool_input)
+                    actions.append((tool_name, {"raw_params": str(tool_input)}))
+                return actions
+            except (ValueError, AttributeError, TypeError):
+                pass
+        
+        tool_name, params = self._parse_action(llm_response)
+        return [(tool_name, params)] if tool_name else []
+    
+    @staticmethod
+    def _cache_key(tool_name: str, raw_params: str) -> tuple:
+        # search("x") and {"tool": "search", "input": "x"} are the same call
+        return (tool_name, raw_params.strip().strip('"').strip("'"))
+    
+    def _run_tool(self, tool_name: str, raw_params: str, cache: Dict[tuple, str]) -> str:
+        """Run one tool call, reusing identical read-only results from earlier in this run."""
+        tool = self.tools[tool_name]
+        key = self._cache_key(tool_name, raw_params)
+        if tool.read_only and key in cache:
+            return f"{cache[key]} (cached)"
+        try:
+            # Tools take the raw parameter string and parse it themselves
+            result = str(tool.run(params=raw_params))
+        except Exception as e:
+            return f"Tool execution failed. Error: {str(e)}"
+        if tool.read_only:
+            cache[key] = result
+        return result
+    
+    def _run_actions(self, actions: List[tuple], cache: Dict[tuple, str]) -> str:
+        """Run a step's tool calls (concurrently when there are several) and build the observation."""
+        if len(actions) == 1:
+            tool_name, params = actions[0]
+            return f"OBSERVATION: {self._run_tool(tool_name, params['raw_params'], cache)}"
+        
+        # Identical read-only calls within the step share one future
+        futures = {}
+        keys = []
+        for index, (tool_name, params) in enumerate(actions):
+            key = self._cache_key(tool_name, params["raw_params"])
+            if not self.tools[tool_name].read_only:
+                key = (index,) + key
+            if key not in futures:
+                futures[key] = _tool_executor.submit(self._run_tool, tool_name, params["raw_params"], cache)
+            keys.append(key)
+        
+        parts = []
+        for index, ((tool_name, params), key) in enumerate(zip(actions, keys), 1):
+            result = futures[key].result()
+            parts.append(f"OBSERVATION [{index}] {tool_name}({params['raw_params'][:80]}):\n{result}")
+        return "\n\n".join(parts)
+
     def execute(self, task: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
         """
         Run the ReAct loop.
+        
+        Each step may request several independent tool calls; they run
+        concurrently and identical calls within the run are served from cache.
         """
         logger.info(f"[{self.name}] Starting ReAct loop for: {task[:50]}...")
         self.state = AgentState.THINKING
@@ -140,8 +234,12 @@ Guidelines:
         
         step_count = 0
         final_output = ""
+        tool_cache: Dict[tuple, str] = {}
         
         while step_count < self.max_steps:
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                logger.info(f"[{self.name}] Cancelled after {step_count} steps")
+                break
             step_count += 1
             
             # 1. THINK & DECIDE
@@ -153,24 +251,18 @@ Guidelines:
                 logger.info(f"[{self.name}] Step {step_count} Thought: {response[:100]}...")
                 
                 # 2. ACT
-                tool_name, params = self._parse_action(response)
+                actions = self._parse_actions(response)
                 
-                if tool_name == "FINAL_ANSWER":
-                    final_output = params["output"]
+                if actions and actions[0][0] == "FINAL_ANSWER":
+                    final_output = actions[0][1]["output"]
                     self.state = AgentState.DONE
                     break
                     
-                if tool_name and tool_name in self.tools:
+                if actions:
                     self.state = AgentState.ACTING
-                    logger.info(f"[{self.name}] Executing {tool_name}...")
+                    logger.info(f"[{self.name}] Executing {[name for name, _ in actions]}...")
                     
-                    try:
-                        # For now, pass raw params and let tool handle parsing or pass as specific arg
-                        # This needs to be refined per tool signature
-                        tool_result = self.tools[tool_name].run(params=params["raw_params"])
-                        observation = f"OBSERVATION: {str(tool_result)}"
-                    except Exception as e:
-                        observation = f"OBSERVATION: Tool execution failed. Error: {str(e)}"
+                    observation = self._run_actions(actions, tool_cache)
                         
                     self.state = AgentState.OBSERVING
                     self.short_term_memory.append({"role": "user", "content": observation})
@@ -6,13 +6,13 @@ Uses a feedback loop: Write -> Run -> Fix -> Verify.
 """
 
 from Backend.Agents.AutonomousAgent import AutonomousAgent
-import sys
-import io
-import traceback
 import logging
 
 logger = logging.getLogger(__name__)
 
+EXECUTION_TIMEOUT = 10  # seconds
+MAX_OUTPUT = 10000
+
 class CoderAgent(AutonomousAgent):
     """
     Autonomous ReAct agent for coding tasks.
@@ -58,29 +58,14 @@ class CoderAgent(AutonomousAgent):
             if bad in code and "import os.path" not in code: # Allow os.path? Maybe strict for now
                  return f"Security Error: Operation '{bad}' is not allowed."
 
-        # Capture output
-        old_stdout = sys.stdout
-        old_stderr = sys.stderr
-        redirected_output = sys.stdout = io.StringIO()
-        redirected_error = sys.stderr = io.StringIO()
-
-        try:
-            # Restricted globals
-            safe_globals = {
-                "print": print, "range": range, "len": len, "int": int, "str": str, 
-                "list": list, "dict": dict, "set": set, "tuple": tuple, "bool": bool,
-                "sum": sum, "min": min, "max": max, "abs": abs, "sorted": sorted,
-                "enumerate": enumerate, "zip": zip, "map": map, "filter": filter
-            }
-            exec(code, safe_globals)
-            out = redirected_output.getvalue()
-            err = redirected_error.getvalue()
-            return f"OUTPUT:\n{out}\nERRORS:\n{err}" if err else f"OUTPUT:\n{out}"
-            
-        except Exception as e:
-            return f"RUNTIME ERROR:\n{traceback.format_exc()}"
-        finally:
-            sys.stdout = old_stdout
-            sys.stderr = old_stderr
+        # Run in the shared sandbox worker pool (killed on timeout, resource-limited)
+        from Backend.CodeExecutor import get_sandbox_pool
+        result = get_sandbox_pool().run(code, timeout=EXECUTION_TIMEOUT, max_output=MAX_OUTPUT)
+        
+        out = result.get("output", "")
+        err = result.get("stderr", "")
+        if result.get("status") != "success":
+            return f"RUNTIME ERROR:\n{result.get('traceback') or result.get('error')}"
+        return f"OUTPUT:\n{out}\nERRORS:\n{err}" if err else f"OUTPUT:\n{out}"
 
 coder_agent = CoderAgent()
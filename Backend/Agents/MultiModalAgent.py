@@ -36,8 +36,8 @@ class MultiModalAgent(BaseAgent):
         """Lazy load Vision Service."""
         if self._vision_service is None:
             try:
-                from Backend.VisionService import VisionService
-                self._vision_service = VisionService()
+                from Backend.VisionService import get_vision_service
+                self._vision_service = get_vision_service()
             except Exception as e:
                 logger.error(f"[MULTIMODAL-AGENT] Failed to load VisionService: {e}")
         return self._vision_service
@@ -193,16 +193,16 @@ Enhanced insights:"""
             return "Vision service not available"
         
         try:
-            # Analyze each image
-            analyses = []
-            for i, img in enumerate(images[:5]):  # Limit to 5 images
-                result = self.vision_service.analyze_image(
-                    img,
-                    prompt="Describe this image concisely focusing on key visual elements."
-                )
-                
-                if result.get("status") == "success":
-                    analyses.append(f"Image {i+1}: {result.get('analysis', 'N/A')}")
+            # Analyze images concurrently (limit to 5 images)
+            results = self.vision_service.analyze_batch(
+                images[:5],
+                prompt="Describe this image concisely focusing on key visual elements."
+            )
+            analyses = [
+                f"Image {i+1}: {result.get('analysis', 'N/A')}"
+                for i, result in enumerate(results)
+                if result.get("status") == "success"
+            ]
             
             # Compare with LLM
             if self.llm and analyses:
@@ -235,16 +235,16 @@ Comparison (similarities, differences, insights):"""
             return "Vision service not available"
         
         try:
-            # Analyze each image in sequence
-            sequence_analysis = []
-            for i, img in enumerate(images[:10]):
-                result = self.vision_service.analyze_image(
-                    img,
-                    prompt="Describe what's happening in this image."
-                )
-                
-                if result.get("status") == "success":
-                    sequence_analysis.append(f"Step {i+1}: {result.get('analysis', 'N/A')}")
+            # Analyze frames concurrently; results keep sequence order
+            results = self.vision_service.analyze_batch(
+                images[:10],
+                prompt="Describe what's happening in this image."
+            )
+            sequence_analysis = [
+                f"Step {i+1}: {result.get('analysis', 'N/A')}"
+                for i, result in enumerate(results)
+                if result.get("status") == "success"
+            ]
             
             # Synthesize sequence understanding
             if self.llm and sequence_analysis:
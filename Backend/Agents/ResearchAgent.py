@@ -3,13 +3,134 @@ Research Agent - Autonomous Web Researcher
 ==========================================
 Uses the ReAct pattern to conduct deep web research.
 Can formulate multiple queries, read pages, and synthesize information autonomously.
+read_pages fetches several sources concurrently so they arrive in one observation.
 """
 
 from Backend.Agents.AutonomousAgent import AutonomousAgent, Tool
+import asyncio
+import json
 import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 
 logger = logging.getLogger(__name__)
 
+READ_PAGES_MAX_URLS = 5        # pages fetched per read_pages call
+PAGE_TIMEOUT = 10.0            # seconds per URL
+PAGE_CHAR_LIMIT = 6000         # extracted characters kept per page
+PAGE_MAX_BYTES = 2 * 1024 * 1024   # HTML bytes read per download
+PAGE_CACHE_SIZE = 256
+PAGE_CACHE_TTL = 900           # seconds
+
+_URL_PATTERN = re.compile(r'https?://[^\s,"\'\]]+')
+
+
+class PageCache:
+    """Small LRU+TTL cache of extracted page text, shared by all research runs."""
+    
+    def __init__(self, max_size: int = PAGE_CACHE_SIZE, ttl: float = PAGE_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._pages: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, url: str) -> Optional[str]:
+        with self._lock:
+            entry = self._pages.get(url)
+            if not entry:
+                return None
+            text, stored_at = entry
+            if time.time() - stored_at > self.ttl:
+                del self._pages[url]
+                return None
+            self._pages.move_to_end(url)
+            return text
+    
+    def set(self, url: str, text: str):
+        with self._lock:
+            self._pages[url] = (text, time.time())
+            self._pages.move_to_end(url)
+            while len(self._pages) > self.max_size:
+                self._pages.popitem(last=False)
+
+
+page_cache = PageCache()
+
+
+async def _fetch_pages(urls: List[str]) -> List[str]:
+    """
+    Fetch and extract URLs concurrently, each bounded by PAGE_TIMEOUT and
+    PAGE_MAX_BYTES. URLs (and redirect targets) that aren't public http(s)
+    are refused without being requested.
+    """
+    from Backend.BrowserPool import validate_public_url_async
+    from Backend.JarvisWebScraper import JarvisWebScraper
+    
+    # A private scraper keeps the aiohttp session on this event loop
+    scraper = JarvisWebScraper()
+    
+    async def fetch_one(url: str) -> str:
+        try:
+            await validate_public_url_async(url)
+            page = scraper.scrape_to_markdown(url, max_bytes=PAGE_MAX_BYTES, redirect_guard=validate_public_url_async)
+            return await asyncio.wait_for(page, timeout=PAGE_TIMEOUT)
+        except asyncio.TimeoutError:
+            return f"Error: Timed out after {PAGE_TIMEOUT:.0f}s"
+        except Exception as e:
+            return f"Error: {e}"
+    
+    try:
+        return await asyncio.gather(*(fetch_one(url) for url in urls))
+    finally:
+        await scraper.close()
+
+
+def read_urls(urls: List[str]) -> List[str]:
+    """Extracted text for each URL (cached pages are not re-fetched)."""
+    texts = {url: page_cache.get(url) for url in urls}
+    missing = [url for url, text in texts.items() if text is None]
+    
+    if missing:
+        try:
+            asyncio.get_running_loop()
+            in_loop = True
+        except RuntimeError:
+            in_loop = False
+        
+        if in_loop:
+            # Called from inside an event loop: run the batch on its own thread
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                fetched = pool.submit(asyncio.run, _fetch_pages(missing)).result()
+        else:
+            fetched = asyncio.run(_fetch_pages(missing))
+        
+        for url, text in zip(missing, fetched):
+            text = text[:PAGE_CHAR_LIMIT]
+            if not text.startswith("Error:"):
+                page_cache.set(url, text)
+            texts[url] = text
+    
+    return [texts[url] for url in urls]
+
+
+def _search_urls(query: str, limit: int) -> List[str]:
+    """Top result URLs for a query (DuckDuckGo, then Google CSE)."""
+    try:
+        from Backend.RealtimeSearchEngine import DuckDuckGoSearch, GoogleSearch
+        results = DuckDuckGoSearch(query, return_list=True) or []
+        urls = [r.get("href") for r in results if r.get("href")]
+        if not urls:
+            data = GoogleSearch(query, return_json=True)
+            urls = [item["link"] for item in data.get("items", []) if item.get("link")]
+        return urls[:limit]
+    except Exception as e:
+        logger.error(f"[RESEARCH] URL search failed: {e}")
+        return []
+
 class ResearchAgent(AutonomousAgent):
     """
     Autonomous ReAct agent for web research.
@@ -47,25 +168,58 @@ class ResearchAgent(AutonomousAgent):
             name="search", 
             func=search_tool, 
             description="Search Google/Web for a query.",
-            parameters="query: str"
+            parameters="query: str",
+            read_only=True
         )
         
         # Tool 2: Read Page (Deep scrape)
         def read_page(params: str):
             """Reader a specific URL. Params: url string"""
             url = params.strip('"').strip("'")
-            if self.scraper:
-                try:
-                    return self.scraper.scrape(url)
-                except Exception as e:
-                    return f"Scrape Error: {e}"
-            return "Scraper unavailable"
+            try:
+                return read_urls([url])[0]
+            except Exception as e:
+                return f"Scrape Error: {e}"
             
         self.register_tool(
             name="read_page",
             func=read_page,
             description="Read the content of a specific URL found in search results.",
-            parameters="url: str"
+            parameters="url: str",
+            read_only=True
+        )
+        
+        # Tool 3: Read several pages at once
+        def read_pages(params: str):
+            """Fetch several URLs (or the top results for a query) concurrently. Params: URLs or query"""
+            try:
+                parsed = json.loads(params)
+            except ValueError:
+                parsed = params
+            if isinstance(parsed, list):
+                urls = [str(u) for u in parsed]
+            else:
+                urls = _URL_PATTERN.findall(str(parsed))
+                if not urls:
+                    urls = _search_urls(str(parsed).strip('"').strip("'"), READ_PAGES_MAX_URLS)
+            
+            # De-duplicate, keep order
+            urls = list(dict.fromkeys(urls))[:READ_PAGES_MAX_URLS]
+            if not urls:
+                return "No URLs to read"
+            
+            sections = [
+                f"## SOURCE {i}: {url}\n{text}"
+                for i, (url, text) in enumerate(zip(urls, read_urls(urls)), 1)
+            ]
+            return "\n\n".join(sections)
+        
+        self.register_tool(
+            name="read_pages",
+            func=read_pages,
+            description=f"Read up to {READ_PAGES_MAX_URLS} pages in parallel - pass a list of URLs, or a search query to read its top results. Prefer this over several read_page calls.",
+            parameters="urls: list[str] | query: str",
+            read_only=True
         )
 
 # Global instance
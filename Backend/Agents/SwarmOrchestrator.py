@@ -7,7 +7,11 @@ Enables parallel execution and dynamic task routing.
 
 import logging
 import asyncio
-from typing import Dict, List, Any, Optional
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Callable
 from datetime import datetime
 from enum import Enum
 import uuid
@@ -17,6 +21,30 @@ from Backend.Agents.AutonomousAgent import AutonomousAgent
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SWARM_MAX_WORKERS = 4        # agent.execute calls running at once (they block on LLM/tool I/O)
+SWARM_TASK_TIMEOUT = 120.0   # seconds before unfinished agents are cancelled
+MAX_AGENTS_PER_TASK = 3
+MESSAGE_BUS_SIZE = 500       # messages retained in the ring buffer
+
+# Keyword routing: agents whose keywords appear in the task run in parallel
+AGENT_KEYWORDS = {
+    "Research Agent": ("research", "search", "find", "compare", "latest", "news"),
+    "Coder Agent": ("code", "build", "script", "program", "debug", "implement"),
+    "Planner Agent": ("plan", "roadmap", "strategy", "steps"),
+    "Critic Agent": ("review", "critique", "evaluate", "feedback"),
+    "Creative Agent": ("design", "story", "creative", "image", "poem"),
+}
+
+# Whole-word matchers, so "find" doesn't fire on "findings" or "plan" on "explanation"
+AGENT_PATTERNS = {
+    name: re.compile(r"\b(?:" + "|".join(map(re.escape, keywords)) + r")\b")
+    for name, keywords in AGENT_KEYWORDS.items()
+}
+
+TOPIC_BROADCAST = "broadcast"
+TOPIC_TASKS = "swarm.tasks"
+
+
 class MessageType(Enum):
     TASK_REQUEST = "task_request"
     TASK_RESULT = "task_result"
@@ -25,14 +53,60 @@ class MessageType(Enum):
     RESPONSE = "response"
 
 class Message:
-    def __init__(self, sender: str, recipient: str, type: MessageType, content: Any):
+    def __init__(self, sender: str, recipient: str, type: MessageType, content: Any, topic: str = None):
         self.id = str(uuid.uuid4())
         self.sender = sender
         self.recipient = recipient
         self.type = type
         self.content = content
+        self.topic = topic or (TOPIC_BROADCAST if recipient == "ALL" else f"agent:{recipient}")
         self.timestamp = datetime.now()
 
+
+class MessageBus:
+    """
+    Bounded topic-based pub/sub.
+    
+    Keeps the last `maxlen` messages in a ring buffer for inspection and
+    delivers each published message to that topic's subscribers.
+    """
+    
+    def __init__(self, maxlen: int = MESSAGE_BUS_SIZE):
+        self._messages = deque(maxlen=maxlen)
+        self._subscribers: Dict[str, Dict[str, Callable[[Message], None]]] = {}
+        self._lock = threading.Lock()
+    
+    def publish(self, message: Message):
+        with self._lock:
+            self._messages.append(message)
+            callbacks = list(self._subscribers.get(message.topic, {}).values())
+        for callback in callbacks:
+            try:
+                callback(message)
+            except Exception as e:
+                logger.warning(f"[SWARM] Subscriber error on {message.topic}: {e}")
+    
+    def subscribe(self, topic: str, callback: Callable[[Message], None]) -> str:
+        """Register a callback for a topic; returns a token for unsubscribe()."""
+        token = str(uuid.uuid4())
+        with self._lock:
+            self._subscribers.setdefault(topic, {})[token] = callback
+        return token
+    
+    def unsubscribe(self, topic: str, token: str):
+        with self._lock:
+            self._subscribers.get(topic, {}).pop(token, None)
+    
+    def recent(self, topic: str = None, limit: int = 50) -> List[Message]:
+        """Most recent messages, optionally for one topic (oldest first)."""
+        with self._lock:
+            messages = [m for m in self._messages if topic is None or m.topic == topic]
+        return messages[-limit:]
+    
+    def __len__(self):
+        return len(self._messages)
+
+
 class SwarmOrchestrator:
     """
     Coordinator for the autonomous agent swarm.
@@ -45,9 +119,14 @@ class SwarmOrchestrator:
     
     def __init__(self):
         self.agents: Dict[str, AutonomousAgent] = {}
-        self.message_bus: List[Message] = []
+        self.message_bus = MessageBus()
         self.active_tasks: Dict[str, Any] = {}
         
+        # Blocking agent.execute calls run here, never on the event loop
+        self._executor = ThreadPoolExecutor(max_workers=SWARM_MAX_WORKERS, thread_name_prefix="swarm")
+        # Agents keep per-run state, so each instance runs one task at a time
+        self._agent_locks: Dict[str, threading.Lock] = {}
+        
         # Initialize fleet
         self._init_swarm()
         logger.info("[SWARM] Swarm Orchestrator initialized")
@@ -74,6 +153,7 @@ class SwarmOrchestrator:
     def register_agent(self, agent: AutonomousAgent):
         """Add an agent to the swarm."""
         self.agents[agent.name] = agent
+        self._agent_locks.setdefault(agent.name, threading.Lock())
         logger.info(f"[SWARM] Agent registered: {agent.name}")
 
     def get_agent(self, name: str) -> Optional[AutonomousAgent]:
@@ -82,56 +162,119 @@ class SwarmOrchestrator:
     def broadcast(self, sender: str, content: str):
         """Send a message to all agents."""
         msg = Message(sender, "ALL", MessageType.BROADCAST, content)
-        self.message_bus.append(msg)
+        self.message_bus.publish(msg)
         logger.info(f"[SWARM] Broadcast from {sender}: {content[:50]}")
 
     def send_message(self, sender: str, recipient: str, content: Any, type: MessageType = MessageType.QUERY):
         """Direct message between agents."""
         msg = Message(sender, recipient, type, content)
-        self.message_bus.append(msg)
-        # In a real async system, we might push this to the recipient's inbox queue
+        self.message_bus.publish(msg)
+    
+    def subscribe(self, topic: str, callback: Callable[[Message], None]) -> str:
+        """Subscribe to a message topic ("broadcast", "agent:<name>", "swarm.tasks")."""
+        return self.message_bus.subscribe(topic, callback)
+    
+    def _select_agents(self, task: str) -> List[AutonomousAgent]:
+        """Pick every agent whose keywords match the task (first registered agent if none)."""
+        task_lower = task.lower()
+        selected = [
+            self.agents[name] for name, pattern in AGENT_PATTERNS.items()
+            if name in self.agents and pattern.search(task_lower)
+        ]
+        if not selected:
+            selected = [next(iter(self.agents.values()))]
+        return selected[:MAX_AGENTS_PER_TASK]
+    
+    def _run_agent(self, agent: AutonomousAgent, task: str, cancel_event: threading.Event) -> Dict[str, Any]:
+        """Run one agent on a worker thread (serialised per agent instance)."""
+        with self._agent_locks.setdefault(agent.name, threading.Lock()):
+            if cancel_event.is_set():
+                return {"status": "cancelled", "agent": agent.name}
+            agent.cancel_event = cancel_event
+            try:
+                return agent.execute(task)
+            finally:
+                agent.cancel_event = None
         
-    async def run_swarm_task(self, task: str) -> Dict[str, Any]:
+    async def run_swarm_task(self, task: str, agents: Optional[List[str]] = None,
+                             timeout: float = SWARM_TASK_TIMEOUT) -> Dict[str, Any]:
         """
         Execute a complex task using the swarm.
-        1. Formulate a plan (using PlannerAgent if available, else heuristic)
-        2. Assign subtasks
-        3. Aggregate results
+        1. Select the agents relevant to the task (or the named `agents`)
+        2. Run them concurrently on the swarm executor
+        3. Aggregate results; agents still running at the deadline are cancelled
         """
         logger.info(f"[SWARM] Starting swarm task: {task[:50]}")
         start_time = datetime.now()
         
-        # Temporary: For now, just route to a "General" agent or fail gracefully if empty
-        # In Phase 3, we will use the PlannerAgent here.
-        
         if not self.agents:
             return {"status": "error", "error": "No agents registered in swarm"}
-
-        # Basic routing logic for now (backward compatibility style)
-        # This will be replaced by PlannerAgent logic later
-        assigned_agent = None
-        if "research" in task.lower():
-            assigned_agent = self.agents.get("Research Agent")
-        elif "code" in task.lower():
-            assigned_agent = self.agents.get("Coder Agent")
         
-        # Fallback to first available if specific one not found
-        if not assigned_agent:
-            assigned_agent = next(iter(self.agents.values()))
-            
-        if assigned_agent:
-            result = assigned_agent.execute(task)
-            execution_time = (datetime.now() - start_time).total_seconds()
-            
+        if agents:
+            assigned = [self.agents[name] for name in agents if name in self.agents]
+        else:
+            assigned = self._select_agents(task)
+        if not assigned:
+            return {"status": "error", "error": "Could not assign agent"}
+        
+        task_id = str(uuid.uuid4())
+        cancel_event = threading.Event()
+        self.active_tasks[task_id] = {"task": task, "agents": [a.name for a in assigned], "started": start_time}
+        
+        loop = asyncio.get_event_loop()
+        futures = {}
+        for agent in assigned:
+            self.message_bus.publish(Message("swarm", agent.name, MessageType.TASK_REQUEST, task, topic=TOPIC_TASKS))
+            futures[loop.run_in_executor(self._executor, self._run_agent, agent, task, cancel_event)] = agent
+        
+        try:
+            done, pending = await asyncio.wait(futures.keys(), timeout=timeout)
+        finally:
+            self.active_tasks.pop(task_id, None)
+        
+        if pending:
+            # Stop agents between ReAct steps; queued ones never start
+            cancel_event.set()
+            for future in pending:
+                future.cancel()
+            logger.warning(f"[SWARM] Deadline hit - cancelled {[futures[f].name for f in pending]}")
+        
+        outputs = []
+        for future, agent in futures.items():
+            if future not in done:
+                continue
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"[SWARM] {agent.name} failed: {e}")
+                continue
+            self.message_bus.publish(Message(agent.name, "swarm", MessageType.TASK_RESULT, result, topic=TOPIC_TASKS))
+            if result.get("output"):
+                outputs.append((agent.name, result.get("output")))
+        
+        execution_time = (datetime.now() - start_time).total_seconds()
+        
+        if not outputs:
             return {
-                "status": "success",
-                "task": task,
-                "swarm_output": result.get("output"),
-                "primary_agent": assigned_agent.name,
+                "status": "error",
+                "error": "Swarm timed out" if pending else "No agent produced output",
                 "execution_time": execution_time
             }
-            
-        return {"status": "error", "error": "Could not assign agent"}
+        
+        if len(outputs) == 1:
+            swarm_output = outputs[0][1]
+        else:
+            swarm_output = "\n\n".join(f"**{name}**:\n{output}" for name, output in outputs)
+        
+        return {
+            "status": "success",
+            "task": task,
+            "swarm_output": swarm_output,
+            "primary_agent": outputs[0][0],
+            "agents": [name for name, _ in outputs],
+            "cancelled_agents": [futures[f].name for f in pending],
+            "execution_time": execution_time
+        }
 
 # Global instance
 swarm = SwarmOrchestrator()
@@ -11,6 +11,9 @@ import asyncio
 import json
 
 from Backend.Agents.BaseAgent import BaseAgent
+from Backend.BrowserPool import (
+    get_browser_pool, playwright_available, restrict_to_public_web, validate_public_url_async
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -28,52 +31,7 @@ class WebBrowsingAgent(BaseAgent):
             specialty="Web browsing and automation",
             description="I can navigate websites, click elements, fill forms, and extract data"
         )
-        self._playwright = None
-        self._browser = None
-        self._context = None
-        self._page = None
-        self.headless = True
-        logger.info("[WEB-AGENT] Initialized (Playwright will load on demand)")
-    
-    async def _ensure_browser(self):
-        """Ensure browser is running."""
-        if self._browser is not None:
-            return
-        
-        try:
-            from playwright.async_api import async_playwright
-            
-            logger.info("[WEB-AGENT] Starting Playwright browser...")
-            self._playwright = await async_playwright().start()
-            self._browser = await self._playwright.chromium.launch(headless=self.headless)
-            self._context = await self._browser.new_context(
-                viewport={'width': 1920, 'height': 1080},
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            )
-            self._page = await self._context.new_page()
-            logger.info("[WEB-AGENT] Browser ready")
-            
-        except ImportError:
-            logger.error("[WEB-AGENT] Playwright not installed. Install with: pip install playwright && playwright install")
-            raise Exception("Playwright not installed")
-        except Exception as e:
-            logger.error(f"[WEB-AGENT] Browser startup failed: {e}")
-            raise
-    
-    async def _close_browser(self):
-        """Close browser and cleanup."""
-        try:
-            if self._browser:
-                await self._browser.close()
-            if self._playwright:
-                await self._playwright.stop()
-            self._browser = None
-            self._page = None
-            self._context = None
-            self._playwright = None
-            logger.info("[WEB-AGENT] Browser closed")
-        except Exception as e:
-            logger.error(f"[WEB-AGENT] Cleanup error: {e}")
+        logger.info("[WEB-AGENT] Initialized (uses the shared browser pool)")
     
     def execute(self, task: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
         """
@@ -101,35 +59,39 @@ class WebBrowsingAgent(BaseAgent):
     
     async def _execute_async(self, task: str, context: Dict[str, Any]) -> Dict[str, Any]:
         """Async execution of web task."""
-        try:
-            await self._ensure_browser()
-            
-            # Parse task to determine actions
-            actions = await self._parse_task(task, context)
-            
-            # Execute actions
-            results = []
-            for action in actions:
-                action_result = await self._execute_action(action)
-                results.append(action_result)
-            
-            # Synthesize results
-            output = await self._synthesize_web_results(task, results)
-            
-            return {
-                "status": "success",
-                "agent": self.name,
-                "task": task,
-                "actions_performed": len(results),
-                "output": output,
-                "results": results,
-                "timestamp": datetime.now().isoformat()
-            }
-            
-        finally:
-            # Keep browser open for potential follow-up tasks
-            # await self._close_browser()
-            pass
+        if not playwright_available():
+            logger.error("[WEB-AGENT] Playwright not installed. Install with: pip install playwright && playwright install")
+            raise Exception("Playwright not installed")
+        
+        # Parse task to determine actions
+        actions = await self._parse_task(task, context)
+        
+        # Execute actions in an isolated context on the shared browser
+        results = await get_browser_pool().run_async(
+            lambda browser_context: self._run_actions(browser_context, actions)
+        )
+        
+        # Synthesize results
+        output = await self._synthesize_web_results(task, results)
+        
+        return {
+            "status": "success",
+            "agent": self.name,
+            "task": task,
+            "actions_performed": len(results),
+            "output": output,
+            "results": results,
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    async def _run_actions(self, browser_context, actions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Run actions in order on a fresh page (executes on the browser pool loop)."""
+        await restrict_to_public_web(browser_context)
+        page = await browser_context.new_page()
+        results = []
+        for action in actions:
+            results.append(await self._execute_action(page, action))
+        return results
     
     async def _parse_task(self, task: str, context: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Parse natural language task into browser actions."""
@@ -199,25 +161,26 @@ Your response (JSON array only):"""
         
         return actions if actions else [{"action": "error", "message": "Could not parse task"}]
     
-    async def _execute_action(self, action: Dict[str, Any]) -> Dict[str, Any]:
+    async def _execute_action(self, page, action: Dict[str, Any]) -> Dict[str, Any]:
         """Execute a single browser action."""
         action_type = action.get("action")
         
         try:
             if action_type == "navigate":
                 url = action.get("url")
-                await self._page.goto(url, wait_until="domcontentloaded", timeout=30000)
+                await validate_public_url_async(url)
+                await page.goto(url, wait_until="domcontentloaded", timeout=30000)
                 return {"action": "navigate", "url": url, "status": "success"}
             
             elif action_type == "click":
                 selector = action.get("selector")
-                await self._page.click(selector, timeout=10000)
+                await page.click(selector, timeout=10000)
                 return {"action": "click", "selector": selector, "status": "success"}
             
             elif action_type == "fill":
                 selector = action.get("selector")
                 value = action.get("value")
-                await self._page.fill(selector, value, timeout=10000)
+                await page.fill(selector, value, timeout=10000)
                 return {"action": "fill", "selector": selector, "status": "success"}
             
             elif action_type == "extract":
@@ -225,17 +188,17 @@ Your response (JSON array only):"""
                 attribute = action.get("attribute", "text")
                 
                 if attribute == "text":
-                    elements = await self._page.query_selector_all(selector)
+                    elements = await page.query_selector_all(selector)
                     texts = [await el.text_content() for el in elements[:10]]  # Limit to 10
                     return {"action": "extract", "selector": selector, "data": texts}
                 else:
-                    elements = await self._page.query_selector_all(selector)
+                    elements = await page.query_selector_all(selector)
                     attrs = [await el.get_attribute(attribute) for el in elements[:10]]
                     return {"action": "extract", "selector": selector, "data": attrs}
             
             elif action_type == "screenshot":
                 path = action.get("path", "screenshot.png")
-                await self._page.screenshot(path=path, full_page=True)
+                await page.screenshot(path=path, full_page=True)
                 return {"action": "screenshot", "path": path, "status": "success"}
             
             elif action_type == "wait":
@@ -280,8 +243,8 @@ Provide a clear summary of what was accomplished:"""
             return results_text
     
     async def cleanup(self):
-        """Manual cleanup if needed."""
-        await self._close_browser()
+        """Manual cleanup if needed (closes the shared browser)."""
+        await asyncio.get_running_loop().run_in_executor(None, get_browser_pool().shutdown)
 
 
 # Global instance
@@ -12,7 +12,6 @@ Responsibilities:
 """
 
 import uuid
-import time
 from datetime import datetime
 from typing import Dict, Optional, Tuple, Callable
 
@@ -52,7 +51,6 @@ class AutomationRouter:
         from Backend.LocalAgentAPI import (
             get_first_online_device, 
             get_user_devices,
-            _pending_tasks,
             _registered_devices
         )
         
@@ -115,7 +113,7 @@ class AutomationRouter:
         Returns:
             Dict with task result
         """
-        from Backend.LocalAgentAPI import _pending_tasks, _registered_devices, log_command
+        from Backend.LocalAgentAPI import enqueue_task, log_command
         
         # Convert step to command format expected by LocalAgent
         command = step.get("action")
@@ -155,7 +153,7 @@ class AutomationRouter:
         try:
             from Backend.AgentWebSocket import is_agent_connected, send_task_sync
             if is_agent_connected(device_id):
-                ws_sent = send_task_sync(device_id, task_id, command, params)
+                ws_sent = send_task_sync(device_id, task_id, command, params, task=task)
                 if ws_sent:
                     print(f"[AUTOMATION-ROUTER] ⚡ Step sent via WebSocket: {command} with params {params}")
         except Exception as ws_err:
@@ -163,9 +161,7 @@ class AutomationRouter:
         
         # Fallback to polling queue
         if not ws_sent:
-            if device_id not in _pending_tasks:
-                _pending_tasks[device_id] = []
-            _pending_tasks[device_id].append(task)
+            enqueue_task(device_id, task)
             print(f"[AUTOMATION-ROUTER] 📋 Step queued for polling: {command}")
         
         # Log the command
@@ -307,6 +303,9 @@ class AutomationRouter:
         """
         Wait for a task result (blocking).
         
+        Woken as soon as LocalAgentAPI records the result (HTTP report or
+        WebSocket), rather than re-checking on a fixed interval.
+        
         Args:
             task_id: Task ID to wait for
             timeout: Max seconds to wait
@@ -314,21 +313,18 @@ class AutomationRouter:
         Returns:
             Task result dict
         """
-        from Backend.LocalAgentAPI import _task_results
+        from Backend.LocalAgentAPI import wait_for_task_result
         
         timeout = timeout or self.default_timeout
-        start_time = time.time()
         
-        while time.time() - start_time < timeout:
-            result = _task_results.get(task_id)
-            if result:
-                return {
-                    "success": result.get("status") == "success",
-                    "status": result.get("status"),
-                    "result": result.get("result", {}),
-                    "device_id": result.get("device_id")
-                }
-            time.sleep(0.5)
+        result = wait_for_task_result(task_id, timeout)
+        if result:
+            return {
+                "success": result.get("status") == "success",
+                "status": result.get("status"),
+                "result": result.get("result", {}),
+                "device_id": result.get("device_id")
+            }
         
         return {
             "success": False,
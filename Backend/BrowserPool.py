@@ -0,0 +1,345 @@
+"""
+Browser Pool - Shared Headless Chromium
+=======================================
+One warm Playwright Chromium per process, shared by the web browsing agent,
+website capture and the document renderer.
+
+- Chromium launches lazily on first use and stays warm between jobs
+- Every job gets its own BrowserContext, so cookies and storage never leak
+- A semaphore caps how many contexts are open at once
+- The browser is shut down after sitting idle, and replaced after serving
+  RECYCLE_AFTER contexts so a long-lived Chromium doesn't keep growing
+
+Playwright objects are bound to the event loop that created them, so the
+pool runs its own loop thread and callers hand it coroutines via run()
+(sync code) or run_async() (code on another event loop).
+"""
+
+import asyncio
+import ipaddress
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+MAX_CONTEXTS = int(os.getenv("BROWSER_POOL_MAX_CONTEXTS", "4"))
+IDLE_TIMEOUT = float(os.getenv("BROWSER_POOL_IDLE_TIMEOUT", "300"))   # seconds before an unused browser is closed
+RECYCLE_AFTER = int(os.getenv("BROWSER_POOL_RECYCLE_AFTER", "200"))   # contexts served before relaunching Chromium
+REAP_INTERVAL = 30
+DEFAULT_TIMEOUT = 120
+
+DEFAULT_CONTEXT_OPTIONS = {
+    "viewport": {"width": 1920, "height": 1080},
+    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+}
+
+ALLOWED_SCHEMES = ("http", "https")
+
+_playwright_available = None
+
+
+def playwright_available() -> bool:
+    """Check whether Playwright is installed (cached)."""
+    global _playwright_available
+    if _playwright_available is None:
+        try:
+            from playwright.async_api import async_playwright  # noqa: F401
+            _playwright_available = True
+        except ImportError:
+            _playwright_available = False
+    return _playwright_available
+
+
+# ==================== URL SAFETY ====================
+
+class UnsafeURLError(ValueError):
+    """Raised for URLs the browser must not open (non-http(s), private or local hosts)."""
+
+
+def _url_host(url: str) -> str:
+    parsed = urlparse(url)
+    if parsed.scheme.lower() not in ALLOWED_SCHEMES:
+        raise UnsafeURLError(f"Only http(s) URLs are allowed, got '{parsed.scheme or url}'")
+    if not parsed.hostname:
+        raise UnsafeURLError(f"URL has no host: {url}")
+    return parsed.hostname
+
+
+def _check_addresses(host: str, addr_infos) -> None:
+    for info in addr_infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if (address.is_private or address.is_loopback or address.is_link_local or address.is_reserved
+                or address.is_multicast or address.is_unspecified):
+            raise UnsafeURLError(f"Host '{host}' resolves to a non-public address ({address})")
+
+
+def validate_public_url(url: str) -> str:
+    """Raise UnsafeURLError unless url is http(s) and its host resolves only to public addresses."""
+    host = _url_host(url)
+    try:
+        addr_infos = socket.getaddrinfo(host, None)
+    except socket.gaierror:
+        raise UnsafeURLError(f"Cannot resolve host '{host}'")
+    _check_addresses(host, addr_infos)
+    return url
+
+
+async def validate_public_url_async(url: str) -> str:
+    """validate_public_url() without blocking the event loop on DNS."""
+    host = _url_host(url)
+    try:
+        addr_infos = await asyncio.get_running_loop().getaddrinfo(host, None)
+    except socket.gaierror:
+        raise UnsafeURLError(f"Cannot resolve host '{host}'")
+    _check_addresses(host, addr_infos)
+    return url
+
+
+async def restrict_to_public_web(browser_context):
+    """
+    Abort every request from browser_context that isn't http(s) to a public host.
+    
+    Catches what a check before goto() can't: redirects, frames and
+    subresources pointing at file://, localhost or metadata endpoints.
+    """
+    verdicts: Dict[str, Optional[str]] = {}  # host -> block reason (None = allowed)
+
+    async def guard(route):
+        url = route.request.url
+        try:
+            host = _url_host(url)
+            if host not in verdicts:
+                try:
+                    await validate_public_url_async(url)
+                    verdicts[host] = None
+                except UnsafeURLError as e:
+                    verdicts[host] = str(e)
+            if verdicts[host]:
+                raise UnsafeURLError(verdicts[host])
+        except UnsafeURLError as e:
+            logger.warning(f"[BROWSER-POOL] Blocked request to {url[:100]}: {e}")
+            await route.abort("blockedbyclient")
+            return
+        await route.continue_()
+
+    await browser_context.route("**/*", guard)
+
+
+class BrowserPool:
+    """Hands out isolated browser contexts from a single warm Chromium."""
+
+    def __init__(self, max_contexts: int = MAX_CONTEXTS, idle_timeout: float = IDLE_TIMEOUT,
+                 recycle_after: int = RECYCLE_AFTER, headless: bool = True):
+        self.max_contexts = max(1, max_contexts)
+        self.idle_timeout = idle_timeout
+        self.recycle_after = recycle_after
+        self.headless = headless
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._loop_lock = threading.Lock()
+
+        # Only touched on the pool loop
+        self._playwright = None
+        self._browser = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._launch_lock: Optional[asyncio.Lock] = None
+        self._leases: Dict[Any, int] = {}      # browser -> open contexts
+        self._served = 0                       # contexts served by the current browser
+        self._active = 0
+        self._total_served = 0
+        self._launches = 0
+        self._last_used = time.monotonic()
+
+    # ==================== EVENT LOOP ====================
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """Return the pool's event loop, starting its thread on first use."""
+        with self._loop_lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run_loop():
+                    asyncio.set_event_loop(loop)
+                    self._semaphore = asyncio.Semaphore(self.max_contexts)
+                    self._launch_lock = asyncio.Lock()
+                    loop.create_task(self._idle_reaper())
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._loop_thread = threading.Thread(target=run_loop, name="BrowserPoolLoop", daemon=True)
+                self._loop_thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    def _on_pool_loop(self) -> bool:
+        return self._loop_thread is not None and threading.current_thread() is self._loop_thread
+
+    # ==================== BROWSER LIFECYCLE ====================
+
+    async def _ensure_browser(self):
+        """Launch Chromium if it isn't running (or has crashed)."""
+        async with self._launch_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return self._browser
+            if self._browser is not None:
+                logger.warning("[BROWSER-POOL] Browser disconnected, relaunching")
+                self._leases.pop(self._browser, None)
+                self._browser = None
+
+            if self._playwright is None:
+                from playwright.async_api import async_playwright
+                self._playwright = await async_playwright().start()
+
+            started = time.perf_counter()
+            self._browser = await self._playwright.chromium.launch(headless=self.headless)
+            self._leases[self._browser] = 0
+            self._served = 0
+            self._launches += 1
+            logger.info(f"[BROWSER-POOL] Chromium launched in {time.perf_counter() - started:.2f}s")
+            return self._browser
+
+    async def _close_browser(self, browser):
+        """Close a browser that has no open contexts left."""
+        self._leases.pop(browser, None)
+        try:
+            await browser.close()
+        except Exception as e:
+            logger.debug(f"[BROWSER-POOL] Browser close error: {e}")
+
+    async def _retire_current(self):
+        """Stop handing out the current browser; close it once its contexts finish."""
+        browser, self._browser = self._browser, None
+        if browser is not None and self._leases.get(browser, 0) == 0:
+            await self._close_browser(browser)
+
+    async def _stop(self):
+        """Close every browser and the Playwright driver."""
+        await self._retire_current()
+        for browser in list(self._leases):
+            await self._close_browser(browser)
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception as e:
+                logger.debug(f"[BROWSER-POOL] Playwright stop error: {e}")
+            self._playwright = None
+
+    async def _idle_reaper(self):
+        while True:
+            await asyncio.sleep(REAP_INTERVAL)
+            try:
+                idle_for = time.monotonic() - self._last_used
+                if self._playwright is not None and self._active == 0 and idle_for > self.idle_timeout:
+                    logger.info(f"[BROWSER-POOL] Idle for {idle_for:.0f}s, closing browser")
+                    await self._stop()
+            except Exception as e:
+                logger.error(f"[BROWSER-POOL] Reaper error: {e}")
+
+    # ==================== CONTEXTS ====================
+
+    @asynccontextmanager
+    async def context(self, **options):
+        """
+        Yield an isolated BrowserContext, closing it afterwards.
+
+        Must be used on the pool loop - from elsewhere use run() or run_async().
+        Options are passed to browser.new_context() over DEFAULT_CONTEXT_OPTIONS.
+        """
+        async with self._semaphore:
+            self._active += 1
+            browser = None
+            browser_context = None
+            try:
+                browser = await self._ensure_browser()
+                self._leases[browser] = self._leases.get(browser, 0) + 1
+                self._served += 1
+                self._total_served += 1
+                if self.recycle_after and self._served >= self.recycle_after:
+                    await self._retire_current()
+
+                browser_context = await browser.new_context(**{**DEFAULT_CONTEXT_OPTIONS, **options})
+                yield browser_context
+            finally:
+                self._active -= 1
+                self._last_used = time.monotonic()
+                if browser_context is not None:
+                    try:
+                        await browser_context.close()
+                    except Exception as e:
+                        logger.debug(f"[BROWSER-POOL] Context close error: {e}")
+                if browser is not None and browser in self._leases:
+                    self._leases[browser] -= 1
+                    if browser is not self._browser and self._leases[browser] <= 0:
+                        await self._close_browser(browser)
+
+    async def _run(self, fn: Callable[[Any], Awaitable[Any]], options: Dict[str, Any]) -> Any:
+        async with self.context(**options) as browser_context:
+            return await fn(browser_context)
+
+    def run(self, fn: Callable[[Any], Awaitable[Any]], timeout: float = DEFAULT_TIMEOUT, **options) -> Any:
+        """
+        Run fn(browser_context) on the pool from synchronous code and return its result.
+
+        Raises concurrent.futures.TimeoutError if the job doesn't finish in time
+        (the job is cancelled).
+        """
+        if self._on_pool_loop():
+            raise RuntimeError("BrowserPool.run() called from the pool loop; use 'async with pool.context()'")
+        future = asyncio.run_coroutine_threadsafe(self._run(fn, options), self._get_loop())
+        try:
+            return future.result(timeout)
+        except Exception:
+            if not future.done():
+                future.cancel()
+            raise
+
+    async def run_async(self, fn: Callable[[Any], Awaitable[Any]], **options) -> Any:
+        """Run fn(browser_context) on the pool from any event loop."""
+        if self._on_pool_loop():
+            return await self._run(fn, options)
+        future = asyncio.run_coroutine_threadsafe(self._run(fn, options), self._get_loop())
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self, timeout: float = 10):
+        """Close the browser now (it relaunches on next use)."""
+        if self._loop is None or self._loop.is_closed():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._stop(), self._loop).result(timeout)
+        except Exception as e:
+            logger.error(f"[BROWSER-POOL] Shutdown error: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._browser is not None,
+            "active_contexts": self._active,
+            "max_contexts": self.max_contexts,
+            "served_by_current": self._served,
+            "total_served": self._total_served,
+            "launches": self._launches,
+            "idle_seconds": round(time.monotonic() - self._last_used, 1),
+        }
+
+
+# Global instance
+_browser_pool: Optional[BrowserPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """Get the process-wide browser pool."""
+    global _browser_pool
+    with _pool_lock:
+        if _browser_pool is None:
+            _browser_pool = BrowserPool()
+        return _browser_pool
@@ -4,9 +4,10 @@ Chat History Manager - Firebase-Backed Persistent Storage
 Saves and loads chat history with Firebase persistence
 """
 
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 import logging
+import time
 
 # Import Firebase DAL
 try:
@@ -17,9 +18,17 @@ except ImportError:
     firebase_available = False
     logging.warning("[CHAT HISTORY] Firebase not available, using fallback mode")
 
+try:
+    from google.api_core.exceptions import FailedPrecondition
+except ImportError:
+    FailedPrecondition = None
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+ORDERED_QUERY_RETRY = 600   # seconds before retrying ordered queries after a missing-index error
+MAX_MESSAGES_PER_WRITE = 50   # add_messages limit (one Firestore batch holds at most 500 writes)
+
 
 class ChatHistoryManager:
     """Firebase-backed chat history manager"""
@@ -34,6 +43,10 @@ class ChatHistoryManager:
         
         self.conversations_collection = "conversations"
         self.messages_collection = "messages"
+        
+        # Set while the (conversation_id, timestamp) composite index is missing;
+        # ordered queries are retried once it passes, in case it was deployed since
+        self._ordered_retry_at = 0.0
         logger.info("[CHAT HISTORY] Chat history manager initialized")
     
     # ==================== CONVERSATION MANAGEMENT ====================
@@ -225,6 +238,9 @@ class ChatHistoryManager:
         """
         Add a message to a conversation
         
+        The message create and the conversation's updated_at/message_count
+        update are committed as one batch.
+        
         Args:
             user_id: User's unique identifier
             conversation_id: Conversation ID
@@ -232,43 +248,76 @@ class ChatHistoryManager:
             content: Message content
             metadata: Optional metadata
             
+        Returns:
+            True if successful, False otherwise
+        """
+        return self.add_messages(user_id, conversation_id, [
+            {"role": role, "content": content, "metadata": metadata}
+        ])
+    
+    def add_messages(self, user_id: str, conversation_id: str, messages: List[Dict[str, Any]]) -> bool:
+        """
+        Add several messages (e.g. a user + assistant turn) in one commit
+        
+        Every message create plus a single updated_at/message_count update
+        on the conversation are written as one batch.
+        
+        Args:
+            user_id: User's unique identifier
+            conversation_id: Conversation ID
+            messages: Dicts with role, content and optional metadata, in order
+            
         Returns:
             True if successful, False otherwise
         """
         try:
-            if not self.dal:
+            if not self.dal or not messages:
                 return False
-            
-            message_data = {
-                "role": role,
-                "content": content,
-                "timestamp": datetime.utcnow(),
-                "metadata": metadata or {},
-                "conversation_id": conversation_id
-            }
-            
-            message_id = self.dal.create(self.messages_collection, user_id, message_data)
-            
-            if message_id:
-                # Update conversation's updated_at timestamp
-                self.dal.update(
-                    self.conversations_collection,
-                    user_id,
-                    conversation_id,
-                    {"updated_at": datetime.utcnow()}
-                )
-                return True
-            
-            return False
+            if len(messages) > MAX_MESSAGES_PER_WRITE:
+                raise ValueError(f"at most {MAX_MESSAGES_PER_WRITE} messages per write")
+            
+            now = datetime.utcnow()
+            message_data = [
+                {
+                    "role": message["role"],
+                    "content": message["content"],
+                    # Keep the turn's order when sorting by timestamp
+                    "timestamp": now + timedelta(microseconds=i),
+                    "metadata": message.get("metadata") or {},
+                    "conversation_id": conversation_id
+                }
+                for i, message in enumerate(messages)
+            ]
+            
+            return self._commit_messages(user_id, conversation_id, message_data)
             
         except Exception as e:
             logger.error(f"[CHAT HISTORY] Add message error: {e}")
             return False
     
+    def _commit_messages(self, user_id: str, conversation_id: str, messages: List[Dict[str, Any]]) -> bool:
+        """Create messages and bump the parent conversation in a single commit"""
+        created = self.dal.batch_write(
+            user_id,
+            creates=[(self.messages_collection, m) for m in messages],
+            updates=[(
+                self.conversations_collection,
+                conversation_id,
+                {
+                    "updated_at": datetime.utcnow(),
+                    "message_count": self.dal.increment(len(messages))
+                }
+            )]
+        )
+        return created is not None
+    
     def get_messages(self, user_id: str, conversation_id: str, limit: int = 100) -> List[Dict[str, Any]]:
         """
         Get all messages for a conversation
         
+        Ordering and limit are applied server-side using the
+        (conversation_id, timestamp) composite index from firestore.indexes.json.
+        
         Args:
             user_id: User's unique identifier
             conversation_id: Conversation ID
@@ -281,17 +330,29 @@ class ChatHistoryManager:
             if not self.dal:
                 return []
             
-            # Retrieve messages with filter but WITHOUT ordering (to avoid composite index requirement)
+            if time.time() >= self._ordered_retry_at:
+                try:
+                    return self.dal.list(
+                        self.messages_collection,
+                        user_id,
+                        limit=limit,
+                        order_by="timestamp",
+                        descending=False,
+                        filters={"conversation_id": conversation_id},
+                        strict=True
+                    )
+                except Exception as e:
+                    if FailedPrecondition is not None and isinstance(e, FailedPrecondition):
+                        # Composite index not deployed yet - sort in memory for a while
+                        self._ordered_retry_at = time.time() + ORDERED_QUERY_RETRY
+                    logger.warning(f"[CHAT HISTORY] Ordered query failed, sorting in memory: {e}")
+            
             messages = self.dal.list(
                 self.messages_collection,
                 user_id,
                 limit=limit,
-                # order_by="timestamp",  <-- Removed to avoid index error
-                # descending=False,      <-- Removed
                 filters={"conversation_id": conversation_id}
             )
-            
-            # Sort in-memory
             messages.sort(key=lambda x: x.get("timestamp", ""))
             
             return messages
@@ -373,9 +434,11 @@ if __name__ == "__main__":
     
     # Test add messages
     print("\n2. Adding messages:")
-    chat_history.add_message(test_user_id, conv_id, "user", "Hello!")
-    chat_history.add_message(test_user_id, conv_id, "assistant", "Hi there!")
-    print("   Added 2 messages")
+    chat_history.add_messages(test_user_id, conv_id, [
+        {"role": "user", "content": "Hello!"},
+        {"role": "assistant", "content": "Hi there!"}
+    ])
+    print("   Added 2 messages (one batch)")
     
     # Test get conversation
     print("\n3. Getting conversation:")
@@ -4,23 +4,188 @@ Code Executor - Beast Mode (Ultimate Edition)
 Advanced safe code execution with:
 - Multi-language support (Python, JS simulation)
 - Sandbox environment with strict security
-- Async execution with timeout
-- Memory & CPU limits
+- Warm worker processes, hard-killed on timeout
+- Memory & CPU limits (RLIMIT_AS / RLIMIT_CPU)
 - Code analysis & explanation
 """
 
 import sys
-import io
-import contextlib
+import os
 import time
 import threading
+import queue
+import struct
+import subprocess
 import math
-import random
 import json
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, Any, Optional
-from collections import defaultdict
-import traceback
+
+SANDBOX_WORKERS = int(os.getenv("SANDBOX_WORKERS", "2"))        # warm worker processes
+SANDBOX_MAX_RUNS = int(os.getenv("SANDBOX_MAX_RUNS", "50"))     # runs before a worker is recycled
+SANDBOX_MEMORY_MB = int(os.getenv("SANDBOX_MEMORY_MB", "512"))  # RLIMIT_AS per worker
+SANDBOX_ACQUIRE_TIMEOUT = 15                                    # seconds to wait for a free worker
+
+_WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "SandboxWorker.py")
+_HEADER = struct.Struct(">I")
+
+
+def _worker_env() -> Dict[str, str]:
+    """Minimal environment for workers - API keys and secrets stay in the parent."""
+    env = {
+        "PATH": os.environ.get("PATH", os.defpath),
+        "PYTHONIOENCODING": "utf-8",
+        "PYTHONDONTWRITEBYTECODE": "1",
+    }
+    if "SYSTEMROOT" in os.environ:  # required by Python on Windows
+        env["SYSTEMROOT"] = os.environ["SYSTEMROOT"]
+    return env
+
+
+class _SandboxProcess:
+    """One warm worker process and a thread reading its responses."""
+    
+    def __init__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, "-I", "-u", _WORKER_SCRIPT, str(SANDBOX_MEMORY_MB)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(_WORKER_SCRIPT),
+            env=_worker_env(),
+        )
+        self.runs = 0
+        self.responses: "queue.Queue[Optional[dict]]" = queue.Queue()
+        threading.Thread(target=self._read_responses, name="SandboxReader", daemon=True).start()
+    
+    def _read_responses(self):
+        stream = self.process.stdout
+        try:
+            while True:
+                header = stream.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    break
+                size = _HEADER.unpack(header)[0]
+                self.responses.put(json.loads(stream.read(size).decode("utf-8")))
+        except Exception:
+            pass
+        self.responses.put(None)  # worker exited
+    
+    def alive(self) -> bool:
+        return self.process.poll() is None
+    
+    def run(self, request: dict, timeout: float) -> Optional[dict]:
+        """Send one request; None means the worker died or ran out of time."""
+        payload = json.dumps(request).encode("utf-8")
+        self.runs += 1
+        try:
+            self.process.stdin.write(_HEADER.pack(len(payload)) + payload)
+            self.process.stdin.flush()
+            return self.responses.get(timeout=timeout)
+        except (queue.Empty, OSError, ValueError):
+            return None
+    
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.wait(timeout=5)
+        except Exception:
+            pass
+    
+    def close(self):
+        try:
+            self.process.stdin.close()  # worker exits on EOF
+            self.process.wait(timeout=2)
+        except Exception:
+            self.kill()
+
+
+class SandboxPool:
+    """
+    Pre-started worker processes for running untrusted code.
+    
+    Each run gets a CPU budget (RLIMIT_CPU) and the worker an address-space
+    cap (RLIMIT_AS); a run that overstays its timeout is killed outright and
+    its worker replaced. Workers are recycled after SANDBOX_MAX_RUNS runs.
+    """
+    
+    def __init__(self, size: int = SANDBOX_WORKERS, max_runs: int = SANDBOX_MAX_RUNS):
+        self.size = max(1, size)
+        self.max_runs = max_runs
+        self._idle: "queue.Queue[_SandboxProcess]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+        self.killed = 0
+        self.recycled = 0
+    
+    def _ensure_started(self):
+        with self._lock:
+            if not self._started:
+                for _ in range(self.size):
+                    self._idle.put(_SandboxProcess())
+                self._started = True
+    
+    def _release(self, worker: _SandboxProcess, healthy: bool):
+        if not healthy:
+            worker.kill()
+            self.killed += 1
+        elif worker.runs >= self.max_runs:
+            worker.close()
+            self.recycled += 1
+        else:
+            self._idle.put(worker)
+            return
+        self._idle.put(_SandboxProcess())
+    
+    def run(self, code: str, timeout: float, max_output: int) -> Dict[str, Any]:
+        """Run code in a worker, returning the worker's result dict (or a timeout error)."""
+        self._ensure_started()
+        try:
+            worker = self._idle.get(timeout=SANDBOX_ACQUIRE_TIMEOUT)
+        except queue.Empty:
+            return {"status": "error", "error": "Code sandbox is busy, try again shortly",
+                    "output": "", "execution_time": 0}
+        
+        if not worker.alive():
+            worker = _SandboxProcess()
+        
+        start_time = time.time()
+        response = None
+        try:
+            response = worker.run({"code": code, "timeout": timeout, "max_output": max_output}, timeout)
+        finally:
+            self._release(worker, healthy=response is not None)
+        
+        if response is None:
+            elapsed = time.time() - start_time
+            return {
+                "status": "error",
+                "error": f"Execution timed out after {timeout} seconds" if elapsed >= timeout - 0.5
+                         else "Execution aborted (CPU or memory limit exceeded)",
+                "output": "",
+                "execution_time": round(elapsed, 4)
+            }
+        return response
+    
+    def shutdown(self):
+        with self._lock:
+            while not self._idle.empty():
+                self._idle.get_nowait().close()
+            self._started = False
+
+
+_sandbox_pool: Optional[SandboxPool] = None
+_sandbox_lock = threading.Lock()
+
+
+def get_sandbox_pool() -> SandboxPool:
+    """Get the process-wide sandbox pool."""
+    global _sandbox_pool
+    with _sandbox_lock:
+        if _sandbox_pool is None:
+            _sandbox_pool = SandboxPool()
+        return _sandbox_pool
+
 
 class CodeExecutor:
     def __init__(self):
@@ -28,134 +193,24 @@ class CodeExecutor:
         self.max_output = 10000  # Max 10000 characters output
         self.execution_history = []
         self.max_history = 50
-        
-        # Safe builtins for sandboxed execution
-        self.safe_builtins = {
-            # Basic types
-            'print': print, 'range': range, 'len': len,
-            'str': str, 'int': int, 'float': float, 'bool': bool,
-            'list': list, 'dict': dict, 'tuple': tuple, 'set': set,
-            'frozenset': frozenset, 'bytes': bytes, 'bytearray': bytearray,
-            # Math & Logic
-            'sum': sum, 'max': max, 'min': min, 'abs': abs,
-            'round': round, 'pow': pow, 'divmod': divmod,
-            # Iteration
-            'sorted': sorted, 'reversed': reversed, 'enumerate': enumerate,
-            'zip': zip, 'map': map, 'filter': filter, 'all': all, 'any': any,
-            # Type checking
-            'type': type, 'isinstance': isinstance, 'issubclass': issubclass,
-            # Conversion
-            'bin': bin, 'hex': hex, 'oct': oct, 'ord': ord, 'chr': chr,
-            'ascii': ascii, 'repr': repr, 'format': format,
-            # Helpers
-            'hasattr': hasattr, 'getattr': getattr, 'setattr': setattr,
-            'callable': callable, 'hash': hash, 'id': id, 'iter': iter, 'next': next,
-            'slice': slice, 'object': object, 'property': property,
-            # Exceptions (read-only)
-            'Exception': Exception, 'ValueError': ValueError, 
-            'TypeError': TypeError, 'KeyError': KeyError,
-            'IndexError': IndexError, 'ZeroDivisionError': ZeroDivisionError,
-            # Constants
-            'True': True, 'False': False, 'None': None,
-        }
-        
-        # Safe modules that can be imported
-        self.safe_modules = {
-            'math': math,
-            'random': random,
-            'json': json,
-            'datetime': datetime,
-            'timedelta': timedelta,
-            'defaultdict': defaultdict,
-        }
 
     def execute(self, code: str, language: str = "python") -> Dict[str, Any]:
         """Execute code safely with Beast Mode features"""
-        start_time = time.time()
-        
         # Security checks
         security_result = self._security_check(code)
         if security_result:
             return security_result
         
-        # Capture output
-        output_buffer = io.StringIO()
-        error_buffer = io.StringIO()
-        
-        result = {"status": "error", "output": "", "error": None, "execution_time": 0}
+        # Run in a resource-limited worker process that can be killed on timeout
+        result = get_sandbox_pool().run(code, timeout=self.timeout, max_output=self.max_output)
+        result.pop("traceback", None)
+        result.pop("stderr", None)
         
-        try:
-            # Create sandboxed globals
-            safe_globals = {
-                '__builtins__': self.safe_builtins,
-                '__name__': '__sandbox__',
-                # Inject safe modules
-                'math': math,
-                'random': random,
-                'json': json,
-                'datetime': datetime,
-            }
-            safe_locals = {}
-            
-            # Execute with timeout using threading
-            exec_result = [None]
-            exec_error = [None]
-            
-            def run_code():
-                try:
-                    with contextlib.redirect_stdout(output_buffer):
-                        with contextlib.redirect_stderr(error_buffer):
-                            exec(code, safe_globals, safe_locals)
-                except Exception as e:
-                    exec_error[0] = e
-            
-            thread = threading.Thread(target=run_code)
-            thread.start()
-            thread.join(timeout=self.timeout)
-            
-            if thread.is_alive():
-                return {
-                    "status": "error",
-                    "error": f"Execution timed out after {self.timeout} seconds",
-                    "output": output_buffer.getvalue()[:self.max_output],
-                    "execution_time": self.timeout
-                }
-            
-            execution_time = time.time() - start_time
-            
-            if exec_error[0]:
-                raise exec_error[0]
-            
-            # Get output
-            output = output_buffer.getvalue()
-            if len(output) > self.max_output:
-                output = output[:self.max_output] + "\n... (output truncated)"
-            
-            result = {
-                "status": "success",
-                "output": output if output else "(no output)",
-                "error": None,
-                "execution_time": round(execution_time, 4),
-                "variables": {k: str(v)[:100] for k, v in safe_locals.items() if not k.startswith('_')}
-            }
-            
+        if result.get("status") == "success":
+            if not result.get("output"):
+                result["output"] = "(no output)"
             # Save to history
             self._add_to_history(code, result)
-            
-        except SyntaxError as e:
-            result = {
-                "status": "error",
-                "error": f"Syntax Error (line {e.lineno}): {e.msg}",
-                "output": "",
-                "execution_time": round(time.time() - start_time, 4)
-            }
-        except Exception as e:
-            result = {
-                "status": "error",
-                "error": f"{type(e).__name__}: {str(e)}",
-                "output": output_buffer.getvalue()[:self.max_output],
-                "execution_time": round(time.time() - start_time, 4)
-            }
         
         return result
 
@@ -2,11 +2,17 @@
 SQLite Database Manager for JARVIS
 ===================================
 Handles conversation history, preferences, file metadata, and analytics
+
+Connections are pooled per thread and run in WAL mode so readers are not
+blocked by a writer in another gunicorn worker. Message search goes
+through an FTS5 index kept in sync by triggers.
 """
 
 import sqlite3
 import json
 import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from pathlib import Path
@@ -20,107 +26,183 @@ class Database:
             db_path = os.path.join(data_dir, "jarvis.db")
         
         self.db_path = db_path
+        self._local = threading.local()
+        self.fts_enabled = False
         self.init_database()
     
     def get_connection(self):
-        """Get database connection"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+        """Get this thread's pooled database connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Statement cache keeps prepared statements alive across calls
+            conn = sqlite3.connect(self.db_path, timeout=10, cached_statements=256)
+            conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
         return conn
     
-    def init_database(self):
-        """Initialize database schema"""
+    @contextmanager
+    def transaction(self):
+        """Yield a cursor; commit on success, roll back on error"""
         conn = self.get_connection()
         cursor = conn.cursor()
+        try:
+            yield cursor
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+    
+    def close(self):
+        """Close this thread's pooled connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+    
+    def init_database(self):
+        """Initialize database schema"""
+        with self.transaction() as cursor:
+            # Conversations table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS conversations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    title TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    workspace TEXT DEFAULT 'default'
+                )
+            """)
+            
+            # Messages table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    conversation_id INTEGER,
+                    role TEXT,
+                    content TEXT,
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    metadata TEXT,
+                    FOREIGN KEY (conversation_id) REFERENCES conversations(id)
+                )
+            """)
+            
+            # User preferences
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS preferences (
+                    key TEXT PRIMARY KEY,
+                    value TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # File uploads
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS file_uploads (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    filename TEXT,
+                    filepath TEXT,
+                    file_type TEXT,
+                    size_bytes INTEGER,
+                    uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    analysis_result TEXT
+                )
+            """)
+            
+            # Analytics
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS analytics (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    event_type TEXT,
+                    event_data TEXT,
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Create indexes (the single-column indexes these replace are dropped -
+            # CREATE INDEX IF NOT EXISTS would keep the old definition under the old name)
+            cursor.execute("DROP INDEX IF EXISTS idx_messages_conversation")
+            cursor.execute("DROP INDEX IF EXISTS idx_analytics_type")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_conversation_ts ON messages(conversation_id, timestamp)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_analytics_type_ts ON analytics(event_type, timestamp)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_analytics_timestamp ON analytics(timestamp)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_conversations_workspace ON conversations(workspace, updated_at)")
+            
+            self.fts_enabled = self._init_fts(cursor)
+        
+        print(f"[DATABASE] Initialized at {self.db_path} (fts5={self.fts_enabled})")
+    
+    def _init_fts(self, cursor) -> bool:
+        """Create the FTS5 message index and its sync triggers"""
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+        ).fetchone()
         
-        # Conversations table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS conversations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                workspace TEXT DEFAULT 'default'
-            )
-        """)
-        
-        # Messages table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                conversation_id INTEGER,
-                role TEXT,
-                content TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                metadata TEXT,
-                FOREIGN KEY (conversation_id) REFERENCES conversations(id)
-            )
-        """)
+        try:
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts
+                USING fts5(content, content='messages', content_rowid='id')
+            """)
+        except sqlite3.OperationalError as e:
+            # SQLite built without FTS5 - fall back to LIKE scans
+            print(f"[DATABASE] FTS5 unavailable: {e}")
+            return False
         
-        # User preferences
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS preferences (
-                key TEXT PRIMARY KEY,
-                value TEXT,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+            CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+                INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+            END
         """)
-        
-        # File uploads
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS file_uploads (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                filename TEXT,
-                filepath TEXT,
-                file_type TEXT,
-                size_bytes INTEGER,
-                uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                analysis_result TEXT
-            )
+            CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+                INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            END
         """)
-        
-        # Analytics
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS analytics (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                event_type TEXT,
-                event_data TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+            CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+                INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+                INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+            END
         """)
         
-        # Create indexes
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages(conversation_id)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_analytics_type ON analytics(event_type)")
+        if not exists:
+            # Index messages written before FTS was introduced
+            cursor.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
         
-        conn.commit()
-        conn.close()
-        
-        print(f"[DATABASE] Initialized at {self.db_path}")
+        return True
+    
+    @staticmethod
+    def _fts_query(query: str) -> str:
+        """Turn free text into a safe FTS5 MATCH expression (AND of quoted terms, last one prefix)"""
+        terms = [t.replace('"', '""') for t in query.split() if t.strip()]
+        if not terms:
+            return ""
+        quoted = [f'"{t}"' for t in terms]
+        quoted[-1] += "*"
+        return " ".join(quoted)
     
     # ==================== CONVERSATIONS ====================
     
     def create_conversation(self, title: str = "New Conversation", workspace: str = "default") -> int:
         """Create a new conversation"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO conversations (title, workspace)
-            VALUES (?, ?)
-        """, (title, workspace))
+        with self.transaction() as cursor:
+            cursor.execute("""
+                INSERT INTO conversations (title, workspace)
+                VALUES (?, ?)
+            """, (title, workspace))
         
-        conversation_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+            conversation_id = cursor.lastrowid
         
         return conversation_id
     
     def get_conversations(self, workspace: str = "default", limit: int = 50) -> List[Dict]:
         """Get all conversations"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        cursor = self.get_connection().cursor()
         
         cursor.execute("""
             SELECT c.*, COUNT(m.id) as message_count
@@ -133,79 +215,60 @@ class Database:
         """, (workspace, limit))
         
         conversations = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         
         return conversations
     
     def get_conversation(self, conversation_id: int) -> Optional[Dict]:
         """Get a specific conversation"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        cursor = self.get_connection().cursor()
         
         cursor.execute("SELECT * FROM conversations WHERE id = ?", (conversation_id,))
         row = cursor.fetchone()
-        conn.close()
         
         return dict(row) if row else None
     
     def update_conversation(self, conversation_id: int, title: str = None):
         """Update conversation title"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if title:
-            cursor.execute("""
-                UPDATE conversations 
-                SET title = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """, (title, conversation_id))
-        
-        conn.commit()
-        conn.close()
+        with self.transaction() as cursor:
+            if title:
+                cursor.execute("""
+                    UPDATE conversations 
+                    SET title = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, (title, conversation_id))
     
     def delete_conversation(self, conversation_id: int):
         """Delete a conversation and its messages"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
-        cursor.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
-        
-        conn.commit()
-        conn.close()
+        with self.transaction() as cursor:
+            cursor.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+            cursor.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
     
     # ==================== MESSAGES ====================
     
     def add_message(self, conversation_id: int, role: str, content: str, metadata: Dict = None) -> int:
         """Add a message to a conversation"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         metadata_json = json.dumps(metadata) if metadata else None
         
-        cursor.execute("""
-            INSERT INTO messages (conversation_id, role, content, metadata)
-            VALUES (?, ?, ?, ?)
-        """, (conversation_id, role, content, metadata_json))
-        
-        message_id = cursor.lastrowid
+        with self.transaction() as cursor:
+            cursor.execute("""
+                INSERT INTO messages (conversation_id, role, content, metadata)
+                VALUES (?, ?, ?, ?)
+            """, (conversation_id, role, content, metadata_json))
         
-        # Update conversation timestamp
-        cursor.execute("""
-            UPDATE conversations 
-            SET updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        """, (conversation_id,))
+            message_id = cursor.lastrowid
         
-        conn.commit()
-        conn.close()
+            # Update conversation timestamp
+            cursor.execute("""
+                UPDATE conversations 
+                SET updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (conversation_id,))
         
         return message_id
     
     def get_messages(self, conversation_id: int, limit: int = 100) -> List[Dict]:
         """Get messages for a conversation"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        cursor = self.get_connection().cursor()
         
         cursor.execute("""
             SELECT * FROM messages
@@ -221,25 +284,35 @@ class Database:
                 msg['metadata'] = json.loads(msg['metadata'])
             messages.append(msg)
         
-        conn.close()
         return messages
     
     def search_messages(self, query: str, workspace: str = "default", limit: int = 20) -> List[Dict]:
         """Search messages by content"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        cursor = self.get_connection().cursor()
         
-        cursor.execute("""
-            SELECT m.*, c.title as conversation_title
-            FROM messages m
-            JOIN conversations c ON m.conversation_id = c.id
-            WHERE c.workspace = ? AND m.content LIKE ?
-            ORDER BY m.timestamp DESC
-            LIMIT ?
-        """, (workspace, f"%{query}%", limit))
+        match = self._fts_query(query) if self.fts_enabled else ""
+        
+        if match:
+            cursor.execute("""
+                SELECT m.*, c.title as conversation_title
+                FROM messages_fts f
+                JOIN messages m ON m.id = f.rowid
+                JOIN conversations c ON m.conversation_id = c.id
+                WHERE messages_fts MATCH ? AND c.workspace = ?
+                ORDER BY m.timestamp DESC
+                LIMIT ?
+            """, (match, workspace, limit))
+        else:
+            cursor.execute("""
+                SELECT m.*, c.title as conversation_title
+                FROM messages m
+                JOIN conversations c ON m.conversation_id = c.id
+                WHERE c.workspace = ? AND m.content LIKE ?
+                ORDER BY m.timestamp DESC
+                LIMIT ?
+            """, (workspace, f"%{query}%", limit))
         
         results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         
         return results
     
@@ -247,27 +320,20 @@ class Database:
     
     def set_preference(self, key: str, value: Any):
         """Set a user preference"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         value_json = json.dumps(value)
         
-        cursor.execute("""
-            INSERT OR REPLACE INTO preferences (key, value, updated_at)
-            VALUES (?, ?, CURRENT_TIMESTAMP)
-        """, (key, value_json))
-        
-        conn.commit()
-        conn.close()
+        with self.transaction() as cursor:
+            cursor.execute("""
+                INSERT OR REPLACE INTO preferences (key, value, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+            """, (key, value_json))
     
     def get_preference(self, key: str, default: Any = None) -> Any:
         """Get a user preference"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        cursor = self.get_connection().cursor()
         
         cursor.execute("SELECT value FROM preferences WHERE key = ?", (key,))
         row = cursor.fetchone()
-        conn.close()
         
         if row:
             return json.loads(row['value'])
@@ -275,12 +341,10 @@ class Database:
     
     def get_all_preferences(self) -> Dict:
         """Get all preferences"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        cursor = self.get_connection().cursor()
         
         cursor.execute("SELECT key, value FROM preferences")
         prefs = {row['key']: json.loads(row['value']) for row in cursor.fetchall()}
-        conn.close()
         
         return prefs
     
@@ -289,26 +353,21 @@ class Database:
     def add_file_upload(self, filename: str, filepath: str, file_type: str, 
                        size_bytes: int, analysis_result: Dict = None) -> int:
         """Record a file upload"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         analysis_json = json.dumps(analysis_result) if analysis_result else None
         
-        cursor.execute("""
-            INSERT INTO file_uploads (filename, filepath, file_type, size_bytes, analysis_result)
-            VALUES (?, ?, ?, ?, ?)
-        """, (filename, filepath, file_type, size_bytes, analysis_json))
+        with self.transaction() as cursor:
+            cursor.execute("""
+                INSERT INTO file_uploads (filename, filepath, file_type, size_bytes, analysis_result)
+                VALUES (?, ?, ?, ?, ?)
+            """, (filename, filepath, file_type, size_bytes, analysis_json))
         
-        file_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+            file_id = cursor.lastrowid
         
         return file_id
     
     def get_file_uploads(self, limit: int = 50) -> List[Dict]:
         """Get recent file uploads"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        cursor = self.get_connection().cursor()
         
         cursor.execute("""
             SELECT * FROM file_uploads
@@ -323,30 +382,23 @@ class Database:
                 file_data['analysis_result'] = json.loads(file_data['analysis_result'])
             files.append(file_data)
         
-        conn.close()
         return files
     
     # ==================== ANALYTICS ====================
     
     def track_event(self, event_type: str, event_data: Dict = None):
         """Track an analytics event"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         data_json = json.dumps(event_data) if event_data else None
         
-        cursor.execute("""
-            INSERT INTO analytics (event_type, event_data)
-            VALUES (?, ?)
-        """, (event_type, data_json))
-        
-        conn.commit()
-        conn.close()
+        with self.transaction() as cursor:
+            cursor.execute("""
+                INSERT INTO analytics (event_type, event_data)
+                VALUES (?, ?)
+            """, (event_type, data_json))
     
     def get_analytics(self, event_type: str = None, days: int = 7) -> List[Dict]:
         """Get analytics data"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        cursor = self.get_connection().cursor()
         
         if event_type:
             cursor.execute("""
@@ -369,13 +421,11 @@ class Database:
                 event['event_data'] = json.loads(event['event_data'])
             events.append(event)
         
-        conn.close()
         return events
     
     def get_analytics_summary(self, days: int = 7) -> Dict:
         """Get analytics summary"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        cursor = self.get_connection().cursor()
         
         cursor.execute("""
             SELECT 
@@ -388,7 +438,6 @@ class Database:
         """, (days,))
         
         summary = {row['event_type']: row['count'] for row in cursor.fetchall()}
-        conn.close()
         
         return summary
 
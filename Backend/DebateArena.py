@@ -6,12 +6,15 @@ Learn both perspectives, get a final verdict.
 """
 
 import logging
-from typing import Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Iterator
 from datetime import datetime
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+PANEL_MAX_WORKERS = 4  # panel arguments generated in parallel per round
+
 
 class AIDebateArena:
     """
@@ -77,8 +80,25 @@ class AIDebateArena:
         Returns:
             Complete debate transcript with verdict
         """
+        result = {"status": "error", "message": "Debate ended without a verdict"}
+        for event in self.stream_debate(topic, rounds, participants):
+            if event["type"] == "complete":
+                result = event["result"]
+            elif event["type"] == "error":
+                return {"status": "error", "message": event["message"]}
+        return result
+    
+    def stream_debate(self, topic: str, rounds: int = 3, participants: List[Dict] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Run a debate, yielding each event as soon as it is produced.
+        
+        Yields {"type": "sides"} once the positions are known, one {"type": "turn"}
+        per PRO/CON argument, {"type": "verdict"}, and finally {"type": "complete"}
+        carrying the same transcript start_debate() returns.
+        """
         if not self.llm:
-            return {"status": "error", "message": "LLM not available"}
+            yield {"type": "error", "message": "LLM not available"}
+            return
         
         # Use custom participants if provided
         if participants:
@@ -99,6 +119,7 @@ class AIDebateArena:
         print(f"\n🎭 DEBATE ARENA: {topic}\n")
         print(f"🔵 PRO: {pro_side}")
         print(f"🔴 CON: {con_side}\n")
+        yield {"type": "sides", "topic": topic, "pro_position": pro_side, "con_position": con_side, "rounds": rounds}
         
         # Run debate rounds
         for round_num in range(1, rounds + 1):
@@ -110,31 +131,36 @@ class AIDebateArena:
                 topic, pro_side, "PRO", round_num, pro_context, pro_arguments
             )
             pro_arguments.append(pro_arg)
-            debate_log.append({
+            entry = {
                 "round": round_num,
                 "side": "PRO",
                 "position": pro_side,
                 "argument": pro_arg
-            })
+            }
+            debate_log.append(entry)
             print(f"🔵 PRO: {pro_arg}\n")
+            yield {"type": "turn", **entry}
             
             # CON argument (responding to PRO)
             con_arg = self._generate_argument(
                 topic, con_side, "CON", round_num, pro_arg, con_arguments
             )
             con_arguments.append(con_arg)
-            debate_log.append({
+            entry = {
                 "round": round_num,
                 "side": "CON",
                 "position": con_side,
                 "argument": con_arg
-            })
+            }
+            debate_log.append(entry)
             print(f"🔴 CON: {con_arg}\n")
+            yield {"type": "turn", **entry}
         
         # Final verdict
         verdict = self._generate_verdict(topic, pro_side, con_side, debate_log)
+        yield {"type": "verdict", **verdict}
         
-        return {
+        yield {"type": "complete", "result": {
             "status": "success",
             "topic": topic,
             "pro_position": pro_side,
@@ -143,7 +169,7 @@ class AIDebateArena:
             "debate_log": debate_log,
             "verdict": verdict,
             "timestamp": datetime.now().isoformat()
-        }
+        }}
     
     def _analyze_topic(self, topic: str) -> Dict[str, str]:
         """Determine the two sides of a debate topic."""
@@ -300,28 +326,21 @@ Be fair and objective."""
         
         debate_log = []
         
-        for round_num in range(1, rounds + 1):
-            for participant in participants:
-                arg_prompt = f"""You are {participant['name']}, arguing: {participant['stance']}
-Persona: {participant.get('persona', 'expert')}
-
-TOPIC: {topic}
-ROUND: {round_num}
-
-Provide your argument (2-3 sentences):"""
-                
-                argument = self.llm(
-                    messages=[{"role": "user", "content": arg_prompt}],
-                    model="llama-3.3-70b-versatile",
-                    inject_memory=False
-                )
-                
-                debate_log.append({
-                    "round": round_num,
-                    "participant": participant['name'],
-                    "stance": participant['stance'],
-                    "argument": argument.strip()
-                })
+        # Panel arguments only depend on the participant and round, so each
+        # round's arguments are generated concurrently
+        with ThreadPoolExecutor(max_workers=min(len(participants), PANEL_MAX_WORKERS)) as executor:
+            for round_num in range(1, rounds + 1):
+                arguments = list(executor.map(
+                    lambda participant: self._generate_panel_argument(topic, participant, round_num),
+                    participants
+                ))
+                for participant, argument in zip(participants, arguments):
+                    debate_log.append({
+                        "round": round_num,
+                        "participant": participant['name'],
+                        "stance": participant['stance'],
+                        "argument": argument
+                    })
         
         return {
             "status": "success",
@@ -332,6 +351,23 @@ Provide your argument (2-3 sentences):"""
             "debate_log": debate_log,
             "timestamp": datetime.now().isoformat()
         }
+    
+    def _generate_panel_argument(self, topic: str, participant: Dict, round_num: int) -> str:
+        """Generate one panelist's argument for a round."""
+        arg_prompt = f"""You are {participant['name']}, arguing: {participant['stance']}
+Persona: {participant.get('persona', 'expert')}
+
+TOPIC: {topic}
+ROUND: {round_num}
+
+Provide your argument (2-3 sentences):"""
+        
+        argument = self.llm(
+            messages=[{"role": "user", "content": arg_prompt}],
+            model="llama-3.3-70b-versatile",
+            inject_memory=False
+        )
+        return argument.strip()
 
 
 # Global instance
@@ -22,14 +22,46 @@ from Backend.IntentClassifier import IntentClassifier
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Shared by every intent, so it leads the system prompt and stays a stable
+# prefix for provider-side prompt caching
+TOOL_RULES_PROMPT = """### CRITICAL RULES
+1. **NO GUESSING**: If you don't know the parameter, ask the user.
+2. **STRICT FORMAT**: To use a tool, return JSON ONLY:
+{
+  "tool": "tool_name",
+  "parameters": { "arg": "value" }
+}
+3. **PLANNING**: If the request is complex, you can output a text thought before the JSON.
+4. If no tool is needed, just reply with text.
+
+### RESPONSE STYLE
+- Be friendly, concise, and helpful.
+- Avoid robotic phrases like "I will now proceed to..."
+- Instead say: "Sure, opening that for you.", "I found this.", "Done."
+- Keep text confirmation short when taking actions.
+"""
+
+MULTI_STEP_INSTRUCTION = """### MULTI-STEP PLANNING MODE
+The user request requires multiple actions.
+1. First, think step-by-step about what needs to be done.
+2. Execute tools one by one.
+3. Verify the output of each tool before proceeding.
+"""
+
 class ToolRegistry:
     def __init__(self):
         self.tools: Dict[str, Tool] = {}
-        self.schemas: List[Dict[str, Any]] = []
+        self.schemas: Dict[str, Dict[str, Any]] = {}  # tool name -> schema (re-registering replaces)
+        self.version = 0  # bumped on register so prompt caches built from it go stale
+        self._intent_cache: Dict[str, List[Dict[str, Any]]] = {}
+        self._definitions_cache: Dict[str, str] = {}
 
     def register(self, tool: Tool):
         self.tools[tool.name] = tool
-        self.schemas.append(tool.to_schema())
+        self.schemas[tool.name] = tool.to_schema()
+        self.version += 1
+        self._intent_cache.clear()
+        self._definitions_cache.clear()
         logger.info(f"Registered tool: {tool.name} (Domain: {tool.domain})")
 
     def get_tool(self, name: str) -> Optional[Tool]:
@@ -43,19 +75,31 @@ class ToolRegistry:
         if intent == "multi_step":
             # For multi-step, we allow almost everything, but maybe prioritizing 'high' value tools?
             # Creating a plan usually involves search, apps, system.
-            return self.schemas # Allow all for complex planning
-
-        allowed_schemas = []
-        for tool in self.tools.values():
-            if tool.domain == intent or intent in tool.allowed_intents:
-                allowed_schemas.append(tool.to_schema())
+            return list(self.schemas.values()) # Allow all for complex planning
+
+        allowed_schemas = self._intent_cache.get(intent)
+        if allowed_schemas is None:
+            allowed_schemas = [
+                self.schemas[name] for name, tool in self.tools.items()
+                if tool.domain == intent or intent in tool.allowed_intents
+            ]
+            self._intent_cache[intent] = allowed_schemas
         
         return allowed_schemas
 
+    def get_tool_definitions(self, intent: str) -> str:
+        """Compact, key-sorted JSON of the intent's tools, serialised once per intent."""
+        definitions = self._definitions_cache.get(intent)
+        if definitions is None:
+            definitions = json.dumps(self.get_tools_for_intent(intent), separators=(",", ":"), sort_keys=True)
+            self._definitions_cache[intent] = definitions
+        return definitions
+
 class Dispatcher:
     def __init__(self):
         self.registry = ToolRegistry()
         self.classifier = IntentClassifier()
+        self._prompt_cache: Dict[tuple, str] = {}  # (intent, registry version) -> prompt
         self._register_default_tools()
         
     def _register_default_tools(self):
@@ -73,6 +117,31 @@ class Dispatcher:
         self.registry.register(TranslatorTool())
         self.registry.register(MathTool())
         
+    def _tool_prompt(self, intent: str) -> str:
+        """Rules, mode instruction and tool catalogue for an intent, built once per intent."""
+        key = (intent, self.registry.version)
+        prompt = self._prompt_cache.get(key)
+        if prompt is not None:
+            return prompt
+        
+        # Specialized System Prompts based on Intent
+        if intent == "multi_step":
+            mode_instruction = MULTI_STEP_INSTRUCTION
+        elif intent == "conversation":
+            mode_instruction = "You are in CONVERSATION mode. Do NOT use tools unless explicitly necessary."
+        else:
+            mode_instruction = f"You are in {intent.upper()} mode. ONLY use tools relevant to this domain."
+        
+        prompt = f"""{TOOL_RULES_PROMPT}
+{mode_instruction}
+
+### AVAILABLE TOOLS (STRICT USAGE)
+You have access ONLY to these tools:
+{self.registry.get_tool_definitions(intent)}
+"""
+        self._prompt_cache[key] = prompt
+        return prompt
+    
     def process_query(self, user_query: str, history: List[Dict[str, str]], system_prompt: str) -> str:
         """
         Smart Dispatcher Loop:
@@ -84,53 +153,15 @@ class Dispatcher:
         intent = self.classifier.classify(user_query, history)
         logger.info(f"User Query: '{user_query}' | Detected Intent: {intent}")
         
-        # 2. Tool Selection
-        active_tools = self.registry.get_tools_for_intent(intent)
-        tool_definitions = json.dumps(active_tools, indent=2)
+        # 2. Tool Selection + static prompt prefix (cached per intent)
+        tool_prompt = self._tool_prompt(intent)
         
-        # 3. Mode Selection
+        # 3. Conversation
         current_messages = history.copy()
         current_messages.append({"role": "user", "content": user_query})
         
-        # Specialized System Prompts based on Intent
-        mode_instruction = ""
-        if intent == "multi_step":
-            mode_instruction = """
-### MULTI-STEP PLANNING MODE
-The user request requires multiple actions.
-1. First, think step-by-step about what needs to be done.
-2. Execute tools one by one.
-3. Verify the output of each tool before proceeding.
-"""
-        elif intent == "conversation":
-            mode_instruction = "You are in CONVERSATION mode. Do NOT use tools unless explicitly necessary."
-        else:
-            mode_instruction = f"You are in {intent.upper()} mode. ONLY use tools relevant to this domain."
-
-        enhanced_system = f"""{system_prompt}
-
-{mode_instruction}
-
-### AVAILABLE TOOLS (STRICT USAGE)
-You have access ONLY to these tools:
-{tool_definitions}
-
-### CRITICAL RULES
-1. **NO GUESSING**: If you don't know the parameter, ask the user.
-2. **STRICT FORMAT**: To use a tool, return JSON ONLY:
-{{
-  "tool": "tool_name",
-  "parameters": {{ "arg": "value" }}
-}}
-3. **PLANNING**: If the request is complex, you can output a text thought before the JSON.
-4. If no tool is needed, just reply with text.
-
-### RESPONSE STYLE
-- Be friendly, concise, and helpful.
-- Avoid robotic phrases like "I will now proceed to..."
-- Instead say: "Sure, opening that for you.", "I found this.", "Done."
-- Keep text confirmation short when taking actions.
-"""
+        # Static rules and tools first, per-request system prompt last
+        enhanced_system = f"{tool_prompt}\n{system_prompt}"
 
         # Execution Loop
         MAX_TURNS = 6
@@ -8,7 +8,6 @@ Renders HTML templates to PDF using:
 """
 
 import os
-import asyncio
 from datetime import datetime
 from typing import Dict, Any, Optional, Tuple
 from pathlib import Path
@@ -122,14 +121,13 @@ class DocumentRenderer:
 <footer><p>Generated by Kai AI</p></footer>
 </body></html>"""
     
-    async def _render_pdf_playwright(self, html: str, output_path: str) -> bool:
-        """Render PDF using Playwright (primary method)."""
+    def _render_pdf_playwright(self, html: str, output_path: str) -> bool:
+        """Render PDF using Playwright (primary method) on the shared browser pool."""
         try:
-            from playwright.async_api import async_playwright
+            from Backend.BrowserPool import get_browser_pool
             
-            async with async_playwright() as p:
-                browser = await p.chromium.launch()
-                page = await browser.new_page()
+            async def render(browser_context):
+                page = await browser_context.new_page()
                 
                 # Set content
                 await page.set_content(html, wait_until="networkidle")
@@ -141,10 +139,10 @@ class DocumentRenderer:
                     margin={"top": "0.75in", "bottom": "0.75in", "left": "0.75in", "right": "0.75in"},
                     print_background=True
                 )
-                
-                await browser.close()
-                print(f"[Renderer] ✅ PDF generated with Playwright: {output_path}")
-                return True
+            
+            get_browser_pool().run(render)
+            print(f"[Renderer] ✅ PDF generated with Playwright: {output_path}")
+            return True
                 
         except Exception as e:
             print(f"[Renderer] ❌ Playwright error: {e}")
@@ -203,17 +201,8 @@ class DocumentRenderer:
         
         # Step 2: Try Playwright (primary)
         if self._check_playwright():
-            try:
-                # Run async in sync context
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                success = loop.run_until_complete(self._render_pdf_playwright(html, output_path))
-                loop.close()
-                
-                if success:
-                    return self._build_result(True, output_path, filename, "pdf")
-            except Exception as e:
-                print(f"[Renderer] Playwright async error: {e}")
+            if self._render_pdf_playwright(html, output_path):
+                return self._build_result(True, output_path, filename, "pdf")
         
         # Step 3: Try WeasyPrint (fallback)
         if self._check_weasyprint():
@@ -10,7 +10,7 @@ from datetime import datetime
 from typing import Optional, Dict, Any, Tuple
 import logging
 import re
-from Backend.SecurityManager import hash_password, verify_password, create_access_token, create_refresh_token
+from Backend.SecurityManager import hash_password, verify_password, create_access_token, create_refresh_token, token_cache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -160,8 +160,11 @@ class FirebaseAuth:
             Tuple of (success, message, auth_data with tokens)
         """
         try:
-            # Verify Google ID token
-            decoded_token = auth.verify_id_token(google_id_token)
+            # Verify Google ID token (cached until exp to skip repeat key fetches)
+            decoded_token = token_cache.get(google_id_token, "firebase")
+            if decoded_token is None:
+                decoded_token = auth.verify_id_token(google_id_token)
+                token_cache.set(google_id_token, "firebase", decoded_token)
             google_user_id = decoded_token['uid']
             email = decoded_token.get('email')
             
@@ -6,7 +6,7 @@ Unified data access with schema validation, caching, and encryption
 
 from firebase_admin import firestore
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from pydantic import BaseModel, Field, validator
 import logging
 from collections import OrderedDict
@@ -326,7 +326,8 @@ class FirebaseDAL:
             return None
     
     def list(self, collection: str, user_id: str, limit: int = 50, order_by: Optional[str] = None, 
-             descending: bool = True, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+             descending: bool = True, filters: Optional[Dict[str, Any]] = None,
+             strict: bool = False) -> List[Dict[str, Any]]:
         """
         List documents in a collection
         
@@ -337,6 +338,7 @@ class FirebaseDAL:
             order_by: Field to order by
             descending: Sort order
             filters: Optional filters (field: value)
+            strict: Re-raise query errors (e.g. missing composite index) instead of returning []
             
         Returns:
             List of documents
@@ -372,6 +374,8 @@ class FirebaseDAL:
             return results
             
         except Exception as e:
+            if strict:
+                raise
             logger.error(f"[DAL] List error in {collection}: {e}")
             return []
     
@@ -490,6 +494,65 @@ class FirebaseDAL:
             logger.error(f"[DAL] Batch create error in {collection}: {e}")
             return []
     
+    def batch_write(self, user_id: str,
+                    creates: Optional[List[Tuple[str, Dict[str, Any]]]] = None,
+                    updates: Optional[List[Tuple[str, str, Dict[str, Any]]]] = None) -> Optional[List[str]]:
+        """
+        Commit creates and updates across collections as a single atomic batch
+        
+        Args:
+            user_id: User ID
+            creates: List of (collection, data) documents to create
+            updates: List of (collection, doc_id, updates) to apply to existing documents
+            
+        Returns:
+            List of created document IDs if the batch committed, None otherwise
+        """
+        try:
+            batch = self.db.batch()
+            created = []
+            touched = set()
+            
+            for collection, item in creates or []:
+                if collection in self.SCHEMAS:
+                    validated = self.SCHEMAS[collection](**item).dict()
+                else:
+                    validated = item
+                validated = self._encrypt_fields(collection, validated)
+                
+                doc_ref = self.db.collection(collection).document(user_id).collection(collection).document()
+                batch.set(doc_ref, validated)
+                created.append(doc_ref.id)
+                touched.add(collection)
+            
+            for collection, doc_id, fields in updates or []:
+                fields = self._encrypt_fields(collection, fields)
+                if "updated_at" not in fields:
+                    fields["updated_at"] = datetime.utcnow()
+                
+                doc_ref = self.db.collection(collection).document(user_id).collection(collection).document(doc_id)
+                batch.update(doc_ref, fields)
+                self.cache.invalidate(f"{collection}:{user_id}:{doc_id}")
+                touched.add(collection)
+            
+            # Single round trip for every write
+            batch.commit()
+            
+            for collection in touched:
+                self.cache.invalidate_pattern(f"{collection}:{user_id}")
+            
+            logger.info(f"[DAL] Batch committed {len(created)} creates, {len(updates or [])} updates")
+            return created
+            
+        except Exception as e:
+            logger.error(f"[DAL] Batch write error: {e}")
+            return None
+    
+    @staticmethod
+    def increment(amount: int = 1):
+        """Server-side numeric increment sentinel for use in updates"""
+        return firestore.Increment(amount)
+    
     # ==================== HELPER METHODS ====================
     
     def _encrypt_fields(self, collection: str, data: Dict[str, Any]) -> Dict[str, Any]:
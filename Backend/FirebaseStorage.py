@@ -1,5 +1,12 @@
 """
 Firebase Storage for Web Scraped Data with Auto-Cleanup
+
+Expiry: every document carries an indexed `expires_at`. In production a
+Firestore TTL policy on that field (see firestore.indexes.json) deletes
+expired documents server-side; set FIRESTORE_TTL_ENABLED=1 to skip the
+local sweep entirely. Otherwise purge_expired() pages through expired
+documents and deletes them in batched writes. Point
+FIRESTORE_EMULATOR_HOST at the emulator to exercise that path locally.
 """
 
 import firebase_admin
@@ -12,6 +19,11 @@ from typing import Dict, List, Optional, Any
 import threading
 import time
 
+# Firestore caps a WriteBatch at 500 operations
+MAX_BATCH_SIZE = 500
+CLEANUP_INTERVAL = 3600
+SCRAPED_DATA_TTL_HOURS = 24
+
 class FirebaseStorage:
     """
     Firebase storage for scraped data with automatic cleanup
@@ -85,6 +97,12 @@ class FirebaseStorage:
                         break
                 
                 if not found:
+                    if os.getenv('FIRESTORE_EMULATOR_HOST'):
+                        # Emulator needs no credentials, only a project id
+                        firebase_admin.initialize_app(options={'projectId': project_id or 'demo-kai'})
+                        self.db = firestore.client()
+                        logging.info(f"Firebase Storage: Using Firestore emulator at {os.getenv('FIRESTORE_EMULATOR_HOST')}")
+                        return
                     logging.warning(f"Firebase credentials not found, Firestore will not be available")
                     return
             
@@ -171,7 +189,11 @@ class FirebaseStorage:
             self.db = None
     
     def _start_cleanup_thread(self):
-        """Start the cleanup thread for old data"""
+        """Start the cleanup thread for old data (not needed when a TTL policy is active)"""
+        if os.getenv('FIRESTORE_TTL_ENABLED', '').lower() in ('1', 'true', 'yes'):
+            logging.info("Firestore TTL policy enabled, local cleanup thread not started")
+            return
+        
         if self.cleanup_thread is None or not self.cleanup_thread.is_alive():
             self.running = True
             self.cleanup_thread = threading.Thread(target=self._cleanup_old_data, daemon=True)
@@ -179,36 +201,101 @@ class FirebaseStorage:
             logging.info("Cleanup thread started")
     
     def _cleanup_old_data(self):
-        """Clean up old scraped data (runs in background thread)"""
+        """Clean up expired scraped data (runs in background thread)"""
         while self.running:
             try:
                 if self.db is None:
                     time.sleep(300)  # Wait 5 minutes if Firebase not available
                     continue
                 
-                # Clean up data older than 24 hours
-                cutoff_time = datetime.utcnow() - timedelta(hours=24)
-                
-                # Get old documents
-                old_docs = self.db.collection('scraped_data').where(
-                    'created_at', '<', cutoff_time
-                ).stream()
-                
-                deleted_count = 0
-                for doc in old_docs:
-                    doc.reference.delete()
-                    deleted_count += 1
-                
-                if deleted_count > 0:
-                    logging.info(f"Cleaned up {deleted_count} old scraped data entries")
+                # Only one worker sweeps per interval
+                if self._claim_cleanup_lease():
+                    deleted_count = self.purge_expired()
+                    if deleted_count > 0:
+                        logging.info(f"Cleaned up {deleted_count} old scraped data entries")
                 
                 # Wait 1 hour before next cleanup
-                time.sleep(3600)
+                time.sleep(CLEANUP_INTERVAL)
                 
             except Exception as e:
                 logging.error(f"Error in cleanup thread: {e}")
                 time.sleep(300)  # Wait 5 minutes on error
     
+    def _claim_cleanup_lease(self) -> bool:
+        """
+        Claim the cleanup slot for this interval across all workers
+        
+        Returns:
+            True if this process should run the sweep now
+        """
+        lease_ref = self.db.collection('_maintenance').document('scraped_data_cleanup')
+        transaction = self.db.transaction()
+        
+        @firestore.transactional
+        def claim(transaction):
+            snapshot = lease_ref.get(transaction=transaction)
+            last_run = snapshot.get('last_run') if snapshot.exists else None
+            now = datetime.utcnow()
+            if last_run is not None and now - last_run.replace(tzinfo=None) < timedelta(seconds=CLEANUP_INTERVAL - 60):
+                return False
+            transaction.set(lease_ref, {'last_run': now, 'pid': os.getpid()})
+            return True
+        
+        try:
+            return claim(transaction)
+        except Exception as e:
+            logging.warning(f"Cleanup lease unavailable, sweeping anyway: {e}")
+            return True
+    
+    def purge_expired(self, now: datetime = None, batch_size: int = MAX_BATCH_SIZE,
+                      max_batches: Optional[int] = None) -> int:
+        """
+        Delete documents whose expires_at has passed, in batched writes
+        
+        Args:
+            now: Reference time (defaults to utcnow)
+            batch_size: Documents per batch, capped at 500
+            max_batches: Stop after this many batches (None = drain)
+            
+        Returns:
+            Number of documents deleted
+        """
+        if self.db is None:
+            return self._cleanup_local_files(SCRAPED_DATA_TTL_HOURS)
+        
+        query = self.db.collection('scraped_data').where('expires_at', '<=', now or datetime.utcnow())
+        return self._delete_in_batches(query, 'expires_at', batch_size, max_batches)
+    
+    def _delete_in_batches(self, query, order_field: str, batch_size: int = MAX_BATCH_SIZE,
+                           max_batches: Optional[int] = None) -> int:
+        """Page through a query ordered by an indexed field and delete each page in one commit"""
+        batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+        query = query.order_by(order_field)
+        
+        deleted_count = 0
+        batches = 0
+        last_doc = None
+        
+        while max_batches is None or batches < max_batches:
+            page = query.start_after(last_doc) if last_doc is not None else query
+            docs = list(page.limit(batch_size).stream())
+            if not docs:
+                break
+            
+            batch = self.db.batch()
+            for doc in docs:
+                batch.delete(doc.reference)
+            batch.commit()
+            
+            deleted_count += len(docs)
+            batches += 1
+            last_doc = docs[-1]
+            
+            if len(docs) < batch_size:
+                break
+        
+        return deleted_count
+    
     def save_scraped_data(self, data: Dict[str, Any]) -> bool:
         """
         Save scraped data to Firebase
@@ -226,7 +313,7 @@ class FirebaseStorage:
             
             # Add metadata
             data['created_at'] = datetime.utcnow()
-            data['expires_at'] = datetime.utcnow() + timedelta(hours=24)
+            data['expires_at'] = datetime.utcnow() + timedelta(hours=SCRAPED_DATA_TTL_HOURS)
             
             # Save to Firebase
             doc_ref = self.db.collection('scraped_data').add(data)
@@ -340,15 +427,8 @@ class FirebaseStorage:
             
             cutoff_time = datetime.utcnow() - timedelta(hours=hours_old)
             
-            # Get old documents
-            old_docs = self.db.collection('scraped_data').where(
-                'created_at', '<', cutoff_time
-            ).stream()
-            
-            deleted_count = 0
-            for doc in old_docs:
-                doc.reference.delete()
-                deleted_count += 1
+            query = self.db.collection('scraped_data').where('created_at', '<', cutoff_time)
+            deleted_count = self._delete_in_batches(query, 'created_at')
             
             logging.info(f"Manually cleaned up {deleted_count} old entries")
             return deleted_count
@@ -14,9 +14,11 @@ import aiohttp
 from bs4 import BeautifulSoup
 import json
 import re
-from typing import Dict, List, Optional
+from typing import Awaitable, Callable, Dict, List, Optional
 from urllib.parse import urljoin, urlparse
 
+MAX_REDIRECTS = 5   # hops followed when fetch() checks each one with redirect_guard
+
 class JarvisWebScraper:
     def __init__(self):
         self.session = None
@@ -33,21 +35,43 @@ class JarvisWebScraper:
             self.session = aiohttp.ClientSession(headers=self.headers, timeout=timeout)
         return self.session
 
-    async def fetch(self, url: str) -> Optional[str]:
-        """Fetch raw HTML with resilience"""
+    async def fetch(self, url: str, max_bytes: Optional[int] = None,
+                    redirect_guard: Optional[Callable[[str], Awaitable]] = None) -> Optional[str]:
+        """
+        Fetch raw HTML with resilience.
+        
+        max_bytes stops reading the body after that many bytes; redirect_guard
+        is awaited on every redirect target before it is requested (raise to
+        refuse it).
+        """
         try:
             session = await self.get_session()
-            async with session.get(url, allow_redirects=True) as response:
-                if response.status == 200:
-                    return await response.text()
-                print(f"[Scraper] HTTP {response.status} for {url}")
+            for _ in range(MAX_REDIRECTS + 1):
+                async with session.get(url, allow_redirects=redirect_guard is None) as response:
+                    if redirect_guard and response.status in (301, 302, 303, 307, 308) and response.headers.get('Location'):
+                        url = urljoin(str(response.url), response.headers['Location'])
+                        await redirect_guard(url)
+                        continue
+                    if response.status == 200:
+                        if max_bytes is None:
+                            return await response.text()
+                        body = bytearray()
+                        async for chunk in response.content.iter_chunked(65536):
+                            body += chunk[:max_bytes - len(body)]
+                            if len(body) >= max_bytes:
+                                break
+                        return body.decode(response.charset or 'utf-8', errors='replace')
+                    print(f"[Scraper] HTTP {response.status} for {url}")
+                    return None
+            print(f"[Scraper] Too many redirects for {url}")
         except Exception as e:
             print(f"[Scraper] Fetch Error: {e}")
         return None
 
-    async def scrape_to_markdown(self, url: str) -> str:
+    async def scrape_to_markdown(self, url: str, max_bytes: Optional[int] = None,
+                                 redirect_guard: Optional[Callable[[str], Awaitable]] = None) -> str:
         """Beast Mode: Convert page to ultra-rich Markdown for LLM consumption"""
-        html = await self.fetch(url)
+        html = await self.fetch(url, max_bytes=max_bytes, redirect_guard=redirect_guard)
         if not html: return f"Error: Could not reach {url}"
         
         soup = BeautifulSoup(html, 'html.parser')
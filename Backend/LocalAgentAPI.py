@@ -15,11 +15,14 @@ import os
 import json
 import uuid
 import secrets
+import threading
 import time
 from datetime import datetime, timedelta
 from functools import wraps
 from flask import Blueprint, request, jsonify, g, session
 
+from Backend.AgentTaskQueue import get_task_queue
+
 # ==================== CONFIGURATION ====================
 
 # Firebase Firestore for persistent device storage
@@ -215,11 +218,30 @@ def _get_user_devices_from_firestore(user_id: str):
 # In-memory cache (synced with Firestore)
 # SECURITY: Every device is bound to a user_id
 _registered_devices = _load_devices_from_firestore()  # {device_id: {user_id, name, auth_token, registered_at, last_seen}}
-_pending_tasks = {}       # {device_id: [{task_id, command, params, created_at, user_id}]}
-_task_results = {}        # {task_id: {device_id, status, result, reported_at}}
 
-# Pairing codes (one-time use, 10-minute expiry)
-_pending_pairing_codes = {}  # {code: {user_id, expires_at, used}}
+# Pending tasks, task results and pairing codes (one-time use, 10-minute expiry)
+# live in a queue shared by every worker process - see AgentTaskQueue
+_task_queue = get_task_queue()
+
+
+def enqueue_task(device_id: str, task: dict):
+    """Queue a task ({task_id, command, params, created_at, user_id}) for polling delivery."""
+    _task_queue.enqueue(device_id, task)
+
+
+def get_task_result(task_id: str):
+    """Get a reported task result ({device_id, status, result, reported_at}) or None."""
+    return _task_queue.get_result(task_id)
+
+
+def wait_for_task_result(task_id: str, timeout: float):
+    """Block until the agent reports a result for task_id (or timeout); returns it or None."""
+    return _task_queue.wait_for_result(task_id, timeout)
+
+
+def record_task_result(task_id: str, result: dict):
+    """Store a task result reported by an agent (HTTP or WebSocket) and ack the task."""
+    _task_queue.set_result(task_id, result)
 
 def _save_pairing_code_to_firestore(code: str, pairing_data: dict):
     """Save a pairing code to Firestore for persistence across server restarts."""
@@ -268,6 +290,19 @@ _command_audit_log = []  # [{id, user_id, device_id, command, params, timestamp,
 # Token expiry (30 days for MVP)
 TOKEN_EXPIRY_DAYS = 30
 
+# Upper bound on how long /agent/poll may hold a request open
+LONG_POLL_MAX_WAIT = float(os.getenv('AGENT_LONG_POLL_MAX_WAIT', '25'))
+
+# Long-polls held at once per worker process. Each one occupies a gunicorn
+# thread, so the cap is the worker's thread count (WEB_THREADS, the value
+# passed to --threads) minus a few kept free for normal requests
+WEB_THREADS = int(os.getenv('WEB_THREADS', '8'))
+LONG_POLL_RESERVED_THREADS = 2
+LONG_POLL_MAX_WAITERS = int(os.getenv('AGENT_LONG_POLL_MAX_WAITERS',
+                                      str(max(1, WEB_THREADS - LONG_POLL_RESERVED_THREADS))))
+LONG_POLL_RETRY_AFTER = 2   # seconds a turned-away poller should wait
+_long_poll_slots = threading.BoundedSemaphore(max(1, LONG_POLL_MAX_WAITERS))
+
 print(f"[LOCAL_AGENT] Loaded {len(_registered_devices)} registered devices (Firebase + cache)")
 
 # ==================== BLUEPRINT ====================
@@ -572,18 +607,11 @@ def generate_pairing_code():
             "expires_at": expiry.isoformat(),
             "used": False
         }
-        _pending_pairing_codes[code] = pairing_data
+        _task_queue.put_pairing_code(code, pairing_data)
         
         # Also persist to Firestore so it survives server restarts
         _save_pairing_code_to_firestore(code, pairing_data)
         
-        # Clean up expired codes
-        now = datetime.now()
-        expired = [c for c, d in _pending_pairing_codes.items() 
-                   if datetime.fromisoformat(d['expires_at']) < now or d['used']]
-        for c in expired:
-            del _pending_pairing_codes[c]
-        
         print(f"[LOCAL_AGENT] Pairing code generated for user {user_id[:8]}...")
         
         return jsonify({
@@ -627,7 +655,7 @@ def agent_register():
             }), 400
         
         # Look up pairing code to get user_id binding - check memory first, then Firestore
-        pairing_info = _pending_pairing_codes.get(pairing_token)
+        pairing_info = _task_queue.get_pairing_code(pairing_token)
         user_id = None
         from_firestore = False
         
@@ -646,11 +674,10 @@ def agent_register():
             
             # Get user binding and mark as used
             user_id = pairing_info['user_id']
-            if from_firestore:
-                _mark_pairing_code_used_in_firestore(pairing_token)
-            else:
-                _pending_pairing_codes[pairing_token]['used'] = True
-                _mark_pairing_code_used_in_firestore(pairing_token)  # Also sync to Firestore
+            if not from_firestore and not _task_queue.mark_pairing_code_used(pairing_token):
+                # Another worker redeemed it between our read and this write
+                return jsonify({"success": False, "error": "Pairing code already used"}), 400
+            _mark_pairing_code_used_in_firestore(pairing_token)  # Also sync to Firestore
             print(f"[LOCAL_AGENT] Device bound to user {user_id[:8]}... via pairing code")
         else:
             # FALLBACK for development: Accept any token with no user binding
@@ -674,9 +701,6 @@ def agent_register():
         # Persist to Firebase so devices survive server restarts
         _save_device_to_firestore(device_id, _registered_devices[device_id])
         
-        # Initialize empty task queue for this device
-        _pending_tasks[device_id] = []
-        
         # Log registration
         log_command(user_id, device_id, "device_registered", {"device_name": device_name}, "success")
         
@@ -703,42 +727,66 @@ def agent_poll():
     
     Query params:
         device_id: Device identifier
+        wait: Optional long-poll timeout in seconds (capped at LONG_POLL_MAX_WAIT).
+              The request is held until a task arrives or the timeout passes.
+              If LONG_POLL_MAX_WAITERS polls are already held, answers 204
+              (with Retry-After) instead of waiting.
+        cursor: Sequence number of the last task received; confirms its
+                delivery so it is never re-sent
     
     Headers:
         Authorization: Bearer <auth_token>
     
     Response:
-        {"task_id": "uuid", "command": "open_app", "params": {"app": "browser"}}
-        or {"task_id": null} when no tasks pending
+        {"task_id": "uuid", "command": "open_app", "params": {"app": "browser"}, "cursor": 42}
+        or {"task_id": null, "cursor": 41} when no tasks pending
     """
     if request.method == 'OPTIONS':
         return _build_cors_response()
     
     try:
         device_id = g.device_id
+        wait = max(0.0, min(request.args.get('wait', 0, type=float), LONG_POLL_MAX_WAIT))
+        cursor = request.args.get('cursor', type=int)
         
         # Update last seen
         _registered_devices[device_id]['last_seen'] = datetime.now().isoformat()
         
-        # Get pending tasks for this device
-        tasks = _pending_tasks.get(device_id, [])
+        if cursor:
+            _task_queue.confirm_delivered(device_id, cursor)
         
-        if not tasks:
-            return jsonify({
+        # Claim the oldest task (FIFO); it is redelivered if never confirmed or reported
+        task = _task_queue.claim(device_id)
+        if task is None and wait > 0:
+            if not _long_poll_slots.acquire(blocking=False):
+                # Every long-poll slot is taken - don't tie up another request thread
+                return '', 204, {'Retry-After': str(LONG_POLL_RETRY_AFTER)}
+            try:
+                task = _task_queue.claim_wait(device_id, wait)
+            finally:
+                _long_poll_slots.release()
+        
+        if not task:
+            response = jsonify({
                 "task_id": None,
+                "cursor": cursor,
+                "long_poll": wait > 0,
                 "message": "No pending tasks"
             })
-        
-        # Pop the oldest task (FIFO)
-        task = tasks.pop(0)
+            if cursor:
+                response.headers['ETag'] = f'"{cursor}"'
+            return response
         
         print(f"[LOCAL_AGENT] Task dispatched to {device_id[:8]}...: {task['command']}")
         
-        return jsonify({
+        response = jsonify({
             "task_id": task['task_id'],
             "command": task['command'],
-            "params": task['params']
+            "params": task['params'],
+            "cursor": task['seq']
         })
+        response.headers['ETag'] = f'"{task["seq"]}"'
+        return response
         
     except Exception as e:
         print(f"[LOCAL_AGENT] Poll error: {e}")
@@ -777,14 +825,14 @@ def agent_report():
         if not task_id:
             return jsonify({"success": False, "error": "task_id required"}), 400
         
-        # Store result
-        _task_results[task_id] = {
+        # Store result (acks the task)
+        record_task_result(task_id, {
             "device_id": device_id,
             "status": status,
             "result": result,
             "has_screenshot": bool(screenshot_b64),
             "reported_at": datetime.now().isoformat()
-        }
+        })
         
         # Update device last seen
         _registered_devices[device_id]['last_seen'] = datetime.now().isoformat()
@@ -919,7 +967,7 @@ def queue_task():
         try:
             from Backend.AgentWebSocket import is_agent_connected, send_task_sync
             if is_agent_connected(device_id):
-                ws_sent = send_task_sync(device_id, task_id, command, params)
+                ws_sent = send_task_sync(device_id, task_id, command, params, task=task)
                 if ws_sent:
                     print(f"[LOCAL_AGENT] ⚡ Task sent via WebSocket to {device_id[:8]}...")
         except Exception as ws_err:
@@ -927,9 +975,7 @@ def queue_task():
         
         # FALLBACK: Add to polling queue if WS failed
         if not ws_sent:
-            if device_id not in _pending_tasks:
-                _pending_tasks[device_id] = []
-            _pending_tasks[device_id].append(task)
+            enqueue_task(device_id, task)
             print(f"[LOCAL_AGENT] Task queued for polling: {device_id[:8]}...")
         
         # Audit log
@@ -2,19 +2,44 @@
 Real-time Sync System - Firebase Listeners & WebSocket Server
 ==============================================================
 Provides real-time updates for dashboard and client applications
+
+Broadcasts are coalesced: snapshot changes arriving within one tick are
+merged per document, serialised once per user, and handed to each socket's
+bounded send queue so a slow client cannot pile up unbounded sends.
+
+Connections negotiate permessage-deflate; clients that offer "msgpack" in
+their auth message receive binary MessagePack frames (see WireCodec).
 """
 
 import asyncio
+import itertools
+import threading
+import time
 import websockets
 import json
 import logging
+from collections import OrderedDict
 from typing import Dict, Set, Optional, Any
-from datetime import datetime
+from datetime import datetime, timedelta
 from firebase_admin import firestore
 
+from Backend.WireCodec import ENCODING_JSON, FrameDecoder, choose_encoding, encode
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+BROADCAST_TICK = 0.05          # seconds to coalesce snapshot changes into one frame
+CLIENT_SEND_QUEUE_SIZE = 64    # frames buffered per socket before the oldest is dropped
+
+# Offline queue: offline_queue/{user_id}/updates/{seq}, one append-only doc per update.
+# Seqs come from a per-user counter (offline_queue/{user_id}.last_seq) advanced in the
+# same transaction that writes the update, so they are committed in seq order.
+OFFLINE_QUEUE_MAX = 100        # newest updates kept per user
+OFFLINE_QUEUE_TTL_HOURS = 72   # expires_at for Firestore TTL
+OFFLINE_TRIM_EVERY = 25        # enqueues per user between trims
+OFFLINE_REPLAY_BATCH = 100     # updates per replay frame
+MAX_BATCH_SIZE = 500           # Firestore batch write limit
+
 
 class RealtimeSync:
     """Real-time synchronization using Firestore listeners and WebSockets"""
@@ -33,6 +58,19 @@ class RealtimeSync:
         self.firestore_listeners = {}
         self.websocket_server = None
         
+        # Broadcast fan-out state
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending_events: Dict[str, "OrderedDict[Any, Dict[str, Any]]"] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_scheduled = False
+        self._event_seq = itertools.count()
+        self._send_queues: Dict[Any, asyncio.Queue] = {}
+        self._send_tasks: Dict[Any, asyncio.Task] = {}
+        self._socket_encodings: Dict[Any, str] = {}
+        
+        # Offline queue trim bookkeeping
+        self._enqueues_since_trim: Dict[str, int] = {}
+        
         logger.info(f"[REALTIME] Real-time sync initialized on port {websocket_port}")
     
     # ==================== FIRESTORE LISTENERS ====================
@@ -165,6 +203,11 @@ class RealtimeSync:
                 self.connected_clients[user_id] = set()
             
             self.connected_clients[user_id].add(websocket)
+            self._socket_encodings[websocket] = choose_encoding(auth_data.get('encodings'))
+            self._send_queues[websocket] = asyncio.Queue(maxsize=CLIENT_SEND_QUEUE_SIZE)
+            self._send_tasks[websocket] = asyncio.ensure_future(
+                self._client_writer(websocket, self._send_queues[websocket])
+            )
             
             logger.info(f"[REALTIME] Client connected: {user_id}")
             
@@ -172,27 +215,39 @@ class RealtimeSync:
             await websocket.send(json.dumps({
                 "type": "connected",
                 "user_id": user_id,
+                "encoding": self._socket_encodings[websocket],
                 "message": "Real-time sync active"
             }))
             
+            # Replay updates queued while offline, after the client's cursor
+            await self._replay_offline_queue(websocket, user_id, auth_data.get('cursor'))
+            
             # Start Firestore listeners for this user
             collections = ['conversations', 'memory', 'workflows', 'messages']
             for collection in collections:
                 self.start_user_listener(user_id, collection)
             
             # Keep connection alive and handle messages
+            decoder = FrameDecoder()
             async for message in websocket:
                 try:
-                    data = json.loads(message)
+                    data = decoder.feed(message)
+                    if data is None:
+                        continue
                     
                     # Handle ping/pong for keep-alive
                     if data.get('type') == 'ping':
                         await websocket.send(json.dumps({"type": "pong"}))
                     
+                    # Client confirmed replayed updates up to its cursor
+                    elif data.get('type') == 'ack' and data.get('cursor'):
+                        loop = asyncio.get_event_loop()
+                        loop.run_in_executor(None, self.ack_offline_queue, user_id, data['cursor'])
+                    
                     # Handle other message types as needed
                     
-                except json.JSONDecodeError:
-                    logger.warning(f"[REALTIME] Invalid JSON from client: {user_id}")
+                except ValueError:
+                    logger.warning(f"[REALTIME] Invalid frame from client: {user_id}")
         
         except websockets.exceptions.ConnectionClosed:
             logger.info(f"[REALTIME] Client disconnected: {user_id}")
@@ -202,6 +257,12 @@ class RealtimeSync:
         
         finally:
             # Clean up on disconnect
+            send_task = self._send_tasks.pop(websocket, None)
+            if send_task:
+                send_task.cancel()
+            self._send_queues.pop(websocket, None)
+            self._socket_encodings.pop(websocket, None)
+            
             if user_id and user_id in self.connected_clients:
                 self.connected_clients[user_id].discard(websocket)
                 
@@ -217,10 +278,12 @@ class RealtimeSync:
     async def start_websocket_server(self):
         """Start the WebSocket server"""
         try:
+            self._loop = asyncio.get_event_loop()
             self.websocket_server = await websockets.serve(
                 self.handle_client,
                 "localhost",
-                self.websocket_port
+                self.websocket_port,
+                compression="deflate"
             )
             
             logger.info(f"[REALTIME] WebSocket server started on ws://localhost:{self.websocket_port}")
@@ -231,111 +294,264 @@ class RealtimeSync:
         except Exception as e:
             logger.error(f"[REALTIME] WebSocket server error: {e}")
     
-    # ==================== JSON SERIALIZATION HELPER ====================
-    def json_serial(self, obj):
-        """JSON serializer for objects not serializable by default json code"""
-        if isinstance(obj, (datetime, datetime.date)):
-            return obj.isoformat()
-        # Handle Firestore DatetimeWithNanoseconds if present
-        if hasattr(obj, 'isoformat'):
-            return obj.isoformat()
-        if hasattr(obj, '__str__'):
-            return str(obj)
-        raise TypeError(f"Type {type(obj)} not serializable")
-
     def _broadcast_to_user(self, user_id: str, data: Dict[str, Any]):
-        """Broadcast data to all connected clients for a user"""
-        if user_id not in self.connected_clients:
-            return
+        """
+        Queue data for all connected clients of a user (safe from any thread).
         
-        try:
-            message_data = {
-                **data,
-                "timestamp": datetime.utcnow().isoformat()
-            }
-            # Use custom default for json.dumps
-            message = json.dumps(message_data, default=self.json_serial)
-        except Exception as e:
-            logger.error(f"[REALTIME] Serialization error: {e}")
+        Events for the same document within one BROADCAST_TICK are merged,
+        keeping the latest data; the flush sends one frame per user.
+        """
+        if user_id not in self.connected_clients or self._loop is None:
             return
         
-        # Send to all connected clients for this user
-        disconnected = set()
-        for websocket in self.connected_clients[user_id]:
-            try:
-                # Use ensure_future or create_task appropriately
-                loop = asyncio.get_event_loop_policy().get_event_loop()
-                # Check if loop is running to avoid runtime errors
-                if loop.is_running():
-                     asyncio.create_task(websocket.send(message))
-            except Exception as e:
-                logger.warning(f"[REALTIME] Failed to send to client: {e}")
-                disconnected.add(websocket)
+        event = {
+            **data,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        document_id = data.get("document_id")
+        key = (data.get("collection"), document_id) if document_id else next(self._event_seq)
         
-        # Remove disconnected clients
-        for websocket in disconnected:
-            self.connected_clients[user_id].discard(websocket)
+        with self._pending_lock:
+            events = self._pending_events.setdefault(user_id, OrderedDict())
+            previous = events.pop(key, None)
+            if previous and previous.get("type") == "added" and event.get("type") == "modified":
+                event["type"] = "added"
+            events[key] = event
+            
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        
+        try:
+            self._loop.call_soon_threadsafe(self._loop.call_later, BROADCAST_TICK, self._flush_broadcasts)
+        except RuntimeError:
+            # Event loop closed
+            with self._pending_lock:
+                self._flush_scheduled = False
+    
+    def _flush_broadcasts(self):
+        """Serialise each user's pending events once and fan the frame out (runs on the loop)."""
+        with self._pending_lock:
+            pending, self._pending_events = self._pending_events, {}
+            self._flush_scheduled = False
+        
+        for user_id, events in pending.items():
+            websockets_for_user = self.connected_clients.get(user_id)
+            if not websockets_for_user:
+                continue
+            
+            events = list(events.values())
+            if len(events) == 1:
+                frame = events[0]
+            else:
+                frame = {
+                    "type": "batch",
+                    "events": events,
+                    "timestamp": datetime.utcnow().isoformat()
+                }
+            
+            # Serialised once per encoding in use, shared by every socket
+            encoded: Dict[str, list] = {}
+            
+            for websocket in websockets_for_user:
+                queue = self._send_queues.get(websocket)
+                if queue is None:
+                    continue
+                
+                encoding = self._socket_encodings.get(websocket, ENCODING_JSON)
+                if encoding not in encoded:
+                    try:
+                        encoded[encoding] = self._encode_frames(frame, encoding)
+                    except Exception as e:
+                        logger.error(f"[REALTIME] Serialization error: {e}")
+                        break
+                
+                if queue.full():
+                    # Slow consumer: drop its oldest frame rather than grow without bound
+                    queue.get_nowait()
+                    logger.warning(f"[REALTIME] Send queue full for {user_id}, dropped stale frame")
+                queue.put_nowait(encoded[encoding])
+    
+    def _encode_frames(self, message: Dict[str, Any], encoding: str) -> list:
+        """Encode a message for one socket encoding (browsers on JSON get a single text frame)"""
+        return encode(message, encoding, chunked=encoding != ENCODING_JSON)
+    
+    async def _client_writer(self, websocket, queue: asyncio.Queue):
+        """Write queued frames to a single client socket."""
+        try:
+            while True:
+                frames = await queue.get()
+                for frame in frames:
+                    await websocket.send(frame)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"[REALTIME] Failed to send to client: {e}")
     
     # ==================== OFFLINE QUEUE ====================
     
-    def queue_offline_update(self, user_id: str, update_data: Dict):
+    def _offline_updates_ref(self, user_id: str):
+        return self.db.collection('offline_queue').document(user_id).collection('updates')
+    
+    def _append_offline_update(self, user_id: str, data: Dict) -> int:
+        """
+        Allocate the user's next seq and write the update in one transaction
+        
+        Seqs from a per-process clock could commit out of order across
+        workers, letting a cursor ack delete an update the client never saw.
+        The shared counter serialises allocation: every update with a lower
+        seq is committed before a higher one can be handed out.
+        """
+        counter_ref = self.db.collection('offline_queue').document(user_id)
+        updates_ref = self._offline_updates_ref(user_id)
+        
+        @firestore.transactional
+        def append(transaction) -> int:
+            snapshot = counter_ref.get(transaction=transaction)
+            last_seq = (snapshot.to_dict() or {}).get('last_seq')
+            if last_seq is None:
+                # Start above the clock-based seqs older clients may hold as cursors
+                last_seq = time.time_ns() // 1000
+            seq = last_seq + 1
+            transaction.set(counter_ref, {'last_seq': seq}, merge=True)
+            transaction.set(updates_ref.document(f"{seq:020d}"), {**data, "seq": seq})
+            return seq
+        
+        return append(self.db.transaction())
+    
+    def queue_offline_update(self, user_id: str, update_data: Dict) -> Optional[int]:
         """
         Queue an update for offline users (to be synced when they reconnect)
         
+        Each update is appended as its own document, so queuing never reads
+        or rewrites earlier entries (only the user's seq counter).
+        
         Args:
             user_id: User ID
             update_data: Update data to queue
+            
+        Returns:
+            Sequence number of the queued update, or None on failure
         """
-        # Store in Firestore for offline sync
         try:
-            offline_queue_ref = self.db.collection('offline_queue').document(user_id)
-            
-            # Get existing queue
-            queue_doc = offline_queue_ref.get()
-            if queue_doc.exists:
-                queue = queue_doc.to_dict().get('updates', [])
-            else:
-                queue = []
-            
-            # Add new update
-            queue.append({
+            now = datetime.utcnow()
+            seq = self._append_offline_update(user_id, {
                 **update_data,
-                "queued_at": datetime.utcnow()
-            })
-            
-            # Save queue (keep last 100 updates)
-            offline_queue_ref.set({
-                "updates": queue[-100:]
+                "queued_at": now,
+                "expires_at": now + timedelta(hours=OFFLINE_QUEUE_TTL_HOURS)
             })
             
             logger.info(f"[REALTIME] Queued offline update for user {user_id}")
             
+            count = self._enqueues_since_trim.get(user_id, 0) + 1
+            if count >= OFFLINE_TRIM_EVERY:
+                self._enqueues_since_trim.pop(user_id, None)
+                self.trim_offline_queue(user_id)
+            else:
+                self._enqueues_since_trim[user_id] = count
+            
+            return seq
+            
         except Exception as e:
             logger.error(f"[REALTIME] Error queuing offline update: {e}")
+            return None
     
-    def get_offline_queue(self, user_id: str) -> list:
-        """Get queued updates for a user"""
+    def get_offline_queue(self, user_id: str, after_seq: int = 0,
+                          limit: int = OFFLINE_QUEUE_MAX) -> list:
+        """Get queued updates for a user with seq > after_seq, oldest first"""
         try:
-            offline_queue_ref = self.db.collection('offline_queue').document(user_id)
-            queue_doc = offline_queue_ref.get()
-            
-            if queue_doc.exists:
-                return queue_doc.to_dict().get('updates', [])
+            query = self._offline_updates_ref(user_id).order_by('seq')
+            if after_seq:
+                query = query.where('seq', '>', int(after_seq))
             
-            return []
+            updates = []
+            for doc in query.limit(limit).stream():
+                update = doc.to_dict()
+                update.pop('expires_at', None)
+                updates.append(update)
+            return updates
             
         except Exception as e:
             logger.error(f"[REALTIME] Error getting offline queue: {e}")
             return []
     
+    def ack_offline_queue(self, user_id: str, up_to_seq: int) -> int:
+        """Delete queued updates the client has confirmed (seq <= up_to_seq)"""
+        try:
+            query = self._offline_updates_ref(user_id).where('seq', '<=', int(up_to_seq))
+            return self._delete_offline_updates(query.order_by('seq'))
+        except Exception as e:
+            logger.error(f"[REALTIME] Error acknowledging offline queue: {e}")
+            return 0
+    
+    def trim_offline_queue(self, user_id: str, keep: int = OFFLINE_QUEUE_MAX) -> int:
+        """Delete all but the newest `keep` queued updates"""
+        try:
+            query = self._offline_updates_ref(user_id).order_by(
+                'seq', direction=firestore.Query.DESCENDING
+            ).offset(keep)
+            return self._delete_offline_updates(query)
+        except Exception as e:
+            logger.error(f"[REALTIME] Error trimming offline queue: {e}")
+            return 0
+    
     def clear_offline_queue(self, user_id: str):
         """Clear offline queue for a user"""
         try:
-            offline_queue_ref = self.db.collection('offline_queue').document(user_id)
-            offline_queue_ref.delete()
+            self._delete_offline_updates(self._offline_updates_ref(user_id).order_by('seq'))
             logger.info(f"[REALTIME] Cleared offline queue for user {user_id}")
         except Exception as e:
             logger.error(f"[REALTIME] Error clearing offline queue: {e}")
+    
+    def _delete_offline_updates(self, query) -> int:
+        """Delete every document matched by query, one batch commit per page"""
+        deleted_count = 0
+        while True:
+            docs = list(query.limit(MAX_BATCH_SIZE).stream())
+            if not docs:
+                break
+            
+            batch = self.db.batch()
+            for doc in docs:
+                batch.delete(doc.reference)
+            batch.commit()
+            
+            deleted_count += len(docs)
+            if len(docs) < MAX_BATCH_SIZE:
+                break
+        return deleted_count
+    
+    async def _replay_offline_queue(self, websocket, user_id: str, cursor=None):
+        """Send updates queued after `cursor` as batch frames; the client acks the last seq"""
+        loop = asyncio.get_event_loop()
+        try:
+            after_seq = int(cursor or 0)
+            if after_seq:
+                # Everything up to the client's cursor has already been seen
+                loop.run_in_executor(None, self.ack_offline_queue, user_id, after_seq)
+            
+            while True:
+                updates = await loop.run_in_executor(
+                    None, self.get_offline_queue, user_id, after_seq, OFFLINE_REPLAY_BATCH
+                )
+                if not updates:
+                    break
+                
+                after_seq = updates[-1]['seq']
+                frames = self._encode_frames({
+                    "type": "batch",
+                    "replay": True,
+                    "events": updates,
+                    "cursor": after_seq
+                }, self._socket_encodings.get(websocket, ENCODING_JSON))
+                for frame in frames:
+                    await websocket.send(frame)
+                
+                if len(updates) < OFFLINE_REPLAY_BATCH:
+                    break
+                    
+        except Exception as e:
+            logger.error(f"[REALTIME] Error replaying offline queue: {e}")
 
 
 # ==================== GLOBAL INSTANCE ====================
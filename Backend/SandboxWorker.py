@@ -0,0 +1,298 @@
+"""
+Sandbox Worker - Isolated Code Execution Process
+================================================
+Long-lived child process started by CodeExecutor's SandboxPool.
+Runs untrusted snippets with restricted builtins under OS resource limits,
+so a runaway snippet can be killed without touching the API process.
+
+Protocol (stdin/stdout): 4-byte big-endian length + UTF-8 JSON, one
+request and one response per run. Stdlib only - started with `python -I`.
+"""
+
+import ast
+import builtins
+import contextlib
+import io
+import json
+import os
+import string
+import struct
+import sys
+import time
+import traceback
+import types
+
+try:
+    import resource
+except ImportError:  # Windows - rely on the parent's hard kill
+    resource = None
+
+_HEADER = struct.Struct(">I")
+
+SAFE_BUILTINS = [
+    # Basic types
+    'print', 'range', 'len', 'str', 'int', 'float', 'bool', 'list', 'dict', 'tuple', 'set',
+    'frozenset', 'bytes', 'bytearray', 'complex',
+    # Math & Logic
+    'sum', 'max', 'min', 'abs', 'round', 'pow', 'divmod',
+    # Iteration
+    'sorted', 'reversed', 'enumerate', 'zip', 'map', 'filter', 'all', 'any',
+    # Type checking
+    'type', 'isinstance', 'issubclass',
+    # Conversion
+    'bin', 'hex', 'oct', 'ord', 'chr', 'ascii', 'repr', 'format',
+    # Helpers (getattr/setattr are replaced with guarded versions below)
+    'hasattr', 'callable', 'hash', 'id', 'iter', 'next',
+    'slice', 'object', 'property', 'staticmethod', 'classmethod', 'super',
+    # Exceptions
+    'Exception', 'ValueError', 'TypeError', 'KeyError', 'IndexError', 'ZeroDivisionError',
+    'AttributeError', 'RuntimeError', 'StopIteration', 'ArithmeticError', 'AssertionError',
+    'NotImplementedError', 'LookupError', 'OverflowError', 'NameError',
+    # Constants
+    'True', 'False', 'None', 'NotImplemented',
+]
+
+# Pure-computation stdlib modules snippets may import. Modules that hand out
+# attribute traversal (operator.attrgetter, string.Formatter) or introspection
+# helpers (dataclasses, typing, enum) are deliberately left out.
+SAFE_MODULES = {
+    'math', 'cmath', 'random', 'json', 'datetime', 'collections', 'itertools', 'functools',
+    'statistics', 're', 'decimal', 'fractions', 'heapq', 'bisect', 'time', 'copy', 'textwrap',
+}
+
+# Internals of frames, generators and tracebacks lead back to real globals
+_INTERNAL_TYPES = (
+    types.FrameType, types.TracebackType, types.CodeType,
+    types.GeneratorType, types.CoroutineType, types.AsyncGeneratorType,
+)
+_INTERNAL_SAFE_ATTRS = {'send', 'throw', 'close'}
+_GUARD_NAME = '_getattr_'
+
+
+class SandboxViolation(Exception):
+    """Raised when a snippet reaches for something outside the sandbox."""
+
+
+def _allowed_module(module) -> bool:
+    return module.__name__ in SAFE_MODULES
+
+
+def _check_format_template(template: str):
+    """Reject str.format fields that walk attributes ("{0.attr}"), including nested specs."""
+    for _, field, spec, _ in string.Formatter().parse(template):
+        if field and '.' in field:
+            raise SandboxViolation("Attribute access inside format strings is not allowed")
+        if spec and '{' in spec:
+            _check_format_template(spec)
+
+
+def _guarded_format(method):
+    def format_checked(template, *args, **kwargs):
+        _check_format_template(template)
+        return method(template, *args, **kwargs)
+    return format_checked
+
+
+def _guarded_getattr(obj, name, *default):
+    """getattr for sandboxed code: no private names, no modules outside SAFE_MODULES."""
+    if not isinstance(name, str) or name.startswith('_'):
+        raise SandboxViolation(f"Access to attribute '{name}' is not allowed")
+    if isinstance(obj, _INTERNAL_TYPES) and name not in _INTERNAL_SAFE_ATTRS:
+        raise SandboxViolation(f"Access to '{type(obj).__name__}.{name}' is not allowed")
+    if name in ('format', 'format_map') and (obj is str or isinstance(obj, str)):
+        method = getattr(str, name)
+        if obj is str:
+            return _guarded_format(method)
+        bound = _guarded_format(method)
+        return lambda *args, **kwargs: bound(obj, *args, **kwargs)
+
+    value = getattr(obj, name, *default)
+    if isinstance(value, types.ModuleType) and not _allowed_module(value):
+        raise SandboxViolation(f"Access to module '{value.__name__}' is not allowed")
+    return value
+
+
+def _guarded_setattr(obj, name, value):
+    if not isinstance(name, str) or name.startswith('_') or isinstance(obj, types.ModuleType):
+        raise SandboxViolation(f"Setting attribute '{name}' is not allowed")
+    setattr(obj, name, value)
+
+
+def _safe_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level != 0 or name.split('.')[0] not in SAFE_MODULES:
+        raise ImportError(f"Import of '{name}' is not allowed in the sandbox")
+    module = __import__(name, globals, locals, fromlist, level)
+    # "from x import y" must not smuggle out private names or other modules
+    for attr in fromlist or ():
+        if attr == '*' or attr.startswith('_'):
+            raise ImportError(f"Importing '{attr}' from '{name}' is not allowed in the sandbox")
+        value = getattr(module, attr, None)
+        if isinstance(value, types.ModuleType) and not _allowed_module(value):
+            raise ImportError(f"Importing module '{value.__name__}' is not allowed in the sandbox")
+    return module
+
+
+class _SandboxTransformer(ast.NodeTransformer):
+    """
+    Reject private names and route every attribute read through the guard.
+    
+    Substring checks can't see "dataclasses.sys" or getattr(x, "s" + "ys");
+    rewriting a.b into _getattr_(a, "b") checks what is actually reached.
+    """
+
+    def visit_Name(self, node):
+        if node.id == _GUARD_NAME or (node.id.startswith('__') and node.id != '__name__'):
+            raise SandboxViolation(f"Use of name '{node.id}' is not allowed")
+        return node
+
+    def visit_Attribute(self, node):
+        self.generic_visit(node)
+        if node.attr.startswith('_'):
+            raise SandboxViolation(f"Access to attribute '{node.attr}' is not allowed")
+        if isinstance(node.ctx, ast.Load):
+            return ast.copy_location(ast.Call(
+                func=ast.Name(id=_GUARD_NAME, ctx=ast.Load()),
+                args=[node.value, ast.Constant(node.attr)],
+                keywords=[]
+            ), node)
+        return node
+
+
+def _compile_sandboxed(code: str):
+    tree = _SandboxTransformer().visit(ast.parse(code, "<string>", "exec"))
+    return compile(ast.fix_missing_locations(tree), "<string>", "exec")
+
+
+def _sandbox_globals() -> dict:
+    import math, random, datetime as datetime_module
+    safe_builtins = {name: getattr(builtins, name) for name in SAFE_BUILTINS if hasattr(builtins, name)}
+    safe_builtins['__import__'] = _safe_import
+    safe_builtins['__build_class__'] = builtins.__build_class__
+    safe_builtins['getattr'] = _guarded_getattr
+    safe_builtins['setattr'] = _guarded_setattr
+    safe_builtins[_GUARD_NAME] = _guarded_getattr
+    return {
+        '__builtins__': safe_builtins,
+        '__name__': '__sandbox__',
+        # Inject safe modules
+        'math': math,
+        'random': random,
+        'json': json,
+        'datetime': datetime_module.datetime,
+    }
+
+
+def _apply_limits(memory_mb: int):
+    """Cap address space and disallow file writes for the whole worker."""
+    if resource is None:
+        return
+    if memory_mb > 0:
+        limit = memory_mb * 1024 * 1024
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ValueError, OSError):
+            pass
+    try:
+        resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+    except (ValueError, OSError):
+        pass
+
+
+def _set_cpu_budget(seconds: float):
+    """Allow this run `seconds` more CPU time; overrunning raises SIGXCPU and kills the worker."""
+    if resource is None:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(usage.ru_utime + usage.ru_stime + seconds) + 1
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    try:
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    except (ValueError, OSError):
+        pass
+
+
+def _run(code: str, max_output: int) -> dict:
+    output_buffer = io.StringIO()
+    error_buffer = io.StringIO()
+    namespace = _sandbox_globals()
+    injected = set(namespace)
+    start_time = time.time()
+
+    def truncated(text: str) -> str:
+        if len(text) > max_output:
+            return text[:max_output] + "\n... (output truncated)"
+        return text
+
+    try:
+        with contextlib.redirect_stdout(output_buffer), contextlib.redirect_stderr(error_buffer):
+            # One namespace, so top-level functions can see each other (and recurse)
+            exec(_compile_sandboxed(code), namespace)
+        return {
+            "status": "success",
+            "output": truncated(output_buffer.getvalue()),
+            "stderr": truncated(error_buffer.getvalue()),
+            "error": None,
+            "execution_time": round(time.time() - start_time, 4),
+            "variables": {k: str(v)[:100] for k, v in namespace.items()
+                          if k not in injected and not k.startswith('_')}
+        }
+    except SyntaxError as e:
+        error = f"Syntax Error (line {e.lineno}): {e.msg}"
+        trace = traceback.format_exc()
+    except SandboxViolation as e:
+        error = f"🛡️ Security: {e}"
+        trace = error
+    except MemoryError:
+        error = "MemoryError: sandbox memory limit exceeded"
+        trace = error
+    except BaseException as e:
+        error = f"{type(e).__name__}: {str(e)}"
+        trace = traceback.format_exc()
+    return {
+        "status": "error",
+        "output": truncated(output_buffer.getvalue()),
+        "stderr": truncated(error_buffer.getvalue()),
+        "error": error,
+        "traceback": trace[-max_output:],
+        "execution_time": round(time.time() - start_time, 4)
+    }
+
+
+def _read_exact(stream, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            return b""
+        data += chunk
+    return data
+
+
+def main():
+    memory_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+
+    # Keep the protocol channel private; stray writes to fd 1 go to stderr
+    channel_in = sys.stdin.buffer
+    channel_out = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    _apply_limits(memory_mb)
+
+    while True:
+        header = _read_exact(channel_in, _HEADER.size)
+        if not header:
+            break
+        request = json.loads(_read_exact(channel_in, _HEADER.unpack(header)[0]).decode("utf-8"))
+
+        _set_cpu_budget(request.get("timeout", 10))
+        response = _run(request.get("code", ""), request.get("max_output", 10000))
+
+        payload = json.dumps(response, default=str).encode("utf-8")
+        channel_out.write(_HEADER.pack(len(payload)) + payload)
+        channel_out.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,12 @@ Handles all security operations for the AI assistant
 """
 
 import bcrypt
+import hashlib
 import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from cryptography.fernet import Fernet
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
@@ -17,6 +22,94 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# ==================== VERIFIED TOKEN CACHE ====================
+
+class VerifiedTokenCache:
+    """
+    Bounded TTL cache of already-verified tokens.
+    
+    Keys are SHA-256 digests of the raw token (the token itself is never
+    stored); entries expire at the token's own `exp`, capped at max_ttl.
+    """
+    
+    def __init__(self, max_size: int = 10000, max_ttl: int = 300):
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def _key(token: str, scope: str) -> str:
+        return f"{scope}:{hashlib.sha256(token.encode('utf-8')).hexdigest()}"
+    
+    def get(self, token: str, scope: str) -> Optional[Dict[str, Any]]:
+        """Return cached claims, or None if absent or expired"""
+        key = self._key(token, scope)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            claims, expires_at = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(claims)
+    
+    def set(self, token: str, scope: str, claims: Dict[str, Any]):
+        """Cache verified claims until the token's exp (capped at max_ttl)"""
+        now = time.time()
+        exp = claims.get("exp")
+        if isinstance(exp, datetime):
+            exp = exp.timestamp()
+        expires_at = now + self.max_ttl
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, float(exp))
+        if expires_at <= now:
+            return
+        
+        key = self._key(token, scope)
+        with self._lock:
+            self._entries[key] = (dict(claims), expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, token: str, scope: str):
+        """Drop a single token"""
+        with self._lock:
+            self._entries.pop(self._key(token, scope), None)
+    
+    def clear(self):
+        """Drop every cached token"""
+        with self._lock:
+            self._entries.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        total = self.hits + self.misses
+        hit_rate = (self.hits / total * 100) if total > 0 else 0
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": f"{hit_rate:.2f}%"
+        }
+
+
+# Shared by JWT verification here and Firebase ID token verification in FirebaseAuth
+token_cache = VerifiedTokenCache(
+    max_size=int(os.getenv("TOKEN_CACHE_SIZE", "10000")),
+    max_ttl=int(os.getenv("TOKEN_CACHE_TTL", "300"))
+)
+
+
 class SecurityManager:
     """Centralized security management for authentication and encryption"""
     
@@ -39,6 +132,12 @@ class SecurityManager:
         
         # Password hashing configuration
         self.bcrypt_rounds = 12  # Salt rounds for bcrypt
+        # bcrypt is deliberately slow; cap concurrent hashes so a login burst
+        # cannot tie up every CPU the worker's other requests need
+        self._bcrypt_pool = ThreadPoolExecutor(
+            max_workers=int(os.getenv("BCRYPT_MAX_WORKERS", "2")),
+            thread_name_prefix="bcrypt"
+        )
         
         logger.info("[SECURITY] Security Manager initialized")
     
@@ -57,7 +156,7 @@ class SecurityManager:
         try:
             password_bytes = password.encode('utf-8')
             salt = bcrypt.gensalt(rounds=self.bcrypt_rounds)
-            hashed = bcrypt.hashpw(password_bytes, salt)
+            hashed = self._bcrypt_pool.submit(bcrypt.hashpw, password_bytes, salt).result()
             return hashed.decode('utf-8')
         except Exception as e:
             logger.error(f"[SECURITY] Password hashing error: {e}")
@@ -77,7 +176,7 @@ class SecurityManager:
         try:
             password_bytes = plain_password.encode('utf-8')
             hashed_bytes = hashed_password.encode('utf-8')
-            return bcrypt.checkpw(password_bytes, hashed_bytes)
+            return self._bcrypt_pool.submit(bcrypt.checkpw, password_bytes, hashed_bytes).result()
         except Exception as e:
             logger.error(f"[SECURITY] Password verification error: {e}")
             return False
@@ -186,6 +285,8 @@ class SecurityManager:
         """
         Verify and decode a JWT token
         
+        Already-verified tokens are served from token_cache until their exp.
+        
         Args:
             token: JWT token string
             token_type: Expected token type ("access" or "refresh")
@@ -194,6 +295,11 @@ class SecurityManager:
             Decoded token payload if valid, None otherwise
         """
         try:
+            scope = f"jwt:{token_type}"
+            cached = token_cache.get(token, scope)
+            if cached is not None:
+                return cached
+            
             payload = jwt.decode(token, self.jwt_secret, algorithms=[self.jwt_algorithm])
             
             # Verify token type
@@ -201,6 +307,7 @@ class SecurityManager:
                 logger.warning(f"[SECURITY] Token type mismatch. Expected {token_type}, got {payload.get('type')}")
                 return None
             
+            token_cache.set(token, scope, payload)
             return payload
         except JWTError as e:
             logger.warning(f"[SECURITY] Token verification failed: {e}")
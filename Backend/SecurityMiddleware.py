@@ -10,7 +10,7 @@ import time
 import hashlib
 from functools import wraps
 from flask import request, jsonify, g
-from typing import Callable, Optional, Dict, Any
+from typing import Callable, Optional, Dict, Any, Tuple
 from datetime import datetime
 
 # ==================== SECURITY HEADERS ====================
@@ -55,7 +55,32 @@ DANGEROUS_PATTERNS = [
     r'subprocess',              # Subprocess calls
 ]
 
-COMPILED_PATTERNS = [re.compile(p, re.IGNORECASE) for p in DANGEROUS_PATTERNS]
+# All patterns as one alternation - a single scan per string
+COMBINED_PATTERN = re.compile('|'.join(f'(?:{p})' for p in DANGEROUS_PATTERNS), re.IGNORECASE)
+
+# Markup-injection subset applied to free-text fields (users legitimately
+# write "eval(" or "subprocess" when asking about code)
+FREE_TEXT_PATTERNS = [
+    r'<script[^>]*>',
+    r'javascript:',
+    r'on\w+\s*=',
+    r'data:text/html',
+]
+FREE_TEXT_PATTERN = re.compile('|'.join(f'(?:{p})' for p in FREE_TEXT_PATTERNS), re.IGNORECASE)
+
+# Keys whose values are conversational text
+FREE_TEXT_FIELDS = frozenset({
+    'message', 'query', 'prompt', 'content', 'text', 'question', 'task', 'topic',
+})
+
+# Longest string value accepted in a JSON body (50KB); longer values are
+# rejected outright rather than truncated, so nothing can hide past the cap
+MAX_STRING_LENGTH = 50000
+
+# Keys carrying encoded media, bounded only by the 10MB request limit
+BINARY_FIELDS = frozenset({
+    'audio_base64', 'image', 'images', 'image_url', 'image_data',
+})
 
 
 def is_safe_input(value: str) -> bool:
@@ -63,10 +88,44 @@ def is_safe_input(value: str) -> bool:
     if not isinstance(value, str):
         return True
     
-    for pattern in COMPILED_PATTERNS:
-        if pattern.search(value):
-            return False
-    return True
+    return COMBINED_PATTERN.search(value) is None
+
+
+def find_dangerous_input(data: Any) -> Optional[Tuple[str, str]]:
+    """
+    Flatten a JSON body once and scan every string value in full, stopping
+    at the first match. Free-text fields get the cheaper markup-only check.
+    Values longer than MAX_STRING_LENGTH (outside BINARY_FIELDS) are rejected.
+    
+    Returns:
+        (path, "too_long" | "pattern") for the first offending value,
+        or None if the body is clean
+    """
+    stack = [(data, "", None)]
+    
+    while stack:
+        obj, path, key = stack.pop()
+        
+        if isinstance(obj, str):
+            if len(obj) > MAX_STRING_LENGTH and key not in BINARY_FIELDS:
+                return path, "too_long"
+            if key in FREE_TEXT_FIELDS:
+                found = FREE_TEXT_PATTERN.search(obj)
+            else:
+                found = COMBINED_PATTERN.search(obj)
+            if found:
+                return path, "pattern"
+        elif isinstance(obj, dict):
+            for k, v in obj.items():
+                if isinstance(v, (str, dict, list)):
+                    stack.append((v, f"{path}.{k}", k))
+        elif isinstance(obj, list):
+            for i, v in enumerate(obj):
+                if isinstance(v, (str, dict, list)):
+                    # List items inherit the parent key's policy
+                    stack.append((v, f"{path}[{i}]", key))
+    
+    return None
 
 
 def sanitize_input(value: Any) -> Any:
@@ -75,8 +134,8 @@ def sanitize_input(value: Any) -> Any:
         # Remove null bytes
         value = value.replace('\x00', '')
         # Limit length
-        if len(value) > 50000:  # 50KB max
-            value = value[:50000]
+        if len(value) > MAX_STRING_LENGTH:
+            value = value[:MAX_STRING_LENGTH]
         return value
     elif isinstance(value, dict):
         return {k: sanitize_input(v) for k, v in value.items()}
@@ -108,25 +167,15 @@ def validate_request():
             data = request.get_json(silent=True)
             if data:
                 # Check for dangerous patterns in string values
-                def check_recursive(obj, path=""):
-                    if isinstance(obj, str):
-                        if not is_safe_input(obj):
-                            return f"Dangerous pattern detected in {path}"
-                    elif isinstance(obj, dict):
-                        for k, v in obj.items():
-                            result = check_recursive(v, f"{path}.{k}")
-                            if result:
-                                return result
-                    elif isinstance(obj, list):
-                        for i, v in enumerate(obj):
-                            result = check_recursive(v, f"{path}[{i}]")
-                            if result:
-                                return result
-                    return None
-                
-                error = check_recursive(data)
-                if error:
-                    return jsonify({"error": "Invalid input", "detail": error}), 400
+                problem = find_dangerous_input(data)
+                if problem is not None:
+                    path, reason = problem
+                    if reason == "too_long":
+                        return jsonify({
+                            "error": "Value too large",
+                            "detail": f"{path} exceeds {MAX_STRING_LENGTH} characters"
+                        }), 413
+                    return jsonify({"error": "Invalid input", "detail": f"Dangerous pattern detected in {path}"}), 400
                     
         except Exception:
             return jsonify({"error": "Invalid JSON"}), 400
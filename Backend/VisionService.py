@@ -6,9 +6,12 @@ Robust image analysis using Google Gemini 2.0 Flash with smart key rotation.
 
 import os
 import time
+import threading
 import requests
 import google.generativeai as genai
-from typing import Dict, Any, List, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Union
 from dotenv import dotenv_values
 
 # Load env
@@ -17,11 +20,22 @@ if not os.path.exists(env_path):
     env_path = "../.env"
 env_vars = dotenv_values(env_path)
 
+MAX_IMAGE_SIDE = 1536          # images are downscaled to this before upload
+IMAGE_CACHE_SIZE = 32          # prepared images kept for reuse across calls (encoded bytes, not pixels)
+IMAGE_JPEG_QUALITY = 90
+MAX_CONCURRENT_ANALYSES = 4    # cap on parallel Gemini requests from analyze_batch
+
+# Shared across callers so the cap holds process-wide
+_analysis_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_ANALYSES, thread_name_prefix="vision")
+
 class VisionService:
     def __init__(self):
         self.models = ["models/gemini-2.5-flash", "models/gemini-2.0-flash", "models/gemini-flash-latest", "models/gemini-pro-latest"]
         self.api_keys = self._load_api_keys()
         self.current_key_idx = 0
+        self._key_lock = threading.Lock()
+        self._image_cache: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._cache_lock = threading.Lock()
         
         if self.api_keys:
             self._configure_genai(self.api_keys[0])
@@ -59,18 +73,23 @@ class VisionService:
         except Exception as e:
             print(f"[VisionService] Config Error: {e}")
 
-    def _rotate_key(self) -> bool:
+    def _rotate_key(self, from_idx: Optional[int] = None) -> bool:
         """Switch to next available key. Returns True if rotated, False if exhausted cycle."""
         if len(self.api_keys) <= 1:
             return False
-            
-        self.current_key_idx = (self.current_key_idx + 1) % len(self.api_keys)
-        new_key = self.api_keys[self.current_key_idx]
-        print(f"[VisionService] Rotating to Key #{self.current_key_idx + 1}...")
-        self._configure_genai(new_key)
+        
+        with self._key_lock:
+            # Another concurrent analysis already moved off this key
+            if from_idx is not None and from_idx != self.current_key_idx:
+                return True
+            self.current_key_idx = (self.current_key_idx + 1) % len(self.api_keys)
+            new_key = self.api_keys[self.current_key_idx]
+            print(f"[VisionService] Rotating to Key #{self.current_key_idx + 1}...")
+            self._configure_genai(new_key)
         return True
 
-    def analyze(self, image_source: str, prompt: str = "Describe this image.") -> Dict[str, Any]:
+    def analyze(self, image_source: Union[str, Any], prompt: str = "Describe this image.") -> Dict[str, Any]:
+        """Analyze an image path/URL, or an image already returned by prepare_image()."""
         if not self.api_keys:
             return {"success": False, "error": "No API keys available"}
             
@@ -78,14 +97,17 @@ class VisionService:
         max_attempts = max(3, len(self.api_keys) * 2)
         errors = []
         
-        print(f"[VisionService] Analyzing image: {image_source[:100]}...")
-        
         # Prepare Image Once
-        image_part = self._prepare_image(image_source)
+        if isinstance(image_source, str):
+            print(f"[VisionService] Analyzing image: {image_source[:100]}...")
+            image_part = self._prepare_image(image_source)
+        else:
+            image_part = image_source
         if not image_part:
             return {"success": False, "error": "Failed to load/download image"}
 
         for attempt in range(max_attempts):
+            key_idx = self.current_key_idx
             # Try each model in priority order for the CURRENT key
             for model_name in self.models:
                 try:
@@ -116,8 +138,8 @@ class VisionService:
             
             # If we are here, ALL models failed for the current key (or skipped).
             # So we rotate the key.
-            print(f"[VisionService] Key #{self.current_key_idx + 1} exhausted. Rotating...")
-            if not self._rotate_key():
+            print(f"[VisionService] Key #{key_idx + 1} exhausted. Rotating...")
+            if not self._rotate_key(key_idx):
                 # We cycled through all keys
                 time.sleep(2) # Wait a bit before retrying the loop (which will retry Key #1)
         
@@ -127,7 +149,89 @@ class VisionService:
             "last_error": errors[-1] if errors else "Unknown"
         }
 
+    def analyze_image(self, image_source: Union[str, Any], prompt: str = "Describe this image.") -> Dict[str, Any]:
+        """analyze() with agent-style keys: status, analysis, message."""
+        res = self.analyze(image_source, prompt)
+        if res.get("success"):
+            return {"status": "success", "analysis": res.get("description", ""), "model": res.get("model")}
+        return {"status": "error", "message": res.get("error", "Unknown error")}
+
+    def analyze_batch(self, image_sources: List[Union[str, Any]], prompt: str = "Describe this image.") -> List[Dict[str, Any]]:
+        """
+        Analyze several images concurrently (at most MAX_CONCURRENT_ANALYSES in flight).
+        
+        Results come back in input order, in analyze_image() format.
+        """
+        futures = [_analysis_executor.submit(self.analyze_image, src, prompt) for src in image_sources]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append({"status": "error", "message": str(e)})
+        return results
+
+    def prepare_image(self, image_source: str):
+        """Downscale and re-encode an image once; the result can be passed to analyze()."""
+        return self._prepare_image(image_source)
+
+    def _cache_key(self, image_source: str) -> tuple:
+        if image_source.startswith(("http://", "https://")):
+            return (image_source,)
+        try:
+            return (os.path.abspath(image_source), os.path.getmtime(image_source))
+        except OSError:
+            return (image_source,)
+
     def _prepare_image(self, image_source: str):
+        key = self._cache_key(image_source)
+        with self._cache_lock:
+            cached = self._image_cache.get(key)
+            if cached is not None:
+                self._image_cache.move_to_end(key)
+                return cached
+        
+        image = self._load_image(image_source)
+        if image is None:
+            return None
+        
+        try:
+            # Shrink oversized images - Gemini downsamples anyway
+            image.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE))
+            image_part = self._encode_image(image)
+        except Exception as e:
+            print(f"[VisionService] Image Resize Error: {e}")
+            return None
+        finally:
+            image.close()
+        
+        with self._cache_lock:
+            self._image_cache[key] = image_part
+            while len(self._image_cache) > IMAGE_CACHE_SIZE:
+                self._image_cache.popitem(last=False)
+        return image_part
+
+    def _encode_image(self, image) -> Dict[str, Any]:
+        """
+        Encode a PIL image as an inline Gemini blob.
+        
+        Cached as compressed bytes: a decoded 1536px RGB image is ~7 MB,
+        the JPEG a few hundred KB. Images with transparency stay PNG.
+        """
+        import io
+        
+        buffer = io.BytesIO()
+        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+            image.save(buffer, format="PNG", optimize=True)
+            mime_type = "image/png"
+        else:
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            image.save(buffer, format="JPEG", quality=IMAGE_JPEG_QUALITY)
+            mime_type = "image/jpeg"
+        return {"mime_type": mime_type, "data": buffer.getvalue()}
+
+    def _load_image(self, image_source: str):
         import PIL.Image
         import io
         
@@ -42,6 +42,14 @@ try:
 except ImportError:
     BS4_AVAILABLE = False
 
+from Backend.BrowserPool import (
+    UnsafeURLError, get_browser_pool, playwright_available, restrict_to_public_web,
+    validate_public_url, validate_public_url_async
+)
+
+BROWSER_NAV_TIMEOUT = 30000   # ms
+BROWSER_JOB_TIMEOUT = 60      # seconds
+
 
 class WebsiteCapture:
     """Capture websites as PDFs and screenshots with preview support"""
@@ -131,7 +139,19 @@ class WebsiteCapture:
         """
         Convert a URL to a PDF document.
         Returns path to PDF and thumbnail for preview.
+        
+        Renders with headless Chromium from the shared browser pool when
+        Playwright is installed, otherwise builds a text PDF with ReportLab.
         """
+        blocked = self._reject_unsafe_url(url)
+        if blocked:
+            return blocked
+        
+        if playwright_available():
+            result = self._browser_pdf(url)
+            if result:
+                return result
+        
         if not REPORTLAB_AVAILABLE:
             return {
                 "status": "error",
@@ -229,58 +249,7 @@ class WebsiteCapture:
             # Generate thumbnail
             thumbnail_path = self._generate_pdf_thumbnail(pdf_path, safe_name)
             
-            # Upload to Supabase in production
-            pdf_url = None
-            thumbnail_url = None
-            
-            if os.getenv('FLASK_ENV') == 'production' or os.getenv('USE_SUPABASE_STORAGE', 'false').lower() == 'true':
-                try:
-                    from Backend.SupabaseDB import supabase_db
-                    if supabase_db:
-                        print(f"[WebsiteCapture] Uploading PDF to Supabase...")
-                        pdf_url = supabase_db.upload_pdf(pdf_path, folder='captures')
-                        
-                        # Upload thumbnail if available
-                        if thumbnail_path and os.path.exists(thumbnail_path):
-                            thumb_filename = os.path.basename(thumbnail_path)
-                            storage_path = f"captures/thumbnails/{thumb_filename}"
-                            thumbnail_url = supabase_db.upload_file(
-                                thumbnail_path, 
-                                storage_path, 
-                                bucket='kai-images', 
-                                content_type='image/png'
-                            )
-                        
-                        if pdf_url:
-                            print(f"[WebsiteCapture] Uploaded to: {pdf_url}")
-                            # Delete local files after upload
-                            os.remove(pdf_path)
-                            if thumbnail_path and os.path.exists(thumbnail_path):
-                                os.remove(thumbnail_path)
-                        else:
-                            print(f"[WebsiteCapture] Upload failed, keeping local file")
-                            pdf_url = f"/data/Captures/{pdf_filename}"
-                            thumbnail_url = f"/data/Captures/thumbnails/{safe_name}_thumb.png" if thumbnail_path else None
-                except Exception as e:
-                    print(f"[WebsiteCapture] Supabase upload error: {e}, using local path")
-                    pdf_url = f"/data/Captures/{pdf_filename}"
-                    thumbnail_url = f"/data/Captures/thumbnails/{safe_name}_thumb.png" if thumbnail_path else None
-            else:
-                # Local development - use local paths
-                pdf_url = f"/data/Captures/{pdf_filename}"
-                thumbnail_url = f"/data/Captures/thumbnails/{safe_name}_thumb.png" if thumbnail_path else None
-            
-            return {
-                "status": "success",
-                "message": f"📄 Created PDF: **{content['title']}**",
-                "pdf_path": pdf_path if os.path.exists(pdf_path) else None,
-                "pdf_url": pdf_url,
-                "thumbnail_url": thumbnail_url,
-                "title": content['title'],
-                "url": url,
-                "page_count": 1,  # Simplified - would need proper counting
-                "type": "pdf_capture"
-            }
+            return self._publish_pdf(pdf_path, safe_name, thumbnail_path, content['title'], url)
             
         except Exception as e:
             return {
@@ -288,6 +257,63 @@ class WebsiteCapture:
                 "error": f"PDF generation failed: {str(e)}"
             }
     
+    def _publish_pdf(self, pdf_path: str, safe_name: str, thumbnail_path: Optional[str],
+                     title: str, url: str) -> Dict[str, Any]:
+        """Upload (in production) or expose locally a captured PDF and its thumbnail."""
+        pdf_filename = os.path.basename(pdf_path)
+        pdf_url = None
+        thumbnail_url = None
+        
+        # Upload to Supabase in production
+        if os.getenv('FLASK_ENV') == 'production' or os.getenv('USE_SUPABASE_STORAGE', 'false').lower() == 'true':
+            try:
+                from Backend.SupabaseDB import supabase_db
+                if supabase_db:
+                    print(f"[WebsiteCapture] Uploading PDF to Supabase...")
+                    pdf_url = supabase_db.upload_pdf(pdf_path, folder='captures')
+                    
+                    # Upload thumbnail if available
+                    if thumbnail_path and os.path.exists(thumbnail_path):
+                        thumb_filename = os.path.basename(thumbnail_path)
+                        storage_path = f"captures/thumbnails/{thumb_filename}"
+                        thumbnail_url = supabase_db.upload_file(
+                            thumbnail_path, 
+                            storage_path, 
+                            bucket='kai-images', 
+                            content_type='image/png'
+                        )
+                    
+                    if pdf_url:
+                        print(f"[WebsiteCapture] Uploaded to: {pdf_url}")
+                        # Delete local files after upload
+                        os.remove(pdf_path)
+                        if thumbnail_path and os.path.exists(thumbnail_path):
+                            os.remove(thumbnail_path)
+                    else:
+                        print(f"[WebsiteCapture] Upload failed, keeping local file")
+                        pdf_url = f"/data/Captures/{pdf_filename}"
+                        thumbnail_url = f"/data/Captures/thumbnails/{safe_name}_thumb.png" if thumbnail_path else None
+            except Exception as e:
+                print(f"[WebsiteCapture] Supabase upload error: {e}, using local path")
+                pdf_url = f"/data/Captures/{pdf_filename}"
+                thumbnail_url = f"/data/Captures/thumbnails/{safe_name}_thumb.png" if thumbnail_path else None
+        else:
+            # Local development - use local paths
+            pdf_url = f"/data/Captures/{pdf_filename}"
+            thumbnail_url = f"/data/Captures/thumbnails/{safe_name}_thumb.png" if thumbnail_path else None
+        
+        return {
+            "status": "success",
+            "message": f"📄 Created PDF: **{title}**",
+            "pdf_path": pdf_path if os.path.exists(pdf_path) else None,
+            "pdf_url": pdf_url,
+            "thumbnail_url": thumbnail_url,
+            "title": title,
+            "url": url,
+            "page_count": 1,  # Simplified - would need proper counting
+            "type": "pdf_capture"
+        }
+    
     def _generate_pdf_thumbnail(self, pdf_path: str, safe_name: str) -> Optional[str]:
         """Generate a thumbnail preview of the PDF first page"""
         try:
@@ -340,22 +366,109 @@ class WebsiteCapture:
             print(f"[WebsiteCapture] Thumbnail generation failed: {e}")
             return None
     
+    def _reject_unsafe_url(self, url: str) -> Optional[Dict[str, Any]]:
+        """Error result for URLs pointing at local files or internal hosts, else None."""
+        try:
+            validate_public_url(url)
+            return None
+        except UnsafeURLError as e:
+            return {
+                "status": "error",
+                "error": f"URL not allowed: {e}"
+            }
+    
+    async def _open_page(self, browser_context, url: str):
+        """Open a URL in a new page, waiting for the network to settle when it can."""
+        await validate_public_url_async(url)
+        await restrict_to_public_web(browser_context)
+        page = await browser_context.new_page()
+        await page.goto(url, wait_until="domcontentloaded", timeout=BROWSER_NAV_TIMEOUT)
+        try:
+            await page.wait_for_load_state("networkidle", timeout=5000)
+        except Exception:
+            pass  # Busy pages never go idle - capture what has loaded
+        return page
+    
+    def _browser_pdf(self, url: str) -> Optional[Dict[str, Any]]:
+        """Print a URL to PDF with Chromium, taking the thumbnail from the same page load."""
+        safe_name = self._sanitize_filename(url)
+        pdf_path = os.path.join(self.output_dir, f"{safe_name}.pdf")
+        thumb_path = os.path.join(self.thumbnails_dir, f"{safe_name}_thumb.png")
+        
+        async def capture(browser_context):
+            page = await self._open_page(browser_context, url)
+            title = (await page.title()) or urlparse(url).netloc
+            await page.screenshot(path=thumb_path)
+            await page.emulate_media(media="screen")
+            await page.pdf(
+                path=pdf_path,
+                format="A4",
+                margin={"top": "0.5in", "bottom": "0.5in", "left": "0.5in", "right": "0.5in"},
+                print_background=True
+            )
+            return title
+        
+        try:
+            title = get_browser_pool().run(capture, timeout=BROWSER_JOB_TIMEOUT)
+        except Exception as e:
+            print(f"[WebsiteCapture] Browser PDF failed, falling back to ReportLab: {e}")
+            return None
+        
+        thumbnail_path = self._shrink_thumbnail(thumb_path)
+        return self._publish_pdf(pdf_path, safe_name, thumbnail_path, title, url)
+    
+    def _shrink_thumbnail(self, thumb_path: str) -> Optional[str]:
+        """Scale a captured page image down to preview size."""
+        if not os.path.exists(thumb_path):
+            return None
+        if PIL_AVAILABLE:
+            try:
+                with Image.open(thumb_path) as img:
+                    img.thumbnail((300, 400))
+                    img.save(thumb_path, "PNG")
+            except Exception as e:
+                print(f"[WebsiteCapture] Thumbnail resize failed: {e}")
+        return thumb_path
+    
+    def _browser_screenshot(self, url: str, screenshot_path: str, full_page: bool) -> bool:
+        """Screenshot a URL with Chromium from the shared browser pool."""
+        async def capture(browser_context):
+            page = await self._open_page(browser_context, url)
+            await page.screenshot(path=screenshot_path, full_page=full_page)
+        
+        try:
+            get_browser_pool().run(capture, timeout=BROWSER_JOB_TIMEOUT)
+            return True
+        except Exception as e:
+            print(f"[WebsiteCapture] Browser screenshot failed, trying API: {e}")
+            return False
+    
     def url_to_screenshot(self, url: str, full_page: bool = True) -> Dict[str, Any]:
         """
         Take a screenshot of a webpage.
-        Uses external API for cloud compatibility.
+        Uses the shared headless browser when available, else an external API.
         """
+        blocked = self._reject_unsafe_url(url)
+        if blocked:
+            return blocked
+        
         try:
-            # Use a free screenshot API
             safe_name = self._sanitize_filename(url)
             screenshot_filename = f"{safe_name}.png"
             screenshot_path = os.path.join(self.output_dir, screenshot_filename)
             
-            # Try using screenshot API (screenshotapi.net free tier or similar)
-            # For local: could use playwright/selenium
-            # For cloud: use external API
+            # Prefer a local Chromium capture (shared browser pool)
+            if playwright_available() and self._browser_screenshot(url, screenshot_path, full_page):
+                return {
+                    "status": "success",
+                    "message": f"📸 Captured screenshot of: **{url}**",
+                    "screenshot_path": screenshot_path,
+                    "screenshot_url": f"/data/Captures/{screenshot_filename}",
+                    "url": url,
+                    "type": "screenshot"
+                }
             
-            # Option 1: Use microlink.io screenshot API (has free tier)
+            # Fallback: microlink.io screenshot API (has free tier)
             api_url = f"https://api.microlink.io/?url={quote(url, safe='')}&screenshot=true&meta=false&embed=screenshot.url"
             
             response = requests.get(api_url, timeout=30)
@@ -0,0 +1,148 @@
+"""
+WebSocket Wire Codec
+====================
+Frame encoding shared by the agent and realtime WebSocket servers.
+
+- Text frames carry compact JSON (the default, and always used for auth)
+- Binary frames tagged 0x00 carry a MessagePack message, negotiated when
+  both ends have msgpack installed
+- Binary frames tagged 0x01 carry one chunk of a large encoded message,
+  so screenshots and file listings move as raw bytes instead of one huge
+  base64-in-JSON frame
+
+Must stay in sync with LocalAgent/wire.py.
+"""
+
+import base64
+import json
+import struct
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Union
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+
+CHUNK_SIZE = 256 * 1024        # bytes per chunk frame (well under the 1 MiB frame limit)
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+MAX_PENDING_CHUNKED = 16       # partially received chunked messages kept per connection
+
+_TAG_MSGPACK = 0x00
+_TAG_CHUNK = 0x01
+_CHUNK_HEADER = struct.Struct(">B16sIIB")  # tag, message id, index, total, encoding
+_ENCODING_IDS = {ENCODING_JSON: 0, ENCODING_MSGPACK: 1}
+_ENCODING_NAMES = {v: k for k, v in _ENCODING_IDS.items()}
+
+Frame = Union[str, bytes]
+
+
+def available_encodings() -> List[str]:
+    """Encodings this process can speak, most compact first."""
+    return [ENCODING_MSGPACK, ENCODING_JSON] if MSGPACK_AVAILABLE else [ENCODING_JSON]
+
+
+def choose_encoding(offered: Optional[List[str]]) -> str:
+    """Pick the best encoding from a peer's offer (JSON if none offered)."""
+    for encoding in available_encodings():
+        if offered and encoding in offered:
+            return encoding
+    return ENCODING_JSON
+
+
+def _json_default(obj):
+    if isinstance(obj, (bytes, bytearray)):
+        return base64.b64encode(bytes(obj)).decode("ascii")
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    return str(obj)
+
+
+def _msgpack_default(obj):
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    return str(obj)
+
+
+def to_jsonable(obj: Any) -> Any:
+    """Convert decoded values (e.g. msgpack bytes) to JSON-safe equivalents for storage."""
+    return json.loads(json.dumps(obj, default=_json_default))
+
+
+def encode(message: Dict[str, Any], encoding: str = ENCODING_JSON,
+           chunked: bool = True) -> List[Frame]:
+    """
+    Encode a message into one or more WebSocket frames.
+    
+    Pass chunked=False for peers without a FrameDecoder (e.g. browsers on JSON).
+    """
+    if encoding == ENCODING_MSGPACK and MSGPACK_AVAILABLE:
+        payload = msgpack.packb(message, default=_msgpack_default, use_bin_type=True)
+        if len(payload) <= CHUNK_SIZE or not chunked:
+            return [bytes([_TAG_MSGPACK]) + payload]
+    else:
+        encoding = ENCODING_JSON
+        text = json.dumps(message, separators=(",", ":"), default=_json_default)
+        if len(text) <= CHUNK_SIZE or not chunked:
+            return [text]
+        payload = text.encode("utf-8")
+
+    message_id = uuid.uuid4().bytes
+    total = (len(payload) + CHUNK_SIZE - 1) // CHUNK_SIZE
+    return [
+        _CHUNK_HEADER.pack(_TAG_CHUNK, message_id, index, total, _ENCODING_IDS[encoding])
+        + payload[index * CHUNK_SIZE:(index + 1) * CHUNK_SIZE]
+        for index in range(total)
+    ]
+
+
+def _decode_payload(payload: bytes, encoding: str) -> Dict[str, Any]:
+    if encoding == ENCODING_MSGPACK:
+        if not MSGPACK_AVAILABLE:
+            raise ValueError("msgpack frame received but msgpack is not installed")
+        return msgpack.unpackb(payload, raw=False)
+    return json.loads(payload.decode("utf-8"))
+
+
+class FrameDecoder:
+    """Decodes frames from one connection, reassembling chunked messages."""
+
+    def __init__(self):
+        self._partial: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+
+    def feed(self, frame: Frame) -> Optional[Dict[str, Any]]:
+        """Return the decoded message, or None while a chunked message is incomplete."""
+        if isinstance(frame, str):
+            return json.loads(frame)
+        if not frame:
+            raise ValueError("Empty binary frame")
+
+        if frame[0] == _TAG_MSGPACK:
+            return _decode_payload(frame[1:], ENCODING_MSGPACK)
+        if frame[0] != _TAG_CHUNK or len(frame) < _CHUNK_HEADER.size:
+            raise ValueError(f"Unknown or truncated frame (tag {frame[0]})")
+
+        _, message_id, index, total, encoding_id = _CHUNK_HEADER.unpack_from(frame)
+        if total * CHUNK_SIZE > MAX_MESSAGE_SIZE or index >= total:
+            raise ValueError("Chunked message too large or malformed")
+
+        entry = self._partial.get(message_id)
+        if entry is None:
+            entry = {"chunks": {}, "total": total, "encoding": _ENCODING_NAMES.get(encoding_id, ENCODING_JSON)}
+            self._partial[message_id] = entry
+            while len(self._partial) > MAX_PENDING_CHUNKED:
+                self._partial.popitem(last=False)
+        entry["chunks"][index] = frame[_CHUNK_HEADER.size:]
+
+        if len(entry["chunks"]) < entry["total"]:
+            return None
+
+        del self._partial[message_id]
+        payload = b"".join(entry["chunks"][i] for i in range(entry["total"]))
+        return _decode_payload(payload, entry["encoding"])
@@ -5,6 +5,8 @@ Execute complex automation sequences with Firebase persistence
 """
 
 import asyncio
+import threading
+import time
 from typing import List, Dict, Callable, Optional
 import logging
 
@@ -20,6 +22,12 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Seconds a user's custom workflow definitions are cached. Invalidation on
+# create/update/delete is per process - other workers may serve the old
+# definitions until their entry expires, so keep this short.
+WORKFLOW_CACHE_TTL = 60
+WORKFLOW_LIST_LIMIT = 100
+
 
 class WorkflowEngine:
     """Firebase-backed workflow engine"""
@@ -34,6 +42,8 @@ class WorkflowEngine:
         
         self.collection = "workflows"
         self.default_workflows = self._get_default_workflows()
+        self._cache: Dict[str, tuple] = {}   # user_id -> (expires_at, [workflow, ...])
+        self._cache_lock = threading.Lock()
         logger.info("[WORKFLOW] Workflow engine initialized")
     
     def _get_default_workflows(self) -> Dict:
@@ -135,32 +145,94 @@ class WorkflowEngine:
         logger.info(f"[WORKFLOW] Executing workflow: {workflow_name}")
         logger.info(f"[WORKFLOW]   {workflow['description']}")
         
-        results = []
         steps = workflow.get("steps", [])
+        try:
+            dependencies = self._step_dependencies(steps)
+        except ValueError as e:
+            return f"Workflow '{workflow_name}' is invalid: {e}"
+        
+        tasks: List[asyncio.Task] = []
         
-        for i, step in enumerate(steps, 1):
+        async def run_step(i: int, step: Dict):
+            # Start as soon as the steps this one depends on have finished
+            if dependencies[i]:
+                await asyncio.gather(*(tasks[d] for d in dependencies[i]))
             try:
                 # Replace parameters in target
                 target = step["target"]
                 for key, value in parameters.items():
                     target = target.replace(f"{{{key}}}", str(value))
                 
-                logger.info(f"[WORKFLOW]   Step {i}/{len(steps)}: {step['action']} {target}")
+                logger.info(f"[WORKFLOW]   Step {i + 1}/{len(steps)}: {step['action']} {target}")
                 
                 # Execute step
-                result = await self._execute_step(step["action"], target)
-                results.append(result)
-                
-                # Small delay between steps
-                await asyncio.sleep(0.5)
+                return await self._execute_step(step["action"], target)
                 
             except Exception as e:
-                logger.error(f"[WORKFLOW]   ❌ Step {i} failed: {e}")
-                results.append(f"Failed: {e}")
+                logger.error(f"[WORKFLOW]   ❌ Step {i + 1} failed: {e}")
+                return f"Failed: {e}"
+        
+        for i, step in enumerate(steps):
+            tasks.append(asyncio.ensure_future(run_step(i, step)))
+        results = list(await asyncio.gather(*tasks))
         
         logger.info(f"[WORKFLOW] ✅ Workflow '{workflow_name}' completed!")
         return results
     
+    def _step_dependencies(self, steps: List[Dict]) -> List[List[int]]:
+        """
+        Resolve which steps each step waits for.
+        
+        A step may list the steps it needs in "after" (step ids or 1-based
+        step numbers); steps that share no dependency run concurrently.
+        A step without "after" waits for the step before it, so workflows
+        run in order unless told otherwise; "after": [] starts immediately.
+        
+        Raises ValueError for unknown references or dependency cycles.
+        """
+        refs = {}
+        for i, step in enumerate(steps):
+            refs[str(i + 1)] = i
+            if step.get("id") is not None:
+                refs[str(step["id"])] = i
+        
+        dependencies = []
+        for i, step in enumerate(steps):
+            if "after" not in step:
+                dependencies.append([i - 1] if i else [])
+                continue
+            after = step["after"]
+            if after is None:
+                after = []
+            elif not isinstance(after, list):
+                after = [after]
+            resolved = []
+            for ref in after:
+                if str(ref) not in refs:
+                    raise ValueError(f"step {i + 1} waits for unknown step '{ref}'")
+                resolved.append(refs[str(ref)])
+            dependencies.append(resolved)
+        
+        # Kahn's algorithm - every step must become runnable
+        remaining = [len(set(deps)) for deps in dependencies]
+        dependents: Dict[int, List[int]] = {}
+        for i, deps in enumerate(dependencies):
+            for d in set(deps):
+                dependents.setdefault(d, []).append(i)
+        ready = [i for i, count in enumerate(remaining) if count == 0]
+        visited = 0
+        while ready:
+            node = ready.pop()
+            visited += 1
+            for nxt in dependents.get(node, []):
+                remaining[nxt] -= 1
+                if remaining[nxt] == 0:
+                    ready.append(nxt)
+        if visited != len(steps):
+            raise ValueError("step dependencies form a cycle")
+        
+        return dependencies
+    
     async def _execute_step(self, action: str, target: str):
         """Execute a single workflow step - Web Version"""
         
@@ -179,6 +251,32 @@ class WorkflowEngine:
             logger.info(f"[WORKFLOW] (Web mode) Would execute: {command}")
             return f"⚠️ '{command}' - requires desktop version"
     
+    def _custom_workflows(self, user_id: str) -> List[Dict]:
+        """
+        A user's custom workflows, cached for WORKFLOW_CACHE_TTL seconds.
+        
+        Query errors propagate (and are not cached), so a Firestore hiccup
+        doesn't hide the user's workflows for the whole TTL.
+        """
+        now = time.time()
+        with self._cache_lock:
+            entry = self._cache.get(user_id)
+            if entry and entry[0] > now:
+                return entry[1]
+        
+        workflows = self.dal.list(self.collection, user_id, limit=WORKFLOW_LIST_LIMIT, strict=True) or []
+        with self._cache_lock:
+            self._cache[user_id] = (now + WORKFLOW_CACHE_TTL, workflows)
+        return workflows
+    
+    def invalidate_cache(self, user_id: str = None):
+        """Drop cached workflow definitions for one user (or everyone)."""
+        with self._cache_lock:
+            if user_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(user_id, None)
+    
     def create_workflow(self, name: str, description: str, steps: List[Dict], user_id: str = "default") -> bool:
         """
         Create a new workflow
@@ -205,6 +303,7 @@ class WorkflowEngine:
             }
             
             workflow_id = self.dal.create(self.collection, user_id, workflow_data)
+            self.invalidate_cache(user_id)
             
             if workflow_id:
                 logger.info(f"[WORKFLOW] Created workflow '{name}' for user {user_id}")
@@ -235,7 +334,7 @@ class WorkflowEngine:
         # Add user's custom workflows
         if self.dal:
             try:
-                custom_workflows = self.dal.list(self.collection, user_id, limit=100)
+                custom_workflows = self._custom_workflows(user_id)
                 for wf in custom_workflows:
                     name = wf.get("name", "")
                     desc = wf.get("description", "")
@@ -260,6 +359,15 @@ class WorkflowEngine:
             return self.default_workflows.get(name.lower())
         
         try:
+            custom_workflows = self._custom_workflows(user_id)
+            for wf in custom_workflows:
+                if wf.get("name") == name.lower():
+                    return wf
+            
+            # The cached list holds every workflow unless the user hit the limit
+            if len(custom_workflows) < WORKFLOW_LIST_LIMIT:
+                return None
+            
             # Search for workflow by name
             workflows = self.dal.list(
                 self.collection,
@@ -293,7 +401,9 @@ class WorkflowEngine:
             return False
         
         try:
-            return self.dal.update(self.collection, user_id, workflow_id, updates)
+            updated = self.dal.update(self.collection, user_id, workflow_id, updates)
+            self.invalidate_cache(user_id)
+            return updated
         except Exception as e:
             logger.error(f"[WORKFLOW] Update workflow error: {e}")
             return False
@@ -313,7 +423,9 @@ class WorkflowEngine:
             return False
         
         try:
-            return self.dal.delete(self.collection, user_id, workflow_id)
+            deleted = self.dal.delete(self.collection, user_id, workflow_id)
+            self.invalidate_cache(user_id)
+            return deleted
         except Exception as e:
             logger.error(f"[WORKFLOW] Delete workflow error: {e}")
             return False
@@ -16,7 +16,9 @@ import json
 import logging
 import signal
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, Any, Optional
 
@@ -27,6 +29,7 @@ from .config import (
     get_credentials, get_config_path
 )
 from .schemas import validate_command, get_allowed_commands
+from .wire import ENCODING_JSON, FrameDecoder, available_encodings, encode, to_jsonable
 from .executors.open_app import OpenAppExecutor
 from .executors.close_app import CloseAppExecutor
 from .executors.system_control import SystemControlExecutor
@@ -46,6 +49,20 @@ logging.basicConfig(
 logger = logging.getLogger("KaiLocalAgent")
 
 
+# ==================== EXECUTION LANES ====================
+
+# Read-only commands run concurrently, each capped at its own limit.
+# Everything else drives the desktop and shares the single "ui" lane,
+# so UI-mutating commands still run one at a time, in arrival order.
+READ_ONLY_LANES = {
+    "system_status": 2,
+    "screenshot": 1,
+    "file_manager:list_files": 2,
+}
+UI_LANE = "ui"
+MAX_IN_FLIGHT = 16  # tasks accepted but not yet reported before polling pauses
+
+
 # ==================== AGENT CLASS ====================
 
 class KaiLocalAgent:
@@ -65,6 +82,17 @@ class KaiLocalAgent:
         self.api_url = api_url or self.config.get("api_url")
         self.poll_interval = self.config.get("poll_interval", 5)
         self.heartbeat_interval = self.config.get("heartbeat_interval", 30)
+        self.long_poll_timeout = self.config.get("long_poll_timeout", 25)
+        self.max_poll_interval = self.config.get("max_poll_interval", 30)
+        
+        # Sequence number of the last task received (confirms delivery to the server)
+        self.poll_cursor: Optional[int] = None
+        # Whether the server held the last empty poll open (long-poll support)
+        self.server_long_polls = False
+        # Seconds the server asked us to wait before polling again (204 + Retry-After)
+        self.retry_after: Optional[float] = None
+        # WebSocket frame encoding negotiated at auth ("json" or "msgpack")
+        self.ws_encoding = ENCODING_JSON
         
         # Initialize executors
         self.executors = {
@@ -78,6 +106,12 @@ class KaiLocalAgent:
         }
 
         
+        # Execution lanes: {lane: single- or multi-worker pool}
+        self._lanes: Dict[str, ThreadPoolExecutor] = {}
+        self._lanes_lock = threading.Lock()
+        self._in_flight = threading.BoundedSemaphore(MAX_IN_FLIGHT)
+        self._ws_tasks = set()  # In-flight WebSocket task coroutines
+        
         # Running state
         self.running = False
         self.last_heartbeat = 0
@@ -145,10 +179,14 @@ class KaiLocalAgent:
             logger.error(f"Registration request failed: {e}")
             return False
     
-    def poll(self) -> Optional[Dict[str, Any]]:
+    def poll(self, wait: float = 0) -> Optional[Dict[str, Any]]:
         """
         Poll the API for pending tasks.
         
+        Args:
+            wait: Long-poll timeout - the server holds the request until a
+                  task arrives or this many seconds pass (0 = return at once)
+        
         Returns:
             Task dict if available, None otherwise
         """
@@ -159,13 +197,26 @@ class KaiLocalAgent:
         
         url = f"{self.api_url}/agent/poll"
         params = {"device_id": device_id}
+        if wait > 0:
+            params["wait"] = wait
+        if self.poll_cursor:
+            params["cursor"] = self.poll_cursor
         headers = self._get_auth_headers()
+        self.server_long_polls = False
+        self.retry_after = None
         
         try:
-            response = requests.get(url, params=params, headers=headers, timeout=10)
+            response = requests.get(url, params=params, headers=headers, timeout=wait + 10)
+            if response.status_code == 204:
+                # Server has no long-poll slot free - come back when it says to
+                self.retry_after = self._parse_retry_after(response.headers.get("Retry-After"))
+                return None
             data = response.json()
             
             if response.status_code == 200:
+                self.server_long_polls = bool(data.get("long_poll"))
+                if data.get("cursor"):
+                    self.poll_cursor = data["cursor"]
                 if data.get("task_id"):
                     logger.info(f"Received task: {data.get('command')} (ID: {data['task_id'][:8]}...)")
                     return data
@@ -205,7 +256,7 @@ class KaiLocalAgent:
             "device_id": device_id,
             "task_id": task_id,
             "status": status,
-            "result": result
+            "result": to_jsonable(result)  # bytes (e.g. screenshot image) go base64 over HTTP
         }
         
         try:
@@ -275,10 +326,74 @@ class KaiLocalAgent:
         
         return result
     
+    def _lane_for(self, command: str, params: Dict[str, Any]) -> str:
+        """Pick the execution lane for a command (read-only lanes, else the UI lane)."""
+        if command in READ_ONLY_LANES:
+            return command
+        action_lane = f"{command}:{str(params.get('action', '')).lower()}"
+        if action_lane in READ_ONLY_LANES:
+            return action_lane
+        return UI_LANE
+    
+    def _get_lane(self, lane: str) -> ThreadPoolExecutor:
+        with self._lanes_lock:
+            if lane not in self._lanes:
+                self._lanes[lane] = ThreadPoolExecutor(
+                    max_workers=READ_ONLY_LANES.get(lane, 1),
+                    thread_name_prefix=f"lane-{lane}"
+                )
+            return self._lanes[lane]
+    
+    def submit_task(self, task: Dict[str, Any]):
+        """
+        Run a polled task on its lane and report the result when it finishes.
+        
+        Blocks only when MAX_IN_FLIGHT tasks are already running, so the poll
+        loop (and heartbeats) keep going while commands execute.
+        """
+        command = task.get("command", "")
+        params = task.get("params", {})
+        
+        def run_and_report():
+            try:
+                result = self.execute_command(command, params)
+            except Exception as e:
+                result = {"status": "error", "message": f"Execution failed: {e}"}
+            try:
+                self.report(task["task_id"], result.get("status", "error"), result)
+            finally:
+                self._in_flight.release()
+        
+        self._in_flight.acquire()
+        try:
+            self._get_lane(self._lane_for(command, params)).submit(run_and_report)
+        except Exception:
+            self._in_flight.release()
+            raise
+    
+    def _parse_retry_after(self, value: Optional[str]) -> float:
+        """Seconds from a Retry-After header, kept within 1s..poll_interval."""
+        try:
+            delay = float(value)
+        except (TypeError, ValueError):
+            delay = self.poll_interval
+        return min(max(delay, 1.0), self.poll_interval)
+    
+    def _next_idle_delay(self, idle_delay: float) -> float:
+        """Back off exponentially while idle, up to max_poll_interval."""
+        return min(max(idle_delay * 2, 1), self.max_poll_interval)
+    
     def run(self):
         """
-        Main agent loop: poll for tasks, execute, report.
+        Main agent loop: long-poll for tasks, execute, report.
         Runs until interrupted.
+        
+        The server holds each poll open until a task arrives, so tasks are
+        picked up immediately and an idle device makes ~2 requests a minute.
+        Against a server without long-poll support (or on errors) the
+        delay between polls backs off from 1s to max_poll_interval. When
+        the server's long-poll slots are full it answers 204 and the agent
+        retries after its Retry-After delay instead of backing off.
         """
         if not is_registered():
             logger.error("Device not registered. Run with --register TOKEN first.")
@@ -288,7 +403,7 @@ class KaiLocalAgent:
         logger.info("=" * 50)
         logger.info("Kai Local Agent started")
         logger.info(f"Device: {self.config.get('device_name')}")
-        logger.info(f"Polling every {self.poll_interval}s")
+        logger.info(f"Long-polling (up to {self.long_poll_timeout}s per request)")
         logger.info("Press Ctrl+C to stop")
         logger.info("=" * 50)
         
@@ -296,39 +411,43 @@ class KaiLocalAgent:
         self.heartbeat()
         self.last_heartbeat = time.time()
         
+        idle_delay = 0.0
+        
         while self.running:
             try:
-                # Poll for task
-                task = self.poll()
+                # Long-poll for task
+                task = self.poll(wait=self.long_poll_timeout)
                 
                 if task:
-                    # Execute the command
-                    result = self.execute_command(
-                        task.get("command", ""),
-                        task.get("params", {})
-                    )
-                    
-                    # Report result
-                    self.report(
-                        task["task_id"],
-                        result.get("status", "error"),
-                        result
-                    )
+                    # Execute on the command's lane; the result is reported when it finishes
+                    self.submit_task(task)
                 
                 # Send heartbeat if needed
                 if time.time() - self.last_heartbeat > self.heartbeat_interval:
                     if self.heartbeat():
                         self.last_heartbeat = time.time()
                 
-                # Wait before next poll
-                time.sleep(self.poll_interval)
+                if task:
+                    # More work may be queued - poll again straight away
+                    idle_delay = 0.0
+                elif self.server_long_polls:
+                    # The server already waited for us
+                    idle_delay = 0.0
+                elif self.retry_after is not None:
+                    # Server is up but its long-poll slots are full - short fixed wait, no back-off
+                    idle_delay = 0.0
+                    time.sleep(self.retry_after)
+                else:
+                    idle_delay = self._next_idle_delay(idle_delay)
+                    time.sleep(idle_delay)
                 
             except KeyboardInterrupt:
                 logger.info("\nShutdown requested...")
                 self.running = False
             except Exception as e:
                 logger.error(f"Error in main loop: {e}")
-                time.sleep(self.poll_interval)
+                idle_delay = self._next_idle_delay(idle_delay)
+                time.sleep(idle_delay)
         
         logger.info("Agent stopped.")
     
@@ -374,7 +493,7 @@ class KaiLocalAgent:
         while self.running:
             try:
                 logger.info(f"Connecting to {ws_url}...")
-                async with websockets.connect(ws_url) as websocket:
+                async with websockets.connect(ws_url, compression="deflate") as websocket:
                     # Send auth message
                     creds = get_credentials()
                     if not creds:
@@ -385,7 +504,8 @@ class KaiLocalAgent:
                     await websocket.send(json.dumps({
                         "type": "auth",
                         "device_id": device_id,
-                        "auth_token": auth_token
+                        "auth_token": auth_token,
+                        "encodings": available_encodings()
                     }))
                     
                     # Wait for auth response
@@ -395,6 +515,7 @@ class KaiLocalAgent:
                     if resp_data.get("type") == "auth_success":
                         logger.info(f"✅ Connected: {resp_data.get('message')}")
                         reconnect_delay = 1  # Reset delay on success
+                        self.ws_encoding = resp_data.get("encoding", ENCODING_JSON)
                     else:
                         logger.error(f"Auth failed: {resp_data.get('message')}")
                         return
@@ -404,8 +525,15 @@ class KaiLocalAgent:
                     
                     try:
                         # Main message loop
+                        decoder = FrameDecoder()
                         async for message in websocket:
-                            await self._handle_ws_message(websocket, message)
+                            try:
+                                data = decoder.feed(message)
+                            except ValueError:
+                                logger.warning("Invalid frame received")
+                                continue
+                            if data is not None:
+                                await self._handle_ws_message(websocket, data)
                     finally:
                         heartbeat_task.cancel()
                         
@@ -430,16 +558,42 @@ class KaiLocalAgent:
         while True:
             try:
                 await asyncio.sleep(30)
-                await websocket.send(json.dumps({"type": "heartbeat"}))
+                await self._ws_send(websocket, {"type": "heartbeat"})
             except asyncio.CancelledError:
                 break
             except Exception:
                 break
     
-    async def _handle_ws_message(self, websocket, message: str):
-        """Handle incoming WebSocket message (task from server)."""
+    async def _ws_send(self, websocket, message: dict):
+        """Send a message using the encoding negotiated at auth (chunked if large)."""
+        for frame in encode(message, self.ws_encoding):
+            await websocket.send(frame)
+    
+    async def _run_ws_task(self, websocket, task_id: str, command: str, params: Dict[str, Any]):
+        """Execute a WebSocket task on its lane and send the result back when done."""
+        loop = asyncio.get_event_loop()
+        try:
+            result = await loop.run_in_executor(
+                self._get_lane(self._lane_for(command, params)),
+                self.execute_command, command, params
+            )
+        except Exception as e:
+            result = {"status": "error", "message": f"Execution failed: {e}"}
+        
+        try:
+            await self._ws_send(websocket, {
+                "type": "result",
+                "task_id": task_id,
+                "status": result.get("status", "error"),
+                "result": result
+            })
+            logger.info(f"📤 Result sent: {result.get('status')}")
+        except Exception as e:
+            logger.error(f"Failed to send result for {task_id[:8]}...: {e}")
+    
+    async def _handle_ws_message(self, websocket, data: dict):
+        """Handle a decoded WebSocket message (task from server)."""
         try:
-            data = json.loads(message)
             msg_type = data.get("type")
             
             if msg_type == "task":
@@ -449,17 +603,10 @@ class KaiLocalAgent:
                 
                 logger.info(f"📥 Task received: {command} ({task_id[:8]}...)")
                 
-                # Execute command
-                result = self.execute_command(command, params)
-                
-                # Send result back via WebSocket
-                await websocket.send(json.dumps({
-                    "type": "result",
-                    "task_id": task_id,
-                    "status": result.get("status", "error"),
-                    "result": result
-                }))
-                logger.info(f"📤 Result sent: {result.get('status')}")
+                # Execute on the command's lane without blocking the message loop
+                task = asyncio.ensure_future(self._run_ws_task(websocket, task_id, command, params))
+                self._ws_tasks.add(task)
+                task.add_done_callback(self._ws_tasks.discard)
                 
             elif msg_type == "heartbeat_ack":
                 pass  # Heartbeat acknowledged
@@ -470,14 +617,16 @@ class KaiLocalAgent:
             elif msg_type == "result_ack":
                 logger.info(f"✓ Result acknowledged: {data.get('task_id', '')[:8]}...")
                 
-        except json.JSONDecodeError:
-            logger.warning("Invalid JSON message received")
         except Exception as e:
             logger.error(f"Message handling error: {e}")
     
     def stop(self):
         """Stop the agent loop."""
         self.running = False
+        with self._lanes_lock:
+            for lane in self._lanes.values():
+                lane.shutdown(wait=False)
+            self._lanes.clear()
 
 
 # ==================== CLI ENTRY POINT ====================
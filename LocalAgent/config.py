@@ -15,6 +15,8 @@ from typing import Optional, Dict, Any
 DEFAULT_CONFIG = {
     "api_url": "https://kai-api-nxxv.onrender.com",  # Production Render URL
     "poll_interval": 5,  # seconds
+    "long_poll_timeout": 25,  # seconds the server may hold a poll open
+    "max_poll_interval": 30,  # idle back-off ceiling (seconds)
     "heartbeat_interval": 30,  # seconds
     "device_name": None,  # Set during registration
     "device_id": None,  # Set after registration
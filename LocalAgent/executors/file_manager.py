@@ -9,24 +9,133 @@ Allowed directories:
 
 Safety features:
 - Never operates outside sandbox
-- Tracks created files in manifest
+- Tracks created files in an indexed SQLite manifest
 - Only deletes files Kai created
 """
 
 import os
 import sys
 import json
+import hashlib
 import shutil
+import sqlite3
 import subprocess
+import threading
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Set
 
 from .base import BaseExecutor
 
 import logging
 logger = logging.getLogger("KaiLocalAgent")
 
+# Upper bound of the string range used for path-prefix queries
+_PREFIX_END = "\uffff"
+
+
+class FileManifest:
+    """
+    SQLite index of Kai-created files and folders.
+    
+    Paths are the primary key, so membership checks and prefix (folder)
+    queries use the index, and each create/rename/delete touches only the
+    affected rows instead of rewriting the whole manifest.
+    """
+    
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                path TEXT PRIMARY KEY,
+                type TEXT NOT NULL,
+                size INTEGER,
+                mtime REAL,
+                hash TEXT,
+                created_at TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+    
+    def migrate_json(self, json_path: Path):
+        """Import a legacy file_manifest.json once, then set it aside."""
+        if not json_path.exists():
+            return
+        try:
+            with open(json_path, 'r') as f:
+                legacy = json.load(f)
+            rows = [
+                (entry["path"], file_type, None, None, None, entry.get("created_at") or datetime.now().isoformat())
+                for key, file_type in (("created_files", "file"), ("created_folders", "folder"))
+                for entry in legacy.get(key, [])
+            ]
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO entries (path, type, size, mtime, hash, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+            json_path.rename(json_path.with_suffix(".json.migrated"))
+            logger.info(f"[FILE_MANAGER] Migrated {len(rows)} manifest entries to {self.db_path.name}")
+        except Exception as e:
+            logger.error(f"[FILE_MANAGER] Manifest migration error: {e}")
+    
+    def track(self, path: Path, file_type: str = "file"):
+        """Add or refresh an entry with current size, mtime and content hash."""
+        size = mtime = digest = None
+        try:
+            stat = path.stat()
+            mtime = stat.st_mtime
+            if file_type == "file":
+                size = stat.st_size
+                digest = hashlib.sha256(path.read_bytes()).hexdigest()
+        except OSError:
+            pass
+        
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (path, type, size, mtime, hash, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (str(path), file_type, size, mtime, digest, datetime.now().isoformat())
+            )
+    
+    def contains(self, path: Path) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM entries WHERE path = ?", (str(path),)).fetchone()
+        return row is not None
+    
+    def paths_under(self, folder: Path) -> Set[str]:
+        """Tracked paths inside a folder (any depth)."""
+        prefix = str(folder).rstrip(os.sep) + os.sep
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path FROM entries WHERE path >= ? AND path < ?",
+                (prefix, prefix + _PREFIX_END)
+            ).fetchall()
+        return {row[0] for row in rows}
+    
+    def relocate(self, old_path: Path, new_path: Path):
+        """Update an entry (and, for folders, everything beneath it) after a rename/move."""
+        old, new = str(old_path), str(new_path)
+        prefix = old.rstrip(os.sep) + os.sep
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE OR REPLACE entries SET path = ? || substr(path, ?) "
+                "WHERE path = ? OR (path >= ? AND path < ?)",
+                (new, len(old) + 1, old, prefix, prefix + _PREFIX_END)
+            )
+    
+    def remove(self, path: Path):
+        """Remove an entry and anything tracked beneath it."""
+        target = str(path)
+        prefix = target.rstrip(os.sep) + os.sep
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM entries WHERE path = ? OR (path >= ? AND path < ?)",
+                (target, prefix, prefix + _PREFIX_END)
+            )
+
 
 class FileManagerExecutor(BaseExecutor):
     """Sandboxed file manager for Kai-controlled directories."""
@@ -50,53 +159,23 @@ class FileManagerExecutor(BaseExecutor):
         # Manifest for tracking created files
         kai_config = home / ".kai"
         kai_config.mkdir(exist_ok=True)
-        self.MANIFEST_PATH = kai_config / "file_manifest.json"
+        self.MANIFEST_PATH = kai_config / "file_manifest.db"
         
         # Ensure sandbox directories exist
         for root in self.ALLOWED_ROOTS:
             root.mkdir(parents=True, exist_ok=True)
         
-        # Load or create manifest
-        self._load_manifest()
-    
-    def _load_manifest(self) -> Dict:
-        """Load the file manifest."""
-        if self.MANIFEST_PATH.exists():
-            try:
-                with open(self.MANIFEST_PATH, 'r') as f:
-                    self.manifest = json.load(f)
-            except:
-                self.manifest = {"created_files": [], "created_folders": []}
-        else:
-            self.manifest = {"created_files": [], "created_folders": []}
-        return self.manifest
-    
-    def _save_manifest(self):
-        """Save the file manifest."""
-        with open(self.MANIFEST_PATH, 'w') as f:
-            json.dump(self.manifest, f, indent=2)
+        # Open the manifest index (importing the old JSON manifest if present)
+        self.manifest = FileManifest(self.MANIFEST_PATH)
+        self.manifest.migrate_json(kai_config / "file_manifest.json")
     
     def _track_file(self, path: Path, file_type: str = "file"):
         """Track a created file/folder in manifest."""
-        entry = {
-            "path": str(path),
-            "created_at": datetime.now().isoformat(),
-            "type": file_type
-        }
-        key = "created_files" if file_type == "file" else "created_folders"
-        self.manifest[key].append(entry)
-        self._save_manifest()
+        self.manifest.track(path, file_type)
     
     def _is_kai_created(self, path: Path) -> bool:
         """Check if a file was created by Kai."""
-        path_str = str(path)
-        for entry in self.manifest.get("created_files", []):
-            if entry["path"] == path_str:
-                return True
-        for entry in self.manifest.get("created_folders", []):
-            if entry["path"] == path_str:
-                return True
-        return False
+        return self.manifest.contains(path)
     
     def _is_in_sandbox(self, path: Path) -> bool:
         """Check if path is within allowed directories."""
@@ -234,6 +313,8 @@ class FileManagerExecutor(BaseExecutor):
             return {"status": "error", "message": f"Folder '{folder}' does not exist"}
         
         try:
+            # One indexed prefix query instead of a manifest lookup per item
+            tracked = self.manifest.paths_under(root)
             items = []
             for item in root.iterdir():
                 item_type = "folder" if item.is_dir() else "file"
@@ -242,7 +323,7 @@ class FileManagerExecutor(BaseExecutor):
                     "name": item.name,
                     "type": item_type,
                     "size": size,
-                    "kai_created": self._is_kai_created(item)
+                    "kai_created": str(item) in tracked
                 })
             
             # Sort: folders first, then files
@@ -281,11 +362,7 @@ class FileManagerExecutor(BaseExecutor):
             old_path.rename(new_path)
             
             # Update manifest if Kai-created
-            if self._is_kai_created(old_path):
-                for entry in self.manifest.get("created_files", []) + self.manifest.get("created_folders", []):
-                    if entry["path"] == str(old_path):
-                        entry["path"] = str(new_path)
-                self._save_manifest()
+            self.manifest.relocate(old_path, new_path)
             
             logger.info(f"[FILE_MANAGER] Renamed: {old_path} -> {new_path}")
             return {
@@ -321,11 +398,7 @@ class FileManagerExecutor(BaseExecutor):
             shutil.move(str(source_path), str(dest_path))
             
             # Update manifest
-            if self._is_kai_created(source_path):
-                for entry in self.manifest.get("created_files", []) + self.manifest.get("created_folders", []):
-                    if entry["path"] == str(source_path):
-                        entry["path"] = str(dest_path)
-                self._save_manifest()
+            self.manifest.relocate(source_path, dest_path)
             
             logger.info(f"[FILE_MANAGER] Moved: {source_path} -> {dest_path}")
             return {
@@ -368,15 +441,7 @@ class FileManagerExecutor(BaseExecutor):
                 file_path.unlink()
             
             # Remove from manifest
-            self.manifest["created_files"] = [
-                e for e in self.manifest.get("created_files", [])
-                if e["path"] != str(file_path)
-            ]
-            self.manifest["created_folders"] = [
-                e for e in self.manifest.get("created_folders", [])
-                if e["path"] != str(file_path)
-            ]
-            self._save_manifest()
+            self.manifest.remove(file_path)
             
             logger.info(f"[FILE_MANAGER] Deleted: {file_path}")
             return {
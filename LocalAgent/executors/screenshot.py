@@ -40,10 +40,24 @@ class ScreenshotExecutor(BaseExecutor):
         Args:
             params: Optional parameters
                 - region: Optional region to capture (not implemented yet)
+                - include_image: Also return the PNG bytes in data["image"]
+                  (sent as binary WebSocket frames, base64 over HTTP)
         
         Returns:
             Dict with status and screenshot path
         """
+        result = self._capture(params)
+        
+        if params.get("include_image") and result.get("status") == "success":
+            try:
+                result["data"]["image"] = Path(result["data"]["path"]).read_bytes()
+            except (OSError, KeyError) as e:
+                logger.warning(f"[SCREENSHOT] Could not attach image bytes: {e}")
+        
+        return result
+    
+    def _capture(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Capture the screen to a PNG file, trying each available backend."""
         if sys.platform != "win32":
             return {"status": "error", "message": "Screenshot only supported on Windows"}
         
@@ -6,17 +6,25 @@ Read-only executor that safely collects system information.
 Collects:
 - CPU usage percentage
 - RAM usage (used, total, percentage)
+- Disk usage and network throughput
 - System uptime
 - Operating system details
 
+A background sampler refreshes the metrics every few seconds, so the
+command returns the latest snapshot immediately instead of blocking the
+agent while psutil measures CPU.
+
 Security: No shell commands, no file modifications, no elevated permissions.
 Uses only psutil and platform modules for reliable cross-platform support.
 """
 
+import os
 import platform
+import threading
 import time
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 try:
     import psutil
@@ -26,6 +34,94 @@ except ImportError:
 
 from .base import BaseExecutor
 
+SAMPLE_INTERVAL = 2.0   # seconds between background samples
+SAMPLE_HISTORY = 30     # samples kept for rolling averages (~1 minute)
+
+
+class SystemSampler:
+    """
+    Daemon thread keeping rolling CPU, memory, disk and network metrics.
+    
+    cpu_percent(interval=None) measures usage since the previous sample, so
+    sampling never sleeps inside psutil.
+    """
+    
+    def __init__(self, interval: float = SAMPLE_INTERVAL, history: int = SAMPLE_HISTORY):
+        self.interval = interval
+        self._samples = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_net = None
+        self._disk_path = (os.environ.get("SystemDrive", "C:") + "\\") if os.name == "nt" else "/"
+    
+    def start(self):
+        """Start sampling (idempotent)."""
+        if self._thread and self._thread.is_alive():
+            return
+        psutil.cpu_percent(interval=None)  # Prime the CPU counter
+        self._last_net = (time.time(), psutil.net_io_counters())
+        self._thread = threading.Thread(target=self._run, name="SystemSampler", daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                sample = self._sample()
+                with self._lock:
+                    self._samples.append(sample)
+                self._ready.set()
+            except Exception:
+                pass
+    
+    def _sample(self) -> Dict[str, Any]:
+        now = time.time()
+        net = psutil.net_io_counters()
+        last_time, last_net = self._last_net
+        elapsed = max(now - last_time, 1e-6)
+        self._last_net = (now, net)
+        
+        disk = psutil.disk_usage(self._disk_path)
+        return {
+            "time": now,
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "memory": psutil.virtual_memory(),
+            "disk": disk,
+            "net_sent_per_sec": (net.bytes_sent - last_net.bytes_sent) / elapsed,
+            "net_recv_per_sec": (net.bytes_recv - last_net.bytes_recv) / elapsed,
+        }
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Latest sample plus rolling CPU average; waits for the first sample only once."""
+        self.start()
+        self._ready.wait(timeout=self.interval * 2)
+        with self._lock:
+            samples = list(self._samples)
+        if not samples:
+            raise RuntimeError("System metrics not sampled yet")
+        
+        latest = samples[-1]
+        return {
+            **latest,
+            "cpu_average_percent": round(sum(s["cpu_percent"] for s in samples) / len(samples), 1),
+            "window_seconds": round(latest["time"] - samples[0]["time"] + self.interval),
+        }
+
+
+_sampler: Optional[SystemSampler] = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler() -> SystemSampler:
+    """Get the shared sampler, starting it on first use."""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = SystemSampler()
+            _sampler.start()
+        return _sampler
+
 
 class SystemStatusExecutor(BaseExecutor):
     """
@@ -33,6 +129,13 @@ class SystemStatusExecutor(BaseExecutor):
     No parameters accepted - returns a fixed set of safe metrics.
     """
     
+    def __init__(self):
+        super().__init__()
+        self._system_info: Optional[Dict[str, Any]] = None
+        # Start sampling at agent start-up so the first status call is instant
+        if PSUTIL_AVAILABLE:
+            get_sampler()
+    
     @property
     def command_name(self) -> str:
         return "system_status"
@@ -54,12 +157,16 @@ class SystemStatusExecutor(BaseExecutor):
             }
         
         try:
-            # Collect system metrics
+            # Read the latest background sample (no blocking measurement)
+            sample = get_sampler().snapshot()
             status_data = {
-                "cpu": self._get_cpu_info(),
-                "memory": self._get_memory_info(),
+                "cpu": self._get_cpu_info(sample),
+                "memory": self._get_memory_info(sample),
+                "disk": self._get_disk_info(sample),
+                "network": self._get_network_info(sample),
                 "uptime": self._get_uptime_info(),
                 "system": self._get_system_info(),
+                "sampled_at": datetime.fromtimestamp(sample["time"]).isoformat(),
                 "timestamp": datetime.now().isoformat()
             }
             
@@ -82,22 +189,22 @@ class SystemStatusExecutor(BaseExecutor):
                 "message": f"Failed to collect system status: {str(e)}"
             }
     
-    def _get_cpu_info(self) -> Dict[str, Any]:
+    def _get_cpu_info(self, sample: Dict[str, Any]) -> Dict[str, Any]:
         """Get CPU usage information."""
-        # Get CPU percent with a small interval for accuracy
-        cpu_percent = psutil.cpu_percent(interval=0.5)
         cpu_count = psutil.cpu_count()
         cpu_count_logical = psutil.cpu_count(logical=True)
         
         return {
-            "percent": cpu_percent,
+            "percent": sample["cpu_percent"],
+            "average_percent": sample["cpu_average_percent"],
+            "average_window_seconds": sample["window_seconds"],
             "cores_physical": cpu_count,
             "cores_logical": cpu_count_logical
         }
     
-    def _get_memory_info(self) -> Dict[str, Any]:
+    def _get_memory_info(self, sample: Dict[str, Any]) -> Dict[str, Any]:
         """Get RAM usage information."""
-        mem = psutil.virtual_memory()
+        mem = sample["memory"]
         
         return {
             "total_gb": round(mem.total / (1024 ** 3), 2),
@@ -106,6 +213,24 @@ class SystemStatusExecutor(BaseExecutor):
             "percent": mem.percent
         }
     
+    def _get_disk_info(self, sample: Dict[str, Any]) -> Dict[str, Any]:
+        """Get system drive usage information."""
+        disk = sample["disk"]
+        
+        return {
+            "total_gb": round(disk.total / (1024 ** 3), 2),
+            "used_gb": round(disk.used / (1024 ** 3), 2),
+            "free_gb": round(disk.free / (1024 ** 3), 2),
+            "percent": disk.percent
+        }
+    
+    def _get_network_info(self, sample: Dict[str, Any]) -> Dict[str, Any]:
+        """Get network throughput over the last sample interval."""
+        return {
+            "sent_kb_per_sec": round(sample["net_sent_per_sec"] / 1024, 1),
+            "recv_kb_per_sec": round(sample["net_recv_per_sec"] / 1024, 1)
+        }
+    
     def _get_uptime_info(self) -> Dict[str, Any]:
         """Get system uptime information."""
         boot_time = psutil.boot_time()
@@ -132,11 +257,13 @@ class SystemStatusExecutor(BaseExecutor):
         }
     
     def _get_system_info(self) -> Dict[str, Any]:
-        """Get operating system information."""
-        return {
-            "os": platform.system(),
-            "os_version": platform.version(),
-            "os_release": platform.release(),
-            "machine": platform.machine(),
-            "hostname": platform.node()
-        }
+        """Get operating system information (static, cached after first call)."""
+        if self._system_info is None:
+            self._system_info = {
+                "os": platform.system(),
+                "os_version": platform.version(),
+                "os_release": platform.release(),
+                "machine": platform.machine(),
+                "hostname": platform.node()
+            }
+        return self._system_info
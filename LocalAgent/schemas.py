@@ -99,7 +99,7 @@ COMMAND_SCHEMA = {
     },
     "screenshot": {
         "required_params": [],
-        "optional_params": ["region"],
+        "optional_params": ["region", "include_image"],
         "allowed_values": {},
         "description": "Take a screenshot of the current screen"
     },
@@ -6,7 +6,7 @@ Serving all AI capabilities via REST API
 PRODUCTION-READY with secure CORS, rate limiting, and security headers.
 """
 
-from flask import Flask, request, jsonify, send_from_directory, redirect
+from flask import Flask, request, jsonify, send_from_directory, redirect, Response, stream_with_context
 # from flask_cors import CORS  # DISABLED - using manual cors_sanitizer instead
 import threading
 import json
@@ -1608,26 +1608,33 @@ def delete_conversation(conversation_id):
 @app.route('/api/v1/chat/history/<conversation_id>/messages', methods=['POST'])
 @require_auth
 def add_message(conversation_id):
-    """Add a message to a conversation"""
+    """
+    Add a message to a conversation.
+    
+    Body is a single {role, content, metadata} or {"messages": [...]}, so a
+    user + assistant turn is saved in one call (and one Firestore commit).
+    """
     try:
         user = get_current_user()
         user_id = user['user_id']
         
         data = request.json
-        role = data.get('role')
-        content = data.get('content')
-        metadata = data.get('metadata')
+        messages = data.get('messages') if isinstance(data.get('messages'), list) else [data]
         
-        if not role or not content:
+        if not messages or not all(isinstance(m, dict) and m.get('role') and m.get('content') for m in messages):
             return jsonify({"error": "Role and content required"}), 400
         
-        from Backend.ChatHistory import chat_history
-        success = chat_history.add_message(user_id, conversation_id, role, content, metadata)
+        from Backend.ChatHistory import chat_history, MAX_MESSAGES_PER_WRITE
+        if len(messages) > MAX_MESSAGES_PER_WRITE:
+            return jsonify({"error": f"At most {MAX_MESSAGES_PER_WRITE} messages per request"}), 400
+        
+        success = chat_history.add_messages(user_id, conversation_id, messages)
         
         if success:
             return jsonify({
                 "success": True,
-                "message": "Message added successfully"
+                "count": len(messages),
+                "message": "Message added successfully" if len(messages) == 1 else "Messages added successfully"
             }), 201
         else:
             return jsonify({"error": "Failed to add message"}), 500
@@ -3013,9 +3020,8 @@ Format your response with **Bold Headers** and clear sections. Be thorough and d
         elif trigger_type == "device_status":
              print(f"[SMART-TRIGGER] Device status command detected")
              try:
-                 from Backend.LocalAgentAPI import _registered_devices, _pending_tasks, _task_results, get_first_online_device, log_command
+                 from Backend.LocalAgentAPI import _registered_devices, enqueue_task, wait_for_task_result, get_first_online_device, log_command
                  import uuid
-                 import time as time_module
                  
                  # SECURITY: Get user's devices only
                  current_user_id = user_id if user_id != 'anonymous' else None
@@ -3041,9 +3047,7 @@ Format your response with **Bold Headers** and clear sections. Be thorough and d
                  
                  task_id = str(uuid.uuid4())
                  task = {"task_id": task_id, "command": "system_status", "params": {}, "user_id": current_user_id or "anonymous", "created_at": datetime.now().isoformat()}
-                 if device_id not in _pending_tasks:
-                     _pending_tasks[device_id] = []
-                 _pending_tasks[device_id].append(task)
+                 enqueue_task(device_id, task)
 
                  # Push task to WebSocket
                  try:
@@ -3054,12 +3058,7 @@ Format your response with **Bold Headers** and clear sections. Be thorough and d
                  # Audit log
                  log_command(current_user_id or "anonymous", device_id, "system_status", {}, "queued")
                  
-                 max_wait, start_time, result_data = 10, time_module.time(), None
-                 while time_module.time() - start_time < max_wait:
-                     if task_id in _task_results:
-                         result_data = _task_results[task_id]
-                         break
-                     time_module.sleep(0.5)
+                 result_data = wait_for_task_result(task_id, timeout=10)
                  
                  if result_data and result_data.get("status") == "success":
                      agent_result = result_data.get("result", {})
@@ -3081,9 +3080,8 @@ Format your response with **Bold Headers** and clear sections. Be thorough and d
              print(f"[SMART-TRIGGER] 🚀 Open app command detected: {command}")
              try:
                  import uuid
-                 import time as time_module
                  from datetime import datetime
-                 from Backend.LocalAgentAPI import get_first_online_device, _pending_tasks, _task_results, log_command
+                 from Backend.LocalAgentAPI import get_first_online_device, enqueue_task, wait_for_task_result, log_command
                  
                  current_user_id = user_id if user_id != 'anonymous' else None
                  device_id, device_info = get_first_online_device(current_user_id)
@@ -3102,9 +3100,7 @@ Format your response with **Bold Headers** and clear sections. Be thorough and d
                      "user_id": current_user_id or "anonymous",
                      "created_at": datetime.now().isoformat()
                  }
-                 if device_id not in _pending_tasks:
-                     _pending_tasks[device_id] = []
-                 _pending_tasks[device_id].append(task)
+                 enqueue_task(device_id, task)
                  
                  # Push task to WebSocket
                  try:
@@ -3114,12 +3110,7 @@ Format your response with **Bold Headers** and clear sections. Be thorough and d
 
                  log_command(current_user_id or "anonymous", device_id, "open_app", {"app": command}, "queued")
                  
-                 max_wait, start_time, result_data = 10, time_module.time(), None
-                 while time_module.time() - start_time < max_wait:
-                     if task_id in _task_results:
-                         result_data = _task_results[task_id]
-                         break
-                     time_module.sleep(0.3)
+                 result_data = wait_for_task_result(task_id, timeout=10)
                  
                  if result_data and result_data.get("status") == "success":
                      return jsonify({"response": f"🚀 Opened {command}", "type": "open_app", "data": {"success": True}}), 200
@@ -3137,9 +3128,8 @@ Format your response with **Bold Headers** and clear sections. Be thorough and d
              print(f"[SMART-TRIGGER] 🛑 Close app command detected: {command}")
              try:
                  import uuid
-                 import time as time_module
                  from datetime import datetime
-                 from Backend.LocalAgentAPI import get_first_online_device, _pending_tasks, _task_results, log_command
+                 from Backend.LocalAgentAPI import get_first_online_device, enqueue_task, wait_for_task_result, log_command
                  
                  current_user_id = user_id if user_id != 'anonymous' else None
                  device_id, device_info = get_first_online_device(current_user_id)
@@ -3155,9 +3145,7 @@ Format your response with **Bold Headers** and clear sections. Be thorough and d
                      "user_id": current_user_id or "anonymous",
                      "created_at": datetime.now().isoformat()
                  }
-                 if device_id not in _pending_tasks:
-                     _pending_tasks[device_id] = []
-                 _pending_tasks[device_id].append(task)
+                 enqueue_task(device_id, task)
                  
                  # Push task to WebSocket
                  try:
@@ -3167,12 +3155,7 @@ Format your response with **Bold Headers** and clear sections. Be thorough and d
 
                  log_command(current_user_id or "anonymous", device_id, "close_app", {"app": command}, "queued")
                  
-                 max_wait, start_time, result_data = 10, time_module.time(), None
-                 while time_module.time() - start_time < max_wait:
-                     if task_id in _task_results:
-                         result_data = _task_results[task_id]
-                         break
-                     time_module.sleep(0.3)
+                 result_data = wait_for_task_result(task_id, timeout=10)
                  
                  if result_data and result_data.get("status") == "success":
                      return jsonify({"response": f"🛑 Closed {command}", "type": "close_app", "data": {"success": True}}), 200
@@ -3195,9 +3178,8 @@ Format your response with **Bold Headers** and clear sections. Be thorough and d
              print(f"[SMART-TRIGGER] 🎛️ System control detected: {action} (level: {level})")
              try:
                  import uuid
-                 import time as time_module
                  from datetime import datetime
-                 from Backend.LocalAgentAPI import get_first_online_device, _pending_tasks, _task_results, log_command
+                 from Backend.LocalAgentAPI import get_first_online_device, enqueue_task, wait_for_task_result, log_command
                  
                  current_user_id = user_id if user_id != 'anonymous' else None
                  device_id, device_info = get_first_online_device(current_user_id)
@@ -3223,9 +3205,7 @@ Format your response with **Bold Headers** and clear sections. Be thorough and d
                      "user_id": current_user_id or "anonymous",
                      "created_at": datetime.now().isoformat()
                  }
-                 if device_id not in _pending_tasks:
-                     _pending_tasks[device_id] = []
-                 _pending_tasks[device_id].append(task)
+                 enqueue_task(device_id, task)
                  
                  # Push task to WebSocket
                  try:
@@ -3236,12 +3216,7 @@ Format your response with **Bold Headers** and clear sections. Be thorough and d
                  log_command(current_user_id or "anonymous", device_id, "system_control", params, "queued")
                  
                  # Wait for result
-                 max_wait, start_time, result_data = 10, time_module.time(), None
-                 while time_module.time() - start_time < max_wait:
-                     if task_id in _task_results:
-                         result_data = _task_results[task_id]
-                         break
-                     time_module.sleep(0.3)
+                 result_data = wait_for_task_result(task_id, timeout=10)
                  
                  if result_data and result_data.get("status") == "success":
                      msg = result_data.get("result", {}).get("message", f"{action} completed")
@@ -3279,9 +3254,8 @@ Format your response with **Bold Headers** and clear sections. Be thorough and d
              print(f"[SMART-TRIGGER] 📁 File manager detected: {action}")
              try:
                  import uuid
-                 import time as time_module
                  from datetime import datetime
-                 from Backend.LocalAgentAPI import get_first_online_device, _pending_tasks, _task_results, log_command
+                 from Backend.LocalAgentAPI import get_first_online_device, enqueue_task, wait_for_task_result, log_command
                  from Backend.WritingContext import get_last_writing
                  
                  current_user_id = user_id if user_id != 'anonymous' else None
@@ -3332,9 +3306,7 @@ Format your response with **Bold Headers** and clear sections. Be thorough and d
                      "user_id": current_user_id or "anonymous",
                      "created_at": datetime.now().isoformat()
                  }
-                 if device_id not in _pending_tasks:
-                     _pending_tasks[device_id] = []
-                 _pending_tasks[device_id].append(task)
+                 enqueue_task(device_id, task)
                  
                  # Push task to WebSocket
                  try:
@@ -3345,12 +3317,7 @@ Format your response with **Bold Headers** and clear sections. Be thorough and d
                  log_command(current_user_id or "anonymous", device_id, "file_manager", params, "queued")
                  
                  # Wait for result
-                 max_wait, start_time, result_data = 10, time_module.time(), None
-                 while time_module.time() - start_time < max_wait:
-                     if task_id in _task_results:
-                         result_data = _task_results[task_id]
-                         break
-                     time_module.sleep(0.3)
+                 result_data = wait_for_task_result(task_id, timeout=10)
                  
                  if result_data and result_data.get("status") == "success":
                      msg = result_data.get("result", {}).get("message", f"File operation completed")
@@ -3397,9 +3364,8 @@ Format your response with **Bold Headers** and clear sections. Be thorough and d
              print(f"[SMART-TRIGGER] ✍️ Continue writing detected: {command}")
              try:
                  import uuid
-                 import time as time_module
                  from datetime import datetime
-                 from Backend.LocalAgentAPI import get_first_online_device, _pending_tasks, _task_results, log_command
+                 from Backend.LocalAgentAPI import get_first_online_device, enqueue_task, wait_for_task_result, log_command
                  from Backend.WritingContext import get_last_writing, save_writing
                  from Backend.LLM.ChatCompletion import ChatCompletion
                  
@@ -3458,9 +3424,7 @@ Output ONLY the continuation (not the original), ready to be appended."""
                          "user_id": current_user_id or "anonymous",
                          "created_at": datetime.now().isoformat()
                      }
-                     if device_id not in _pending_tasks:
-                         _pending_tasks[device_id] = []
-                     _pending_tasks[device_id].append(task)
+                     enqueue_task(device_id, task)
                      
                      return jsonify({
                          "response": f"✍️ Continuing your {content_type}...\n\n{continuation[:200]}{'...' if len(continuation) > 200 else ''}",
@@ -3486,8 +3450,7 @@ Output ONLY the continuation (not the original), ready to be appended."""
              print(f"[SMART-TRIGGER] 📝 Notepad command detected: {command}")
              try:
                  import uuid
-                 import time as time_module
-                 from Backend.LocalAgentAPI import get_first_online_device, _pending_tasks, _task_results, log_command
+                 from Backend.LocalAgentAPI import get_first_online_device, enqueue_task, wait_for_task_result, log_command
                  from Backend.WritingContext import save_writing, get_last_writing
                  
                  query_lower = query.lower()
@@ -3660,9 +3623,7 @@ Make it beautiful, meaningful, and intentional."""
                      "user_id": current_user_id or "anonymous",
                      "created_at": datetime.now().isoformat()
                  }
-                 if device_id not in _pending_tasks:
-                     _pending_tasks[device_id] = []
-                 _pending_tasks[device_id].append(task)
+                 enqueue_task(device_id, task)
                  
                  # Audit log
                  log_command(current_user_id or "anonymous", device_id, "write_notepad", {"text_length": len(text_to_write)}, "queued")
@@ -3670,12 +3631,7 @@ Make it beautiful, meaningful, and intentional."""
                  print(f"[NOTEPAD] Queued write_notepad for device {device_id[:8]}...: {len(text_to_write)} chars")
                  
                  # Wait for result (max 15 seconds for Notepad to open and type)
-                 max_wait, start_time, result_data = 15, time_module.time(), None
-                 while time_module.time() - start_time < max_wait:
-                     if task_id in _task_results:
-                         result_data = _task_results[task_id]
-                         break
-                     time_module.sleep(0.5)
+                 result_data = wait_for_task_result(task_id, timeout=15)
                  
                  if result_data and result_data.get("status") == "success":
                      agent_result = result_data.get("result", {})
@@ -3823,7 +3779,7 @@ Output the COMPLETE modified piece."""
                  
                  if original_destination == "notepad":
                      # Try to send to notepad if device is online
-                     from Backend.LocalAgentAPI import get_first_online_device, _pending_tasks, log_command
+                     from Backend.LocalAgentAPI import get_first_online_device, enqueue_task, log_command
                      device_id, device_info = get_first_online_device(current_user_id)
                      
                      if device_id:
@@ -3846,9 +3802,7 @@ Output the COMPLETE modified piece."""
                                  "user_id": current_user_id or "anonymous",
                                  "created_at": datetime.now().isoformat()
                              }
-                             if device_id not in _pending_tasks:
-                                 _pending_tasks[device_id] = []
-                             _pending_tasks[device_id].append(task)
+                             enqueue_task(device_id, task)
                              
                              log_command(current_user_id or "anonymous", device_id, "write_notepad", {"text_length": len(text_with_separator), "action": "continuation"}, "queued")
                              
@@ -4546,9 +4500,8 @@ Say 'Watch {title}' to start streaming!"""
              else:
                  # Route through Local Agent
                  try:
-                     from Backend.LocalAgentAPI import _registered_devices, _pending_tasks, _task_results, get_first_online_device, log_command
+                     from Backend.LocalAgentAPI import _registered_devices, enqueue_task, wait_for_task_result, get_first_online_device, log_command
                      import uuid
-                     import time as time_module
                      
                      # SECURITY: Get user's devices only
                      current_user_id = user_id if user_id != 'anonymous' else None
@@ -4594,7 +4547,7 @@ Say 'Watch {title}' to start streaming!"""
                              try:
                                  from Backend.AgentWebSocket import is_agent_connected, send_task_sync
                                  if is_agent_connected(device_id):
-                                     ws_sent = send_task_sync(device_id, task_id, "open_app", {"app": app_name})
+                                     ws_sent = send_task_sync(device_id, task_id, "open_app", {"app": app_name}, task=task)
                                      if ws_sent:
                                          print(f"[APP->AGENT] ⚡ Task sent via WebSocket: open_app({app_name})")
                              except Exception as ws_err:
@@ -4602,9 +4555,7 @@ Say 'Watch {title}' to start streaming!"""
                              
                              # FALLBACK to polling queue if WS failed
                              if not ws_sent:
-                                 if device_id not in _pending_tasks:
-                                     _pending_tasks[device_id] = []
-                                 _pending_tasks[device_id].append(task)
+                                 enqueue_task(device_id, task)
                                  print(f"[APP->AGENT] Task queued for polling: open_app({app_name})")
                              
                              # Audit log
@@ -4613,12 +4564,7 @@ Say 'Watch {title}' to start streaming!"""
                              print(f"[APP->AGENT] Task {'sent' if ws_sent else 'queued'}: open_app({app_name}) - {task_id[:8]}... (user: {current_user_id[:8] if current_user_id else 'anon'})")
                              
                              # Wait for result (up to 15 seconds)
-                             max_wait, start_time, result_data = 15, time_module.time(), None
-                             while time_module.time() - start_time < max_wait:
-                                 if task_id in _task_results:
-                                     result_data = _task_results[task_id]
-                                     break
-                                 time_module.sleep(0.5)
+                             result_data = wait_for_task_result(task_id, timeout=15)
                              
                              if result_data and result_data.get("status") == "success":
                                  response_text = f"🚀 Opened {app_name}"
@@ -5845,9 +5791,8 @@ By developing a solid understanding of {topic} and staying current with developm
                  if ai_intent.get("intent") == "system_status" and ai_intent.get("confidence", 0) >= 0.7:
                      print(f"[AI-FALLBACK] Detected system_status intent, routing to Local Agent")
                      # Route to device_status handler  
-                     from Backend.LocalAgentAPI import _registered_devices, _pending_tasks, _task_results, get_first_online_device, log_command
+                     from Backend.LocalAgentAPI import _registered_devices, enqueue_task, wait_for_task_result, get_first_online_device, log_command
                      import uuid
-                     import time as time_module
                      
                      # SECURITY: Get user's devices only
                      current_user_id = user_id if user_id != 'anonymous' else None
@@ -5861,19 +5806,12 @@ By developing a solid understanding of {topic} and staying current with developm
                          if is_online:
                              task_id = str(uuid.uuid4())
                              task = {"task_id": task_id, "command": "system_status", "params": {}, "user_id": current_user_id or "anonymous", "created_at": datetime.now().isoformat()}
-                             if device_id not in _pending_tasks:
-                                 _pending_tasks[device_id] = []
-                             _pending_tasks[device_id].append(task)
+                             enqueue_task(device_id, task)
                              
                              # Audit log
                              log_command(current_user_id or "anonymous", device_id, "system_status", {}, "queued")
                              
-                             max_wait, start_time, result_data = 10, time_module.time(), None
-                             while time_module.time() - start_time < max_wait:
-                                 if task_id in _task_results:
-                                     result_data = _task_results[task_id]
-                                     break
-                                 time_module.sleep(0.5)
+                             result_data = wait_for_task_result(task_id, timeout=10)
                              
                              if result_data and result_data.get("status") == "success":
                                  data = result_data.get("result", {}).get("data", {})
@@ -8500,18 +8438,22 @@ def conversation_detail(conversation_id):
 @app.route('/api/v1/conversations/<conversation_id>/messages', methods=['POST'])
 @require_api_key
 def add_message_legacy(conversation_id):
-    """Add a message to a conversation"""
+    """Add a message (or {"messages": [...]} in one commit) to a conversation"""
     if not chat_history:
         return jsonify({"error": "Chat history not available"}), 503
     
     try:
         user_id = get_user_id(request)
         data = request.json
-        role = data.get('role', 'user')
-        content = data.get('content', '')
-        metadata = data.get('metadata')
+        items = data.get('messages') if isinstance(data.get('messages'), list) else [data]
+        if not items or not all(isinstance(m, dict) for m in items):
+            return jsonify({"error": "messages must be a list of objects"}), 400
+        messages = [
+            {"role": m.get('role', 'user'), "content": m.get('content', ''), "metadata": m.get('metadata')}
+            for m in items
+        ]
         
-        success = chat_history.add_message(user_id, conversation_id, role, content, metadata)
+        success = chat_history.add_messages(user_id, conversation_id, messages)
         if success:
              return jsonify({"status": "success", "message_id": "firebase_id"})
         else:
@@ -8709,6 +8651,22 @@ def agent_multimodal():
 
 # ==================== ENHANCED DEBATE ARENA ENDPOINTS ====================
 
+def _debate_event_stream(events):
+    """Stream debate events as Server-Sent Events, one per turn."""
+    def generate():
+        try:
+            for event in events:
+                yield f"data: {json.dumps(event, default=str)}\n\n"
+        except Exception as e:
+            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.route('/api/v1/debate/start', methods=['POST'])
 @require_auth
 @rate_limit("default")
@@ -8733,6 +8691,8 @@ def debate_start():
         # Multi-participant or standard debate
         if participants and len(participants) >= 3:
             result = debate_arena.multi_participant_debate(topic, participants, rounds)
+        elif data.get('stream'):
+            return _debate_event_stream(debate_arena.stream_debate(topic, rounds, participants))
         else:
             result = debate_arena.start_debate(topic, rounds, participants)
         
@@ -10076,7 +10036,8 @@ def start_debate():
     
     Body: {
         "topic": "Should AI be regulated?",
-        "rounds": 3  // optional, default 3
+        "rounds": 3,  // optional, default 3
+        "stream": true  // optional, stream each turn as Server-Sent Events
     }
     """
     try:
@@ -10090,6 +10051,8 @@ def start_debate():
             return jsonify({"error": "Topic is required"}), 400
         
         print(f"[DEBATE] Starting: {topic}")
+        if data.get('stream'):
+            return _debate_event_stream(debate_arena.stream_debate(topic, rounds))
         result = debate_arena.start_debate(topic, rounds)
         
         return jsonify(result), 200
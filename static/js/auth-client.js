@@ -251,6 +251,7 @@ class RealtimeSyncClient {
         this.maxReconnectAttempts = 5;
         this.reconnectDelay = 1000;
         this.messageHandlers = [];
+        this.cursor = 0;  // Last offline-queue seq received, sent on reconnect
     }
 
     connect() {
@@ -268,7 +269,8 @@ class RealtimeSyncClient {
 
                 // Send authentication token
                 this.ws.send(JSON.stringify({
-                    token: this.authClient.accessToken
+                    token: this.authClient.accessToken,
+                    cursor: this.cursor
                 }));
 
                 // Start ping/pong keep-alive
@@ -280,8 +282,17 @@ class RealtimeSyncClient {
                     const data = JSON.parse(event.data);
                     console.log('[REALTIME] Message received:', data);
 
+                    // Coalesced updates arrive as one batch frame
+                    const events = data.type === 'batch' ? data.events : [data];
+
+                    // Replayed offline updates carry a cursor to acknowledge
+                    if (data.cursor) {
+                        this.cursor = data.cursor;
+                        this.ws.send(JSON.stringify({ type: 'ack', cursor: data.cursor }));
+                    }
+
                     // Call all registered handlers
-                    this.messageHandlers.forEach(handler => handler(data));
+                    events.forEach(evt => this.messageHandlers.forEach(handler => handler(evt)));
                 } catch (error) {
                     console.error('[REALTIME] Error parsing message:', error);
                 }
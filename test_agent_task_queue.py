@@ -0,0 +1,110 @@
+"""
+Test Agent Task Queue
+=====================
+Verifies delivery confirmation (echoing a cursor confirms only that task,
+so a task whose poll response was lost is redelivered) and that every
+concurrent waiter on a task is woken by its result.
+"""
+import sys
+import os
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from Backend.AgentTaskQueue import MemoryTaskQueue, SQLiteTaskQueue, TaskQueue
+
+
+def _queues():
+    yield MemoryTaskQueue()
+    with tempfile.TemporaryDirectory() as tmp:
+        yield SQLiteTaskQueue(os.path.join(tmp, "queue.db"))
+
+
+def _task(n):
+    return {"task_id": f"t{n}", "command": "noop", "params": {}}
+
+
+def test_lost_response_is_redelivered():
+    for queue in _queues():
+        for n in range(1, 4):
+            queue.enqueue("dev", _task(n))
+
+        first = queue.claim("dev", visibility_timeout=0.2)
+        queue.confirm_delivered("dev", first["seq"])
+
+        # This poll response never reaches the device - its cursor stays at `first`
+        lost = queue.claim("dev", visibility_timeout=0.2)
+
+        third = queue.claim("dev", visibility_timeout=0.2)
+        queue.confirm_delivered("dev", third["seq"])
+        assert third["task_id"] == "t3"
+
+        time.sleep(0.3)
+        redelivered = queue.claim("dev", visibility_timeout=0.2)
+        assert redelivered is not None, type(queue).__name__
+        assert redelivered["task_id"] == lost["task_id"] == "t2"
+
+        # Confirmed tasks are never handed out again
+        queue.confirm_delivered("dev", redelivered["seq"])
+        time.sleep(0.3)
+        assert queue.claim("dev") is None
+
+
+def test_cursor_echo_is_idempotent():
+    for queue in _queues():
+        queue.enqueue("dev", _task(1))
+        task = queue.claim("dev", visibility_timeout=0.1)
+        queue.confirm_delivered("dev", task["seq"])
+        queue.confirm_delivered("dev", task["seq"])
+        time.sleep(0.2)
+        assert queue.claim("dev") is None
+
+
+def test_concurrent_result_waiters():
+    for queue in _queues():
+        got = {}
+
+        def waiter(name, timeout):
+            got[name] = (queue.wait_for_result("t1", timeout), time.time())
+
+        early = threading.Thread(target=waiter, args=("early", 0.2))
+        late = threading.Thread(target=waiter, args=("late", 10))
+        early.start()
+        late.start()
+        early.join()
+
+        # The early waiter has given up; the late one must still be registered and signalled
+        assert len(queue._result_waiters.get("t1", [])) == 1
+        time.sleep(1.5)
+        reported_at = time.time()
+        queue.set_result("t1", {"status": "success"})
+        late.join(5)
+
+        assert got["early"][0] is None
+        result, woke_at = got["late"]
+        assert result == {"status": "success"}
+        assert woke_at - reported_at < 0.3, type(queue).__name__
+        assert queue._result_waiters == {}
+
+
+def test_incomplete_backend_rejected():
+    class HalfQueue(TaskQueue):
+        def enqueue(self, device_id, task):
+            pass
+
+    try:
+        HalfQueue()
+    except TypeError as e:
+        assert "claim" in str(e)
+    else:
+        raise AssertionError("a backend missing abstract methods was instantiated")
+
+
+if __name__ == "__main__":
+    test_lost_response_is_redelivered()
+    test_cursor_echo_is_idempotent()
+    test_concurrent_result_waiters()
+    test_incomplete_backend_rejected()
+    print("✅ All task queue tests passed")
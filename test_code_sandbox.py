@@ -0,0 +1,104 @@
+"""
+Test Code Sandbox
+=================
+Verifies the sandbox worker pool: timeouts kill the worker, workers are
+recycled, known escapes are blocked and secrets never reach the worker.
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from Backend.CodeExecutor import SandboxPool
+
+
+def _run(pool, code, timeout=5):
+    return pool.run(code, timeout=timeout, max_output=10000)
+
+
+def test_basic_execution():
+    pool = SandboxPool(size=1)
+    try:
+        result = _run(pool, "import statistics\nprint(statistics.mean([1, 2, 3]))\nx = math.sqrt(16)")
+        assert result["status"] == "success", result
+        assert result["output"].strip() == "2"
+        assert result["variables"]["x"] == "4.0"
+    finally:
+        pool.shutdown()
+
+
+def test_timeout_kills_worker():
+    pool = SandboxPool(size=1)
+    try:
+        result = _run(pool, "while True:\n    pass", timeout=1)
+        assert result["status"] == "error"
+        assert "timed out" in result["error"] or "aborted" in result["error"]
+        assert pool.killed == 1
+
+        # The replacement worker serves the next run
+        result = _run(pool, "print('still alive')")
+        assert result["status"] == "success", result
+        assert "still alive" in result["output"]
+    finally:
+        pool.shutdown()
+
+
+def test_workers_recycled():
+    pool = SandboxPool(size=1, max_runs=2)
+    try:
+        for _ in range(5):
+            assert _run(pool, "print(1)")["status"] == "success"
+        assert pool.recycled == 2
+    finally:
+        pool.shutdown()
+
+
+def test_escapes_blocked():
+    escapes = [
+        "import dataclasses\nprint(dataclasses.sys.modules['os'].environ)",
+        "import typing\nprint(typing.sys.modules['os'].listdir('/'))",
+        "import datetime\nprint(datetime.sys.modules)",
+        "from datetime import sys",
+        "import statistics\nprint(statistics.sys)",
+        "import json\nprint(json.decoder.re.enum.sys)",
+        "import datetime\nprint(getattr(datetime, 's' + 'ys'))",
+        "print(random._os.environ)",
+        "print(().__class__.__base__.__subclasses__())",
+        "print(__builtins__)",
+        "import datetime\nprint('{0.sys.modules}'.format(datetime))",
+        "print(str.format('{0.x}', 1))",
+        "g = (i for i in [1])\nprint(g.gi_frame.f_globals)",
+        "import os",
+        "import operator",
+    ]
+    pool = SandboxPool(size=1)
+    try:
+        for code in escapes:
+            result = _run(pool, code)
+            assert result["status"] == "error", f"escape not blocked: {code!r} -> {result}"
+    finally:
+        pool.shutdown()
+
+
+def test_secrets_not_inherited():
+    os.environ["SANDBOX_TEST_SECRET"] = "do-not-leak"
+    pool = SandboxPool(size=1)
+    try:
+        assert _run(pool, "print(1)")["status"] == "success"
+        worker = pool._idle.queue[0]
+        environ_path = f"/proc/{worker.process.pid}/environ"
+        if os.path.exists(environ_path):
+            with open(environ_path, "rb") as f:
+                assert b"SANDBOX_TEST_SECRET" not in f.read()
+    finally:
+        pool.shutdown()
+        os.environ.pop("SANDBOX_TEST_SECRET", None)
+
+
+if __name__ == "__main__":
+    test_basic_execution()
+    test_timeout_kills_worker()
+    test_workers_recycled()
+    test_escapes_blocked()
+    test_secrets_not_inherited()
+    print("✅ All sandbox tests passed")
@@ -0,0 +1,75 @@
+"""
+Test Workflow Engine
+====================
+Verifies how workflow steps are ordered: each step follows the previous
+one unless its "after" says otherwise, and unknown references or cycles
+are rejected.
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from Backend.WorkflowEngine import WorkflowEngine
+
+engine = WorkflowEngine()
+
+
+def _raises_value_error(steps) -> str:
+    try:
+        engine._step_dependencies(steps)
+    except ValueError as e:
+        return str(e)
+    raise AssertionError(f"expected ValueError for {steps}")
+
+
+def test_linear_without_after():
+    steps = [{"action": "speak"}, {"action": "wait"}, {"action": "speak"}]
+    assert engine._step_dependencies(steps) == [[], [0], [1]]
+
+
+def test_after_by_id_and_number():
+    steps = [
+        {"id": "fetch", "action": "speak"},
+        {"id": "other", "action": "speak", "after": []},
+        {"action": "speak", "after": ["fetch", 2]},
+        {"action": "speak", "after": "fetch"},
+    ]
+    # "after": [] starts step 2 immediately, alongside step 1
+    assert engine._step_dependencies(steps) == [[], [], [0, 1], [0]]
+
+
+def test_steps_without_after_stay_sequential():
+    steps = [
+        {"action": "speak"},
+        {"action": "wait"},
+        {"action": "speak"},
+        {"action": "speak", "after": [1]},
+    ]
+    # Using "after" on one step doesn't let the earlier steps (or the wait) run in parallel
+    assert engine._step_dependencies(steps) == [[], [0], [1], [0]]
+
+
+def test_unknown_reference():
+    message = _raises_value_error([{"action": "speak"}, {"action": "speak", "after": ["missing"]}])
+    assert "unknown step 'missing'" in message
+    assert "unknown step '5'" in _raises_value_error([{"action": "speak", "after": [5]}])
+
+
+def test_cycle():
+    steps = [
+        {"id": "a", "action": "speak", "after": ["b"]},
+        {"id": "b", "action": "speak", "after": ["a"]},
+        {"id": "c", "action": "speak"},
+    ]
+    assert "cycle" in _raises_value_error(steps)
+    assert "cycle" in _raises_value_error([{"id": "self", "action": "speak", "after": ["self"]}])
+
+
+if __name__ == "__main__":
+    test_linear_without_after()
+    test_after_by_id_and_number()
+    test_steps_without_after_stay_sequential()
+    test_unknown_reference()
+    test_cycle()
+    print("✅ All workflow engine tests passed")